@@ -0,0 +1,266 @@
+"""Microbenchmarks for the evaluation harness itself (no real model needed).
+
+Every benchmark feeds deterministic MockModel outputs through one part of the
+pipeline at several result counts:
+
+    python -m benchmarks.harness
+    python -m benchmarks.harness --sizes 10 1000 100000 1000000 --only extract_json metrics
+    python -m benchmarks.harness --compare results/benchmarks/harness_<commit>.json
+
+Results are written as JSON (one record per benchmark and size) so runs from
+different commits can be compared with --compare.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+os.environ.setdefault("TQDM_DISABLE", "1")  # Progress bars distort small timings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from config import SYSTEM_PROMPTS
+from evaluation.batch_metrics import score_responses_batch
+from evaluation.evaluators import Evaluator
+from evaluation.metrics import (
+    calculate_consistency_metrics,
+    calculate_persona_generation_metrics,
+)
+from evaluation.parsing import clear_parse_cache, extract_json
+from evaluation.tasks import build_user_prompt
+from evaluation.test_cases import PERSONA_GEN_CASES
+from models.mock_models import MockModel
+from utils.cost_tracker import CostTracker
+from utils.report_generator import ReportGenerator
+
+DEFAULT_SIZES = [10, 1_000, 10_000]
+
+
+def make_cases(n: int) -> List[Dict]:
+    """`n` distinct cases cycled from the real test cases."""
+    cases = []
+    for i in range(n):
+        base = PERSONA_GEN_CASES[i % len(PERSONA_GEN_CASES)]
+        data = dict(base["input"], name=f"{base['input']['name']} #{i}")
+        cases.append({"id": f"{base['id']}_{i}", "difficulty": base["difficulty"], "input": data})
+    return cases
+
+
+def make_outputs(cases: List[Dict], model: MockModel) -> List[str]:
+    system_prompt = SYSTEM_PROMPTS["make_persona"]
+    return [model.generate(system_prompt, build_user_prompt(c)).content for c in cases]
+
+
+def make_results(cases: List[Dict], outputs: List[str]) -> List[Dict]:
+    results = []
+    for case, output in zip(cases, outputs):
+        results.append(
+            {
+                "task": "make_persona",
+                "case_id": case["id"],
+                "model": "mock",
+                "response": output,
+                "metrics": calculate_persona_generation_metrics(case["input"], output),
+                "success": True,
+                "error": None,
+                "run_count": 1,
+                "run_responses": [output],
+            }
+        )
+    return results
+
+
+class Fixture:
+    """Inputs for one size, built once and shared by all benchmarks."""
+
+    def __init__(self, n: int, malformed_rate: float):
+        self.n = n
+        self.cases = make_cases(n)
+        self.model = MockModel("mock", malformed_rate=malformed_rate)
+        self.outputs = make_outputs(self.cases, self.model)
+        self._results = None
+
+    @property
+    def results(self) -> List[Dict]:
+        if self._results is None:
+            self._results = make_results(self.cases, self.outputs)
+        return self._results
+
+
+def bench_extract_json(fx: Fixture):
+    clear_parse_cache()
+    for text in fx.outputs:
+        extract_json(text)
+
+
+def bench_metrics(fx: Fixture):
+    clear_parse_cache()
+    for case, text in zip(fx.cases, fx.outputs):
+        calculate_persona_generation_metrics(case["input"], text)
+
+
+def bench_batch_metrics(fx: Fixture):
+    clear_parse_cache()
+    score_responses_batch([case["input"] for case in fx.cases], fx.outputs)
+
+
+def bench_consistency(fx: Fixture):
+    clear_parse_cache()
+    for i in range(len(fx.outputs)):
+        calculate_consistency_metrics(fx.outputs[i : i + 3])
+
+
+def bench_evaluator(fx: Fixture):
+    # Zero-latency model: the time measured is the evaluator's own overhead
+    evaluator = Evaluator([MockModel("mock")], CostTracker())
+    evaluator.evaluate_task("make_persona", fx.cases)
+
+
+def bench_cost_tracker(fx: Fixture):
+    tracker = CostTracker()
+    for i in range(fx.n):
+        tracker.log_request(
+            model="mock",
+            task="make_persona",
+            input_tokens=500,
+            output_tokens=250 + i % 100,
+            latency_ms=100.0 + i % 50,
+            cost=0.0001,
+            success=i % 20 != 0,
+        )
+    tracker.get_model_stats()
+
+
+def bench_report(fx: Fixture):
+    results = fx.results
+    with tempfile.TemporaryDirectory() as tmp:
+        ReportGenerator(tmp).generate_report(results)
+
+
+BENCHMARKS: Dict[str, Callable[[Fixture], None]] = {
+    "extract_json": bench_extract_json,
+    "metrics": bench_metrics,
+    "batch_metrics": bench_batch_metrics,
+    "consistency": bench_consistency,
+    "evaluator": bench_evaluator,
+    "cost_tracker": bench_cost_tracker,
+    "report": bench_report,
+}
+
+
+def time_once(fn: Callable[[Fixture], None], fx: Fixture) -> float:
+    start = time.perf_counter()
+    fn(fx)
+    return time.perf_counter() - start
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _quiet(fn: Callable[[Fixture], None], fx: Fixture, repeat: int) -> List[float]:
+    # Evaluator and report generation also print; keep the console readable
+    with open(os.devnull, "w") as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            return [time_once(fn, fx) for _ in range(repeat)]
+        finally:
+            sys.stdout = stdout
+
+
+def run(names: List[str], sizes: List[int], repeat: int, malformed_rate: float) -> List[Dict]:
+    # Warm-up pass: lazy imports and first-call setup are not what we measure
+    warmup = Fixture(10, malformed_rate)
+    for name in names:
+        _quiet(BENCHMARKS[name], warmup, 1)
+
+    records = []
+    for n in sizes:
+        fx = Fixture(n, malformed_rate)
+        for name in names:
+            seconds = _quiet(BENCHMARKS[name], fx, repeat)
+            median = statistics.median(seconds)
+            records.append(
+                {
+                    "benchmark": name,
+                    "n": n,
+                    "median_s": median,
+                    "min_s": min(seconds),
+                    "per_item_us": median / n * 1e6,
+                    "items_per_s": n / median if median > 0 else None,
+                }
+            )
+            print(f"{name:<14} n={n:<9} {median * 1000:10.2f} ms  {median / n * 1e6:9.2f} us/item")
+    return records
+
+
+def compare(records: List[Dict], baseline_path: str, threshold: float = 0.2):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    base = {(r["benchmark"], r["n"]): r for r in baseline["results"]}
+    print(f"\nCompared with {baseline.get('commit') or baseline_path}:")
+    for r in records:
+        b = base.get((r["benchmark"], r["n"]))
+        if not b:
+            continue
+        ratio = r["median_s"] / b["median_s"] if b["median_s"] else float("nan")
+        flag = "  REGRESSION" if ratio > 1 + threshold else ""
+        print(f"{r['benchmark']:<14} n={r['n']:<9} x{ratio:5.2f}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the evaluation harness")
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--malformed-rate", type=float, default=0.1)
+    parser.add_argument("--output", default=None, help="Results JSON (default: results/benchmarks/harness_<commit>.json)")
+    parser.add_argument("--compare", default=None, help="Baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Slowdown flagged as a regression")
+    args = parser.parse_args()
+
+    records = run(args.only, args.sizes, args.repeat, args.malformed_rate)
+
+    commit = git_commit()
+    output = args.output or os.path.join(
+        "results", "benchmarks", f"harness_{commit or 'unknown'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "commit": commit,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "repeat": args.repeat,
+                "malformed_rate": args.malformed_rate,
+                "results": records,
+            },
+            f,
+            indent=2,
+        )
+    print(f"Results written to {output}")
+
+    if args.compare:
+        compare(records, args.compare, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Import-time benchmark for the CLI, dashboard and model backends.
+
+Each target is imported in a fresh interpreter so module caches don't hide
+the real cost:
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --repeat 10 --output results/import_time.json
+
+`heavy` lists which of torch/transformers/openai ended up in `sys.modules`;
+an API-only run should never show torch there.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ["torch", "transformers", "openai"]
+
+# name -> statement timed in a fresh interpreter
+TARGETS: Dict[str, str] = {
+    "models": "import models",
+    "evaluation.evaluators": "import evaluation.evaluators",
+    "main": "import main",
+    "dashboard_deps": "import evaluation.worker, utils.results_view, utils.run_catalog",
+    "api_model": (
+        "import os; os.environ.setdefault('OPENAI_API_KEY', 'sk-benchmark'); "
+        "import config; config.OPENAI_API_KEY = os.environ['OPENAI_API_KEY']; "
+        "from models.registry import create_model; create_model('gpt-4o-mini')"
+    ),
+}
+
+_RUNNER = """
+import json, sys, time
+start = time.perf_counter()
+exec(compile({stmt!r}, "<bench>", "exec"))
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def time_import(stmt: str) -> Dict:
+    code = _RUNNER.format(stmt=stmt, heavy=HEAVY_MODULES)
+    proc = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr else "failed"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run(targets: List[str], repeat: int) -> Dict[str, Dict]:
+    results = {}
+    for name in targets:
+        samples = [time_import(TARGETS[name]) for _ in range(repeat)]
+        errors = [s["error"] for s in samples if "error" in s]
+        if errors:
+            results[name] = {"error": errors[0]}
+            continue
+        seconds = [s["seconds"] for s in samples]
+        results[name] = {
+            "median_s": statistics.median(seconds),
+            "min_s": min(seconds),
+            "max_s": max(seconds),
+            "heavy": samples[-1]["heavy"],
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold import times")
+    parser.add_argument("--targets", nargs="+", default=list(TARGETS), choices=list(TARGETS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=str, default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.targets, args.repeat)
+    for name, r in results.items():
+        if "error" in r:
+            print(f"{name:<24} ERROR {r['error']}")
+        else:
+            heavy = ", ".join(r["heavy"]) or "-"
+            print(f"{name:<24} {r['median_s'] * 1000:8.1f} ms  (heavy: {heavy})")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version, "repeat": args.repeat, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,19 @@ load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
+# Shared local model server (serve.py), e.g. http://127.0.0.1:8000/v1
+MODEL_SERVER_URL = os.getenv("MODEL_SERVER_URL")
+
+
+# Persistent torch.compile kernel cache for local models' fast decode mode
+COMPILE_CACHE_DIR = os.getenv(
+    "COMPILE_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "rs_test", "inductor")
+)
+
+# Snapshots of local models in their served dtype, for fast cold starts
+# (models/snapshots.py); off unless set to a directory
+MODEL_SNAPSHOT_DIR = os.getenv("MODEL_SNAPSHOT_DIR", "")
+
 
 # Model Names
 API_MODELS = {"gpt-4o-mini": "gpt-4o-mini"}
@@ -22,6 +35,13 @@ LOCAL_MODELS = {
     "ax-4.0-light": "skt/A.X-4.0-Light",
 }
 
+# Deterministic mock backends (models/mock_models.py) for benchmarking the harness
+MOCK_MODELS = {
+    "mock": {},
+    "mock-api": {"latency_ms": 800, "latency_std_ms": 300, "latency_dist": "lognormal", "sleep": True},
+    "mock-flaky": {"error_rate": 0.05, "malformed_rate": 0.2},
+}
+
 
 # Pricing (USD per 1M tokens) - Estimated for early 2025/Late 2024
 MODEL_PRICING = {
@@ -67,4 +87,7 @@ EVAL_CONFIG = {
     "n_runs": 3,  # Run 3 times to check consistency
     "timeout": 30,  # seconds per call
     "max_retries": 2,
+    "bootstrap_resamples": 10000,  # Resamples for report confidence intervals
+    "bootstrap_seed": 0,
+    "monthly_requests": 10000,  # Request volume for the report's cost projection
 }
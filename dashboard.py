@@ -1,17 +1,21 @@
 import streamlit as st
 import pandas as pd
-import json
 import os
-import glob
-from evaluation.evaluators import Evaluator
+import time
 from config import API_MODELS, LOCAL_MODELS
-from utils.report_generator import ReportGenerator
-from utils.cost_tracker import CostTracker
-from models.api_models import OpenAIModel
-from models.local_models import LocalHuggingFaceModel
-from config import OPENAI_API_KEY
-import gc
-import torch
+from evaluation.worker import launch_worker
+from utils.cost_tracker import spool_model_stats, spool_runs
+from utils.job_store import JobStore, ACTIVE_STATUSES
+from utils.run_catalog import RunCatalog
+from utils.results_view import (
+    build_results_frame,
+    load_run_frame,
+    per_model_aggregates,
+    search_personas,
+    paginate,
+    downsample,
+)
+from evaluation.parsing import extract_json
 
 # Set page config
 st.set_page_config(page_title="LLM Persona Evaluator", page_icon="🍽️", layout="wide")
@@ -39,107 +43,142 @@ selected_local_models = st.sidebar.multiselect(
 
 selected_model_names = selected_api_models + selected_local_models
 
-# Run Button
-if st.sidebar.button("🚀 Run Evaluation", type="primary"):
-    if not selected_model_names:
-        st.error("Please select at least one model.")
-    else:
-        # Progress Bar
-        progress_text = "Starting evaluation..."
-        progress_bar = st.progress(0, text=progress_text)
+st.sidebar.subheader("Telemetry")
+telemetry_dir = st.sidebar.text_input(
+    "Spool directory (main.py --telemetry-dir)", value=""
+)
 
-        all_results = []
-        cost_tracker = CostTracker()
+RESULTS_DIR = "./results"
+JOB_DB = os.path.join(RESULTS_DIR, "jobs.sqlite")
 
-        total_models = len(selected_model_names)
 
-        try:
-            for idx, name in enumerate(selected_model_names):
-                progress_bar.progress(
-                    (idx) / total_models,
-                    text=f"Processing {name} ({idx + 1}/{total_models})...",
-                )
+@st.cache_resource
+def get_job_store() -> JobStore:
+    return JobStore(JOB_DB)
 
-                current_model = None
-                try:
-                    # Factory Logic
-                    if name in API_MODELS:
-                        full_name = API_MODELS[name]
-                        if "gpt" in full_name:
-                            if not OPENAI_API_KEY:
-                                st.error(f"Skipping {name}: OPENAI_API_KEY Missing")
-                                continue
-                            current_model = OpenAIModel(full_name)
-
-                    elif name in LOCAL_MODELS:
-                        full_name = LOCAL_MODELS[name]
-                        current_model = LocalHuggingFaceModel(full_name)
-
-                    else:
-                        st.warning(f"Unknown model config: {name}")
-                        continue
-
-                    if current_model:
-                        # Evaluate Single Model
-                        evaluator = Evaluator([current_model], cost_tracker)
-                        run_results = evaluator.run_all()
-                        all_results.extend(run_results)
-
-                except Exception as e:
-                    st.error(f"Error evaluating {name}: {str(e)}")
-
-                finally:
-                    # Cleanup Memory
-                    if current_model:
-                        del current_model
-                    gc.collect()
-                    if torch.cuda.is_available():
-                        torch.cuda.empty_cache()
-
-            progress_bar.progress(1.0, text="Evaluation Complete!")
-
-            # 2. Add to session state
-            st.session_state["run_results"] = all_results
-            st.session_state["last_run_models"] = selected_model_names
-
-            # 3. Generate Report to get stats
-            # We can reuse ReportGenerator logic or process manually
-            # Let's save results temporarily to leverage existing logic
-            if not os.path.exists("./results"):
-                os.makedirs("./results")
-
-            # Find latest report
-            list_of_files = glob.glob("./results/report_*.md")
-            if list_of_files:
-                latest_file = max(list_of_files, key=os.path.getctime)
-                with open(latest_file, "r") as f:
-                    st.session_state["latest_report"] = f.read()
-
-            st.success("Evaluation Complete!")
-        except Exception as e:
-            st.error(f"An error occurred: {e}")
 
-# Display Results
-if "run_results" in st.session_state:
-    results = st.session_state["run_results"]
-
-    # Process results into DataFrame for charts
-    rows = []
-    for r in results:
-        m = r.get("metrics", {})
-        m["model"] = r["model"]
-        m["generated_text"] = r.get("output", {}).get("content", "")
-        m["input_prompt"] = r.get("input", {}).get("prompt", "")
-        # Add persona details if available
-        try:
-            content_json = json.loads(m["generated_text"])
-            m["persona_name"] = content_json.get("name", "Unknown")
-        except:
-            m["persona_name"] = "Parse Error"
-        rows.append(m)
-
-    df = pd.DataFrame(rows)
+@st.cache_resource
+def get_run_catalog() -> RunCatalog:
+    return RunCatalog(os.path.join(RESULTS_DIR, "runs.sqlite"))
 
+
+job_store = get_job_store()
+run_catalog = get_run_catalog()
+
+# Persona view page size and max points per chart
+PAGE_SIZE = 20
+CHART_POINTS = 2000
+
+# Run Button: evaluations run in a separate worker process, never in this script
+if st.sidebar.button("🚀 Run Evaluation", type="primary"):
+    if not selected_model_names:
+        st.error("Please select at least one model.")
+    else:
+        job_id, created = job_store.submit(selected_model_names)
+        if created:
+            pid = launch_worker(job_id, JOB_DB, RESULTS_DIR)
+            job_store.update(job_id, pid=pid)
+            st.success(f"Submitted job {job_id}")
+        else:
+            st.info(f"An identical job is already running: {job_id}")
+        st.session_state["job_id"] = job_id
+        st.query_params["job"] = job_id
+
+@st.cache_data(max_entries=16)
+def load_job_view(job_id: str, version: tuple):
+    """Parsed results + aggregates for a job; `version` changes as results stream in."""
+    df = build_results_frame(job_store.get_results(job_id))
+    return df, per_model_aggregates(df)
+
+
+def file_mtime(*paths) -> float:
+    """Latest modification time of the existing `paths` (0 if none exist)."""
+    return max((os.path.getmtime(p) for p in paths if p and os.path.exists(p)), default=0.0)
+
+
+@st.cache_data(max_entries=16)
+def load_history_view(run_id: str, parquet_path: str, raw_path: str, mtime: float):
+    # `mtime` is part of the cache key, so a rescored run is reloaded
+    df = load_run_frame(parquet_path, raw_path)
+    return df, per_model_aggregates(df)
+
+
+def read_report(path):
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    return None
+
+
+st.sidebar.subheader("Results")
+source = st.sidebar.radio("Source", ["Jobs", "Run history"], horizontal=True)
+
+df = pd.DataFrame()
+perf_all = pd.DataFrame()
+model_stats = pd.DataFrame()
+report_md = None
+job_active = False
+
+if source == "Jobs":
+    # Any session can watch any job (share the ?job=<id> URL)
+    recent_jobs = job_store.list_jobs(limit=20)
+    job_ids = [j["job_id"] for j in recent_jobs]
+    watched_job = st.query_params.get("job") or st.session_state.get("job_id")
+    if job_ids:
+        selected_job = st.sidebar.selectbox(
+            "Watch job",
+            options=job_ids,
+            index=job_ids.index(watched_job) if watched_job in job_ids else 0,
+            format_func=lambda j: next(
+                f"{j} [{x['status']}] {', '.join(x['models'])}"
+                for x in recent_jobs
+                if x["job_id"] == j
+            ),
+        )
+        if selected_job != watched_job:
+            st.query_params["job"] = selected_job
+        watched_job = selected_job
+
+    job = job_store.get_job(watched_job) if watched_job else None
+    if job:
+        total = max(job["total_cases"] or 0, 1)
+        done = min(job["done_cases"], total)
+        job_active = job["status"] in ACTIVE_STATUSES
+        label = f"Job {job['job_id']}: {job['status']} ({done}/{job['total_cases'] or '?'} cases)"
+        if job.get("current_model") and job_active:
+            label += f" - evaluating {job['current_model']}"
+        st.progress(done / total, text=label)
+        if job["status"] == "failed" or (job["status"] == "done" and job.get("error")):
+            st.error(job["error"])
+
+        # Partial results are rendered as they stream in
+        version = (job["done_cases"], job["status"], job["updated_at"])
+        df, perf_all = load_job_view(job["job_id"], version)
+        model_stats = job_store.get_model_stats(job["job_id"])
+        report_md = read_report(job.get("report_path"))
+else:
+    # Historical runs from the catalog, independent of this session
+    runs = run_catalog.runs(limit=200)
+    if runs.empty:
+        st.sidebar.info("No runs recorded yet.")
+    else:
+        run_id = st.sidebar.selectbox(
+            "Run",
+            options=list(runs["run_id"]),
+            format_func=lambda r: f"{r} ({', '.join(runs.set_index('run_id').at[r, 'models'])})",
+        )
+        run = runs.set_index("run_id").loc[run_id]
+        df, perf_all = load_history_view(
+            run_id,
+            run["parquet_path"],
+            run["raw_path"],
+            file_mtime(run["parquet_path"], run["raw_path"]),
+        )
+        model_stats = run_catalog.model_stats(run_id)
+        report_md = read_report(run["report_path"])
+
+# Display Results
+if not df.empty:
     # Tabs
     tab1, tab2, tab3 = st.tabs(
         ["📊 Metrics Comparison", "📝 Generated Personas", "📑 Full Report"]
@@ -155,35 +194,74 @@ if "run_results" in st.session_state:
             "safety_consistency",
             "json_validity",
         ]
-        available_metrics = [m for m in metrics_to_show if m in df.columns]
+        available_metrics = [m for m in metrics_to_show if m in perf_all.columns]
 
         if available_metrics:
-            # Group by model
-            perf_df = df.groupby("model")[available_metrics].mean()
+            perf_df = perf_all[available_metrics]
             st.dataframe(perf_df.style.highlight_max(axis=0), use_container_width=True)
 
             # Charts
             st.bar_chart(perf_df)
+
+            if {"cot_depth_score", "persona_specificity"} <= set(df.columns):
+                st.caption(f"Per-result distribution ({min(len(df), CHART_POINTS)} of {len(df)} results)")
+                st.scatter_chart(
+                    downsample(df, CHART_POINTS),
+                    x="cot_depth_score",
+                    y="persona_specificity",
+                    color="model",
+                )
         else:
             st.warning("No metrics available to plot.")
 
+        stat_cols = [
+            "requests",
+            "success_rate",
+            "p50_latency_ms",
+            "p95_latency_ms",
+            "p99_latency_ms",
+            "p50_tokens_per_sec",
+            "total_cost_usd",
+        ]
+        if not model_stats.empty:
+            st.subheader("Latency & Cost")
+            st.dataframe(
+                model_stats[[c for c in stat_cols if c in model_stats.columns]],
+                use_container_width=True,
+            )
+
     with tab2:
         st.subheader("Inspect Generated Outputs")
 
-        # Filter by Model
-        model_filter = st.selectbox("Select Model to Inspect", df["model"].unique())
-        if model_filter:
-            filtered_df = df[df["model"] == model_filter]
+        col_model, col_search = st.columns([1, 2])
+        with col_model:
+            model_filter = st.selectbox("Select Model to Inspect", df["model"].unique())
+        with col_search:
+            query = st.text_input("Search (persona name, case id, output text)", "")
 
-            # Show each generation
-            for idx, row in filtered_df.iterrows():
+        if model_filter:
+            filtered_df = search_personas(df, model_filter, query)
+            n_pages = max(1, -(-len(filtered_df) // PAGE_SIZE))
+            page = st.number_input(
+                f"Page (1-{n_pages}, {len(filtered_df)} results)",
+                min_value=1,
+                max_value=n_pages,
+                value=1,
+            )
+
+            # Only the current page is rendered
+            for idx, row in paginate(filtered_df, page, PAGE_SIZE).iterrows():
                 with st.expander(
-                    f"Persona: {row['persona_name']} (Metrics: Depth={row.get('cot_depth_score', 0):.2f}, Spec={row.get('persona_specificity', 0):.2f})"
+                    f"Persona: {row['persona_name']} [{row['case_id']}] (Metrics: Depth={row.get('cot_depth_score', 0):.2f}, Spec={row.get('persona_specificity', 0):.2f})"
                 ):
                     col1, col2 = st.columns(2)
                     with col1:
                         st.markdown("**Generated JSON:**")
-                        st.json(row["generated_text"])
+                        parsed = extract_json(row["response"] or "")
+                        if parsed is not None:
+                            st.json(parsed)
+                        else:
+                            st.code(row["response"] or "")
                     with col2:
                         st.markdown("**Analysis:**")
                         st.write(
@@ -192,11 +270,28 @@ if "run_results" in st.session_state:
                         st.write(f"- **JSON Valid**: {row.get('json_validity', 'N/A')}")
                         st.markdown("---")
                         st.caption("Raw output content")
+                        st.text(row["response"] or "")
 
     with tab3:
-        if "latest_report" in st.session_state:
-            st.markdown(st.session_state["latest_report"])
+        if report_md:
+            st.markdown(report_md)
         else:
             st.info("No report generated yet.")
-else:
+elif not job_active:
     st.info("Select models from the sidebar and click 'Run Evaluation' to start.")
+
+spool_run_ids = spool_runs(telemetry_dir) if telemetry_dir and os.path.isdir(telemetry_dir) else []
+if spool_run_ids:
+    spool_run = st.sidebar.selectbox(
+        "Spooled run", options=spool_run_ids[::-1]  # Latest first
+    )
+    # Aggregated in Arrow over memory-mapped segments, never fully loaded
+    spooled_stats = spool_model_stats(telemetry_dir, run_id=spool_run)
+    if not spooled_stats.empty:
+        st.subheader(f"Spooled Telemetry ({telemetry_dir}, run {spool_run})")
+        st.dataframe(spooled_stats, use_container_width=True)
+
+# Poll the worker while the job is still running
+if job_active:
+    time.sleep(2)
+    st.rerun()
@@ -0,0 +1,139 @@
+import operator
+from itertools import chain, repeat
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .metrics import PERSONA_METRICS, DETAIL_KEYWORDS, LOGIC_KEYWORDS
+from .parsing import PERSONA_SCHEMA, extract_json
+
+_EMPTY: Dict = {}
+_ABSENT = object()
+
+
+def _column(rows: Sequence[Dict], field: str, default=None) -> List:
+    return list(map(dict.get, rows, repeat(field), repeat(default)))
+
+
+def _flags(values, n: int) -> np.ndarray:
+    return np.fromiter(values, dtype=bool, count=n)
+
+
+def _contains(texts: List, keyword: str) -> np.ndarray:
+    """`keyword in text` for every text of a column."""
+    return _flags(map(operator.contains, texts, repeat(keyword)), len(texts))
+
+
+def score_persona_batch(
+    inputs: Sequence[Dict],
+    outputs: Sequence[Optional[Dict]],
+    as_frame: bool = False,
+):
+    """Score a column of parsed persona outputs at once.
+
+    `inputs[i]` is the case input for `outputs[i]` (the dict returned by
+    `extract_json`, or None). Each check runs over a whole field column at a
+    time, as one C-level `map` plus numpy arithmetic, applying the same
+    Python operations as `calculate_persona_generation_metrics`, so values
+    are identical. Returns one float64 array per metric in PERSONA_METRICS
+    (or a DataFrame with those columns).
+    """
+    if len(inputs) != len(outputs):
+        raise ValueError("inputs and outputs must have the same length")
+
+    n = len(outputs)
+    valid = _flags(map(bool, outputs), n)
+    # Rows without a parsed object score 0.0 everywhere; blank them out
+    rows = [d if ok else _EMPTY for d, ok in zip(outputs, valid)]
+    inputs = [i if ok else _EMPTY for i, ok in zip(inputs, valid)]
+
+    # Schema: share of required fields present, declared types respected
+    required = PERSONA_SCHEMA.get("required", [])
+    complete = _flags(map(operator.ge, map(dict.keys, rows), repeat(set(required))), n)
+    n_present = np.full(n, len(required), dtype=np.int64)
+    for i in np.flatnonzero(~complete).tolist():
+        n_present[i] = sum(1 for f in required if f in rows[i])
+    completeness = n_present / (len(required) or 1)
+    types_ok = np.ones(n, dtype=bool)
+    for f, t in PERSONA_SCHEMA.get("types", {}).items():
+        column = _column(rows, f, _ABSENT)
+        types_ok &= _flags(map(operator.is_, column, repeat(_ABSENT)), n) | _flags(
+            map(isinstance, column, repeat(t)), n
+        )
+
+    name_match = _flags(map(operator.eq, _column(inputs, "name"), _column(rows, "name")), n)
+
+    # Safety: every input allergy kept, and no output allergen among the preferences
+    out_allergies = list(map(set, _column(rows, "allergies", [])))
+    allergies_kept = _flags(
+        map(set.issubset, map(set, _column(inputs, "allergies", [])), out_allergies), n
+    )
+    preferences = list(
+        map(
+            " ".join,
+            map(
+                operator.add,
+                _column(rows, "preferred_food_categories", []),
+                _column(rows, "preferred_ingredients", []),
+            ),
+        )
+    )
+    counts = np.fromiter(map(len, out_allergies), dtype=np.int64, count=n)
+    pair_rows = np.repeat(np.arange(n), counts)
+    pair_hits = _flags(
+        map(
+            operator.contains,
+            map(preferences.__getitem__, pair_rows.tolist()),
+            chain.from_iterable(out_allergies),
+        ),
+        len(pair_rows),
+    )
+    contradiction = np.bincount(pair_rows[pair_hits], minlength=n) > 0
+
+    desc = _column(rows, "description", "")
+    reasoning = _column(rows, "reasoning", "")
+    desc_len = np.fromiter(map(len, desc), dtype=np.int64, count=n)
+    reasoning_len = np.fromiter(map(len, reasoning), dtype=np.int64, count=n)
+    detail_hits = sum((_contains(desc, k) for k in DETAIL_KEYWORDS), np.zeros(n, dtype=np.int64))
+    logic_hit = np.zeros(n, dtype=bool)
+    for k in LOGIC_KEYWORDS:
+        logic_hit |= _contains(reasoning, k)
+
+    # Same float operations, in the same order, as the scalar implementation
+    zero = np.zeros(n)
+    specificity = zero + np.where(desc_len > 30, 0.4, 0.0)
+    specificity = specificity + np.minimum(0.6, detail_hits * 0.2)
+
+    cot = zero + np.where(reasoning_len > 50, 0.3, 0.0)
+    cot = cot + np.where(logic_hit, 0.4, 0.0)
+    cot = cot + np.where(reasoning_len > 100, 0.3, 0.0)
+    cot = np.minimum(1.0, cot)
+
+    safety = np.where(allergies_kept, 1.0, 0.0)
+    safety = np.where(contradiction, 0.5, safety)
+
+    columns = {
+        "json_validity": valid.astype(float),
+        "field_completeness": completeness,
+        "value_accuracy": name_match.astype(float),
+        "schema_compliance": np.where(types_ok & (completeness == 1.0), 1.0, 0.0),
+        "cot_depth_score": cot,
+        "persona_specificity": specificity,
+        "safety_consistency": safety,
+    }
+    for name in PERSONA_METRICS:
+        columns[name] = np.where(valid, columns[name], 0.0)
+
+    if as_frame:
+        return pd.DataFrame(columns, columns=PERSONA_METRICS)
+    return columns
+
+
+def score_responses_batch(
+    inputs: Sequence[Dict], responses: Sequence[str], as_frame: bool = False
+):
+    """Parse raw response texts and score them with `score_persona_batch`."""
+    return score_persona_batch(
+        inputs, [extract_json(r) for r in responses], as_frame=as_frame
+    )
@@ -0,0 +1,139 @@
+import hashlib
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .parsing import extract_json
+
+if TYPE_CHECKING:
+    from scipy import sparse
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+# Free-text fields that carry the persona's meaning
+SEMANTIC_FIELDS = ["description", "reasoning"]
+
+
+def semantic_text(response_text: str, fields: Sequence[str] = SEMANTIC_FIELDS) -> str:
+    """Concatenate the free-text fields of a response ("" if unparsable)."""
+    data = extract_json(response_text)
+    if not data:
+        return ""
+    return "\n".join(str(data.get(f) or "") for f in fields)
+
+
+def corpus_key(texts: Sequence[str]) -> str:
+    """Hash of the texts a vectorizer is fitted on (empty texts ignored)."""
+    h = hashlib.sha256()
+    for t in texts:
+        if t:
+            h.update(t.encode("utf-8"))
+            h.update(b"\0")
+    return h.hexdigest()
+
+
+def consistency_groups(results: Sequence[Dict]) -> Dict[Tuple[str, str], List[Dict]]:
+    """Results that share a fitted vocabulary: one group per (task, model)."""
+    groups: Dict[Tuple[str, str], List[Dict]] = {}
+    for r in results:
+        groups.setdefault((r.get("task", ""), r.get("model", "")), []).append(r)
+    return groups
+
+
+class ConsistencyEngine:
+    """Semantic consistency of repeated runs via character n-gram TF-IDF.
+
+    Everything runs locally: a TfidfVectorizer is fitted on the scored
+    outputs (cached by a hash of that corpus, so new outputs always get a new
+    vocabulary) and each case's runs are compared by cosine similarity. Korean
+    text works without a tokenizer because the features are character n-grams.
+
+    Scores depend on the fitted corpus, so callers fit on one task's results
+    of one model, both live and when rescoring.
+    """
+
+    # Fitted vectorizers kept around; each holds a full vocabulary
+    max_cached = 8
+
+    def __init__(
+        self,
+        ngram_range=(2, 4),
+        fields: Sequence[str] = SEMANTIC_FIELDS,
+        max_features: Optional[int] = 2**18,
+    ):
+        self.ngram_range = ngram_range
+        self.fields = list(fields)
+        self.max_features = max_features
+        self._vectorizers: "OrderedDict[str, TfidfVectorizer]" = OrderedDict()
+
+    def fit(self, texts: Sequence[str]) -> "TfidfVectorizer":
+        key = corpus_key(texts)
+        vectorizer = self._vectorizers.get(key)
+        if vectorizer is not None:
+            self._vectorizers.move_to_end(key)
+        else:
+            # sklearn is imported on first fit; it dominates import time otherwise
+            from sklearn.feature_extraction.text import TfidfVectorizer
+
+            vectorizer = TfidfVectorizer(
+                analyzer="char_wb",
+                ngram_range=self.ngram_range,
+                max_features=self.max_features,
+                sublinear_tf=True,
+            )
+            corpus = [t for t in texts if t]
+            # An all-error run has nothing to fit; fall back to a dummy vocabulary
+            vectorizer.fit(corpus or [" "])
+            self._vectorizers[key] = vectorizer
+            while len(self._vectorizers) > self.max_cached:
+                self._vectorizers.popitem(last=False)
+        return vectorizer
+
+    def clear(self):
+        self._vectorizers.clear()
+
+    def embed(self, texts: Sequence[str]) -> "sparse.csr_matrix":
+        """L2-normalized TF-IDF rows; empty texts become zero rows."""
+        return self.fit(texts).transform(texts).tocsr()
+
+    def similarity_matrix(self, responses: Sequence[str]) -> np.ndarray:
+        """Pairwise cosine similarity of the runs of a single case."""
+        texts = [semantic_text(r, self.fields) for r in responses]
+        X = self.embed(texts)
+        return (X @ X.T).toarray()
+
+    def score_cases(self, cases: Sequence[Sequence[str]]) -> np.ndarray:
+        """Mean pairwise similarity between runs, for every case at once.
+
+        `cases[i]` holds the raw responses of case i. With unit-norm rows,
+        sum_{j<k} x_j.x_k = (|sum x|^2 - sum |x|^2) / 2, so one sparse
+        product over all cases replaces a similarity matrix per case.
+        Failed (unparsable) runs count as dissimilar to everything.
+        """
+        counts = np.array([len(c) for c in cases], dtype=np.int64)
+        texts: List[str] = [
+            semantic_text(r, self.fields) for responses in cases for r in responses
+        ]
+        if not texts:
+            return np.zeros(len(cases))
+
+        from scipy import sparse
+
+        X = self.embed(texts)
+        # Row-to-case indicator matrix (n_cases x n_texts)
+        case_of_row = np.repeat(np.arange(len(cases)), counts)
+        G = sparse.csr_matrix(
+            (np.ones(len(texts)), (case_of_row, np.arange(len(texts)))),
+            shape=(len(cases), len(texts)),
+        )
+        summed = G @ X
+        sum_norm_sq = np.asarray(summed.multiply(summed).sum(axis=1)).ravel()
+        row_norm_sq = np.asarray(X.multiply(X).sum(axis=1)).ravel()
+        self_sim = np.bincount(case_of_row, weights=row_norm_sq, minlength=len(cases))
+
+        n_pairs = counts * (counts - 1) / 2.0
+        scores = np.ones(len(cases))
+        multi = n_pairs > 0
+        scores[multi] = (sum_norm_sq[multi] - self_sim[multi]) / 2.0 / n_pairs[multi]
+        scores[counts == 0] = 0.0
+        return np.clip(scores, 0.0, 1.0)
@@ -1,108 +1,193 @@
 import concurrent.futures
-import json
+import dataclasses
+import itertools
 import tqdm
-from typing import List, Dict, Any
-from .test_cases import PERSONA_GEN_CASES
-from .metrics import (
-    calculate_persona_generation_metrics,
-    calculate_consistency_metrics,
-)
+from typing import List, Dict, Callable, Optional, Sequence, Tuple, Union
+from .metrics import calculate_consistency_metrics
+from .consistency import ConsistencyEngine, consistency_groups
+from .parsing import extract_json
+from .tasks import Task, get_task, select_tasks
 from models.unified_interface import UnifiedLLMInterface
 from utils.cost_tracker import CostTracker
-from config import SYSTEM_PROMPTS
+from utils.profiling import span
+from config import EVAL_CONFIG
 
 
 class Evaluator:
-    def __init__(self, models: List[UnifiedLLMInterface], cost_tracker: CostTracker):
+    def __init__(
+        self,
+        models: List[UnifiedLLMInterface],
+        cost_tracker: CostTracker,
+        metrics=None,
+        on_result: Optional[Callable[[Dict], None]] = None,
+        max_workers: int = 5,
+    ):
         self.models = models
         self.cost_tracker = cost_tracker
+        # Optional live exporter (utils.live_metrics.EvalMetrics)
+        self.metrics = metrics
+        # Called with each case result as soon as it completes
+        self.on_result = on_result
+        self.max_workers = max_workers
         self.results = []
-
-    def evaluate_task(self, task_name: str, cases: List[Dict]):
-        print(f"Starting evaluation for task: {task_name}")
-
-        # Helper to process single case
-        def process_case(model, case):
-            sys_prompt = SYSTEM_PROMPTS["make_persona"]
-            user_prompt = f"User Data: {json.dumps(case['input'], ensure_ascii=False)}"
-
-            # Run Multiple Times if Configured
-            from config import EVAL_CONFIG
-
-            n_runs = EVAL_CONFIG.get("n_runs", 1)
-
-            run_responses = []
-            run_metrics_list = []
-
-            for _ in range(n_runs):
-                response = model.generate(sys_prompt, user_prompt, temperature=0.0)
-                run_responses.append(response)
-
-                # Log cost (each run costs money)
-                self.cost_tracker.log_request(
-                    model=model.model_name,
-                    task=task_name,
-                    input_tokens=response.input_tokens,
-                    output_tokens=response.output_tokens,
-                    latency_ms=response.latency_ms,
-                    cost=response.cost_usd,
-                    success=response.error is None,
-                )
-
-                if response.error:
-                    run_metrics_list.append({})
-                    continue
-
-                # Single Run Metrics
-                m = calculate_persona_generation_metrics(
-                    case["input"], response.content
-                )
-
-                run_metrics_list.append(m)
-
-            # Aggregate Results
-            # Pick the first valid response for display/base metrics
-            first_valid_idx = next(
-                (i for i, r in enumerate(run_responses) if not r.error), 0
+        self.consistency_engine = ConsistencyEngine()
+
+    def _process_case(self, model: UnifiedLLMInterface, task: Task, case: Dict) -> Dict:
+        if self.metrics:
+            self.metrics.queue_depth.dec(task=task.name)
+        with span("prompt_build", model.model_name):
+            sys_prompt = task.system_prompt
+            user_prompt = task.user_prompt(case)
+
+        # Run Multiple Times if Configured
+        n_runs = EVAL_CONFIG.get("n_runs", 1)
+
+        run_responses = []
+        run_metrics_list = []
+
+        for _ in range(n_runs):
+            if self.metrics:
+                self.metrics.in_flight.inc(model=model.model_name)
+            try:
+                with span("generate", model.model_name):
+                    response = model.generate(sys_prompt, user_prompt, **task.generation)
+            finally:
+                if self.metrics:
+                    self.metrics.in_flight.dec(model=model.model_name)
+            run_responses.append(response)
+
+            # Log cost (each run costs money)
+            self.cost_tracker.log_request(
+                model=model.model_name,
+                task=task.name,
+                input_tokens=response.input_tokens,
+                output_tokens=response.output_tokens,
+                latency_ms=response.latency_ms,
+                cost=response.cost_usd,
+                success=response.error is None,
             )
-            final_response = run_responses[first_valid_idx]
-            avg_metrics = run_metrics_list[first_valid_idx]  # Default to first run
 
-            # Add Consistency Metric
-            response_contents = [r.content for r in run_responses]
+            if response.error:
+                run_metrics_list.append({})
+                continue
+
+            # Single Run Metrics (parsing is cached, so scoring reuses it)
+            with span("json_parse", model.model_name):
+                extract_json(response.content)
+            if task.score_batch is not None:
+                # Scored with the rest of the task in evaluate_tasks
+                run_metrics_list.append({})
+                continue
+            with span("metric_scoring", model.model_name):
+                m = task.score(case["input"], response.content)
+
+            run_metrics_list.append(m)
+
+        # Aggregate Results
+        # Pick the first valid response for display/base metrics
+        first_valid_idx = next(
+            (i for i, r in enumerate(run_responses) if not r.error), 0
+        )
+        final_response = run_responses[first_valid_idx]
+        avg_metrics = run_metrics_list[first_valid_idx]  # Default to first run
+
+        # Add Consistency Metric
+        response_contents = [r.content for r in run_responses]
+        with span("consistency", model.model_name):
             consistency = calculate_consistency_metrics(response_contents)
-            avg_metrics.update(consistency)
-
-            return {
-                "task": task_name,
-                "case_id": case.get("id"),
-                "model": model.model_name,
-                "response": final_response.content,
-                "metrics": avg_metrics,
-                "success": final_response.error is None,
-                "error": final_response.error,
-                "run_count": n_runs,
-            }
-
-        # Run in parallel per model? Or sequential per model, parallel per case?
-        # Parallel per (model, case) combination
-        tasks = []
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            future_to_meta = {}
+        avg_metrics.update(consistency)
+
+        return {
+            "task": task.name,
+            "case_id": case.get("id"),
+            "model": model.model_name,
+            "response": final_response.content,
+            "metrics": avg_metrics,
+            "success": final_response.error is None,
+            "error": final_response.error,
+            "run_count": n_runs,
+            "run_responses": response_contents,
+        }
+
+    @staticmethod
+    def _score_batch(task: Task, results: List[Tuple[Dict, Dict]]):
+        """Merge `task.score_batch` metrics into successful (result, case input) pairs."""
+        scored = [(r, inp) for r, inp in results if r["success"]]
+        if not scored:
+            return
+        with span("metric_scoring"):
+            columns = task.score_batch(
+                [inp for _, inp in scored], [r["response"] for r, _ in scored]
+            )
+        for i, (r, _) in enumerate(scored):
+            r["metrics"].update({name: float(col[i]) for name, col in columns.items()})
+
+    def evaluate_tasks(self, tasks: Sequence[Task]):
+        """Run every (model, task, case) through one worker pool.
+
+        Cases of different tasks are interleaved, so their requests are in
+        flight together and backends that batch concurrent calls can mix them.
+        """
+        print(f"Starting evaluation for tasks: {', '.join(t.name for t in tasks)}")
+
+        # Round-robin over tasks: t1c1, t2c1, t1c2, t2c2, ...
+        queues = [[(task, case) for case in task.cases] for task in tasks]
+        interleaved = [
+            item for group in itertools.zip_longest(*queues) for item in group if item
+        ]
+
+        futures = {}
+        by_task: Dict[str, List[Dict]] = {task.name: [] for task in tasks}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
             for model in self.models:
-                for case in cases:
-                    future = executor.submit(process_case, model, case)
-                    tasks.append(future)
-
-            for future in tqdm.tqdm(
-                concurrent.futures.as_completed(tasks),
-                total=len(tasks),
-                desc=f"Eval {task_name}",
-            ):
-                result = future.result()
-                if result:
-                    self.results.append(result)
-
-    def run_all(self):
-        self.evaluate_task("make_persona", PERSONA_GEN_CASES)
+                for task, case in interleaved:
+                    if self.metrics:
+                        self.metrics.queue_depth.inc(task=task.name)
+                    future = executor.submit(self._process_case, model, task, case)
+                    futures[future] = case
+
+            # Batch-scored tasks are scored one chunk of completed cases at a
+            # time, so on_result already sees their metrics
+            pending = set(futures)
+            with tqdm.tqdm(total=len(futures), desc=f"Eval {'+'.join(by_task)}") as progress:
+                while pending:
+                    done, pending = concurrent.futures.wait(
+                        pending, return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    chunk = [(f.result(), futures[f]["input"]) for f in done]
+                    chunk = [(r, inp) for r, inp in chunk if r]
+                    for task in tasks:
+                        if task.score_batch is not None:
+                            self._score_batch(
+                                task, [(r, inp) for r, inp in chunk if r["task"] == task.name]
+                            )
+                    for result, _ in chunk:
+                        by_task[result["task"]].append(result)
+                        if self.on_result:
+                            self.on_result(result)
+                    progress.update(len(done))
+
+        # Semantic consistency is scored per task and model, after every run is
+        # in (the same scope rescoring uses)
+        for task_results in by_task.values():
+            for group in consistency_groups(task_results).values():
+                with span("semantic_consistency"):
+                    semantic = self.consistency_engine.score_cases(
+                        [r["run_responses"] for r in group]
+                    )
+                for r, score in zip(group, semantic):
+                    r["metrics"]["semantic_consistency"] = float(score)
+            self.results.extend(task_results)
+
+    def evaluate_task(self, task: Union[str, Task], cases: Optional[List[Dict]] = None):
+        """Evaluate one task, optionally on `cases` instead of the task's own."""
+        if isinstance(task, str):
+            task = get_task(task)
+        if cases is not None:
+            task = dataclasses.replace(task, cases=cases)
+        self.evaluate_tasks([task])
+
+    def run_all(self, task_names: Optional[Sequence[str]] = None):
+        """Evaluate the selected registered tasks (default: all) in one pass."""
+        self.evaluate_tasks(select_tasks(task_names))
         return self.results
@@ -0,0 +1,234 @@
+"""Load-test sweep: throughput and latency versus concurrency and batch size.
+
+Each sweep point sends a fixed number of requests through a pool of
+`concurrency` workers; every worker sends `batch_size` prompts per call
+(`generate_batch`). Warm-up calls run before the timed window so the numbers
+reflect steady state rather than first-call compilation and cache fills.
+"""
+import concurrent.futures
+import itertools
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from models.unified_interface import UnifiedLLMInterface
+from .tasks import Task
+
+# Columns identifying a sweep series (one curve over concurrency)
+SERIES_COLUMNS = ["batch_size", "max_new_tokens"]
+
+
+def build_prompts(tasks: Sequence[Task]) -> List[Tuple[str, str]]:
+    return [prompt for task in tasks for prompt in task.prompts()]
+
+
+def enable_fast_decode(
+    model: UnifiedLLMInterface, prompts: Sequence[Tuple[str, str]], max_new_tokens: int = 512
+) -> Dict:
+    """Put a local model in fast decode mode (static KV cache + compiled forward).
+
+    Returns its warmup stats, or {} for backends that don't support it.
+    """
+    if not hasattr(model, "enable_fast_decode"):
+        print(f"[{model.model_name}] Fast decode only applies to models loaded in this process")
+        return {}
+    stats = model.enable_fast_decode(list(prompts), max_new_tokens=max_new_tokens)
+    if stats:
+        print(
+            f"[{model.model_name}] Fast decode ready: static KV cache of "
+            f"{stats['cache_len']} tokens, {stats['prompt_buckets']} prompt buckets, "
+            f"warmup {stats['warmup_s']:.1f}s"
+        )
+    return stats
+
+
+def _cuda_available() -> bool:
+    torch = sys.modules.get("torch")
+    return torch is not None and torch.cuda.is_available()
+
+
+def _reset_peak_memory():
+    if _cuda_available():
+        sys.modules["torch"].cuda.reset_peak_memory_stats()
+
+
+class _RssSampler:
+    """Peak resident memory of this process while the block runs.
+
+    Polls /proc/self/statm from a background thread. Where it doesn't exist
+    (macOS, Windows) `peak_mb` is NaN rather than a misleading number.
+    """
+
+    def __init__(self, interval_s: float = 0.05):
+        self.interval_s = interval_s
+        self.peak_mb = float("nan")
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._page_mb = os.sysconf("SC_PAGE_SIZE") / (1024 * 1024) if hasattr(os, "sysconf") else 0.0
+
+    def _rss_mb(self) -> Optional[float]:
+        try:
+            with open("/proc/self/statm", "rb") as f:
+                return int(f.read().split()[1]) * self._page_mb
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def _run(self):
+        while True:
+            rss = self._rss_mb()
+            if rss is not None:
+                self.peak_mb = rss if np.isnan(self.peak_mb) else max(self.peak_mb, rss)
+            if self._stop.wait(self.interval_s):
+                return
+
+    def __enter__(self):
+        if self._rss_mb() is not None:
+            self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+
+
+def run_point(
+    model: UnifiedLLMInterface,
+    prompts: Sequence[Tuple[str, str]],
+    concurrency: int,
+    batch_size: int = 1,
+    max_new_tokens: Optional[int] = None,
+    n_requests: int = 50,
+    warmup_calls: int = 1,
+) -> Dict:
+    """Measure one (concurrency, batch_size, max_new_tokens) point."""
+    gen_kwargs = {"temperature": 0.0}
+    if max_new_tokens is not None:
+        gen_kwargs["max_new_tokens"] = max_new_tokens
+
+    cycle = itertools.cycle(prompts)
+    lock = threading.Lock()
+
+    def next_batch() -> List[Tuple[str, str]]:
+        with lock:
+            return [next(cycle) for _ in range(batch_size)]
+
+    for _ in range(warmup_calls):
+        model.generate_batch(next_batch(), **gen_kwargs)
+
+    _reset_peak_memory()
+    n_calls = max(1, -(-n_requests // batch_size))  # ceil
+    latencies, output_tokens, peak_mem = [], 0, 0.0
+    errors = 0
+
+    def call(_):
+        return model.generate_batch(next_batch(), **gen_kwargs)
+
+    start = time.perf_counter()
+    with _RssSampler() as rss, concurrent.futures.ThreadPoolExecutor(
+        max_workers=concurrency
+    ) as executor:
+        for responses in executor.map(call, range(n_calls)):
+            for r in responses:
+                latencies.append(r.latency_ms)
+                output_tokens += r.output_tokens
+                peak_mem = max(peak_mem, r.gpu_memory_mb)
+                errors += r.error is not None
+    elapsed = time.perf_counter() - start
+    if not _cuda_available():
+        # CPU and API backends: host memory of the process during this point
+        peak_mem = rss.peak_mb
+
+    lat = np.asarray(latencies, dtype=float)
+    completed = len(latencies)
+    return {
+        "concurrency": concurrency,
+        "batch_size": batch_size,
+        "max_new_tokens": max_new_tokens if max_new_tokens is not None else -1,
+        "requests": completed,
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "requests_per_sec": completed / elapsed if elapsed > 0 else 0.0,
+        "output_tokens_per_sec": output_tokens / elapsed if elapsed > 0 else 0.0,
+        "p50_latency_ms": float(np.percentile(lat, 50)) if completed else float("nan"),
+        "p99_latency_ms": float(np.percentile(lat, 99)) if completed else float("nan"),
+        "peak_memory_mb": peak_mem,
+    }
+
+
+def find_knee(series: pd.DataFrame, min_gain: float = 0.1) -> Optional[int]:
+    """Concurrency where throughput saturates.
+
+    Walking up the concurrency levels, the knee is the last level whose next
+    step still improved requests/sec by at least `min_gain` (relative) per
+    doubling of concurrency. Beyond it, more concurrency only adds latency.
+    """
+    series = series.sort_values("concurrency")
+    levels = series["concurrency"].to_numpy()
+    rps = series["requests_per_sec"].to_numpy()
+    if len(levels) == 0:
+        return None
+    for i in range(len(levels) - 1):
+        doublings = np.log2(levels[i + 1] / levels[i]) or 1.0
+        gain = (rps[i + 1] / rps[i] - 1) / doublings if rps[i] > 0 else 0.0
+        if gain < min_gain:
+            return int(levels[i])
+    return int(levels[-1])
+
+
+def find_knees(results: pd.DataFrame, min_gain: float = 0.1) -> pd.DataFrame:
+    """One row per (batch_size, max_new_tokens) series with its knee point."""
+    rows = []
+    for key, series in results.groupby(SERIES_COLUMNS):
+        knee = find_knee(series, min_gain)
+        at_knee = series[series["concurrency"] == knee].iloc[0]
+        rows.append(
+            {
+                "batch_size": key[0],
+                "max_new_tokens": key[1],
+                "knee_concurrency": knee,
+                "requests_per_sec": at_knee["requests_per_sec"],
+                "output_tokens_per_sec": at_knee["output_tokens_per_sec"],
+                "p99_latency_ms": at_knee["p99_latency_ms"],
+                "peak_memory_mb": at_knee["peak_memory_mb"],
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def run_sweep(
+    model: UnifiedLLMInterface,
+    prompts: Sequence[Tuple[str, str]],
+    concurrency_levels: Sequence[int],
+    batch_sizes: Sequence[int] = (1,),
+    max_new_tokens: Sequence[Optional[int]] = (None,),
+    n_requests: int = 50,
+    warmup_calls: int = 1,
+) -> pd.DataFrame:
+    rows = []
+    for tokens in max_new_tokens:
+        for batch_size in batch_sizes:
+            for concurrency in sorted(concurrency_levels):
+                point = run_point(
+                    model,
+                    prompts,
+                    concurrency,
+                    batch_size=batch_size,
+                    max_new_tokens=tokens,
+                    n_requests=n_requests,
+                    warmup_calls=warmup_calls,
+                )
+                print(
+                    f"  c={concurrency:<3} batch={batch_size:<3} max_new_tokens={tokens}: "
+                    f"{point['requests_per_sec']:.2f} req/s, "
+                    f"{point['output_tokens_per_sec']:.1f} tok/s, "
+                    f"p99 {point['p99_latency_ms']:.0f} ms"
+                )
+                rows.append(point)
+    return pd.DataFrame(rows)
@@ -1,70 +1,63 @@
-import json
-import re
 from typing import List, Dict, Any, Optional
-
-
-def extract_json(text: str) -> Optional[Dict[str, Any]]:
-    """Extract JSON from text, handling markdown blocks."""
-    try:
-        # Try direct parse
-        return json.loads(text)
-    except json.JSONDecodeError:
-        pass
-
-    # Try finding markdown code blocks
-    match = re.search(r"```(?:json)?\s*([\s\S]*?)\s*```", text)
-    if match:
-        try:
-            return json.loads(match.group(1))
-        except json.JSONDecodeError:
-            pass
-
-    # Try finding first { and last }
-    try:
-        start = text.find("{")
-        end = text.rfind("}")
-        if start != -1 and end != -1:
-            return json.loads(text[start : end + 1])
-    except json.JSONDecodeError:
-        pass
-
-    return None
+from .parsing import extract_json, validate_persona
+
+PERSONA_METRICS = [
+    "json_validity",
+    "field_completeness",
+    "value_accuracy",
+    "schema_compliance",
+    "cot_depth_score",
+    "persona_specificity",
+    "safety_consistency",
+]
+
+# Keywords: contexts, emotions, specifics
+DETAIL_KEYWORDS = [
+    "퇴근",
+    "주말",
+    "스트레스",
+    "혼밥",
+    "데이트",
+    "회식",
+    "다이어트",
+    "건강",
+    "가성비",
+    "분위기",
+    "조용한",
+    "시끄러운",
+]
+
+# Logical connectives that indicate an actual chain of reasoning
+LOGIC_KEYWORDS = [
+    "때문에",
+    "위해",
+    "하므로",
+    "따라서",
+    "추론",
+    "생각",
+    "고려",
+    "based on",
+    "implies",
+]
 
 
 def calculate_persona_generation_metrics(
     input_data: Dict, response_text: str
 ) -> Dict[str, float]:
-    metrics = {
-        "json_validity": 0.0,
-        "field_completeness": 0.0,
-        "value_accuracy": 0.0,
-        "schema_compliance": 0.0,
-        "cot_depth_score": 0.0,
-        "persona_specificity": 0.0,
-        "safety_consistency": 0.0,
-    }
-
-    data = extract_json(response_text)
+    return score_persona_data(input_data, extract_json(response_text))
+
+
+def score_persona_data(input_data: Dict, data: Optional[Dict]) -> Dict[str, float]:
+    """Persona metrics of an already parsed output (None if it didn't parse)."""
+    metrics = {name: 0.0 for name in PERSONA_METRICS}
+
     if data:
         metrics["json_validity"] = 1.0
 
-        required_fields = [
-            "reasoning",
-            "name",
-            "gender",
-            "age_group",
-            "allergies",
-            "preferred_food_categories",
-            "preferred_ingredients",
-            "description",
-        ]
-        present_fields = [f for f in required_fields if f in data]
-        metrics["field_completeness"] = len(present_fields) / len(required_fields)
+        completeness, valid_types = validate_persona(data)
+        metrics["field_completeness"] = completeness
 
         # Schema compliance
-        valid_types = True
-        if "allergies" in data and not isinstance(data["allergies"], list):
-            valid_types = False
         metrics["schema_compliance"] = (
             1.0 if valid_types and metrics["field_completeness"] == 1.0 else 0.0
         )
@@ -95,45 +88,19 @@ def calculate_persona_generation_metrics(
         # 3. Persona Specificity Score
         # Check description for specific keywords indicating depth
         desc = data.get("description", "")
-        # Keywords: contexts, emotions, specifics
-        detail_keywords = [
-            "퇴근",
-            "주말",
-            "스트레스",
-            "혼밥",
-            "데이트",
-            "회식",
-            "다이어트",
-            "건강",
-            "가성비",
-            "분위기",
-            "조용한",
-            "시끄러운",
-        ]
         specificity_score = 0.0
         if len(desc) > 30:
             specificity_score += 0.4
-        found_keywords = [k for k in detail_keywords if k in desc]
+        found_keywords = [k for k in DETAIL_KEYWORDS if k in desc]
         specificity_score += min(0.6, len(found_keywords) * 0.2)
         metrics["persona_specificity"] = specificity_score
 
         # 4. Reasoniong Depth (CoT)
         reasoning = data.get("reasoning", "")
-        logic_keywords = [
-            "때문에",
-            "위해",
-            "하므로",
-            "따라서",
-            "추론",
-            "생각",
-            "고려",
-            "based on",
-            "implies",
-        ]
         cot_score = 0.0
         if len(reasoning) > 50:
             cot_score += 0.3
-        if any(k in reasoning for k in logic_keywords):
+        if any(k in reasoning for k in LOGIC_KEYWORDS):
             cot_score += 0.4
         # Bonus for linking two facts
         if len(reasoning) > 100:
@@ -143,26 +110,39 @@ def calculate_persona_generation_metrics(
     return metrics
 
 
+CONSISTENCY_FIELDS = ["name", "allergies", "preferred_food_categories"]
+
+
+def _canonical(value: Any) -> Any:
+    """Order-insensitive, hashable form of a field value."""
+    if isinstance(value, (list, tuple, set)):
+        return frozenset(_canonical(v) for v in value)
+    if isinstance(value, dict):
+        return str(sorted(value.items(), key=str))
+    return value
+
+
 def calculate_consistency_metrics(responses: List[str]) -> Dict[str, float]:
-    """Check consistency across multiple runs (simple string/json similarity)"""
+    """Check consistency of core fields across multiple runs.
+
+    List fields are compared as sets, so the same allergies in a different
+    order still count as the same answer.
+    """
     if not responses:
         return {"consistency": 0.0}
     if len(responses) == 1:
         return {"consistency": 1.0}
 
-    # Extract key values for comparison (hash of core fields)
-    hashes = []
+    # Extract key values for comparison (canonical form of core fields)
+    keys = []
     for r in responses:
         data = extract_json(r)
         if not data:
-            hashes.append("error")
+            keys.append("error")
             continue
         # Compare core fields only
-        core_data = {
-            k: data.get(k) for k in ["name", "allergies", "preferred_food_categories"]
-        }
-        hashes.append(str(core_data))
+        keys.append(tuple(_canonical(data.get(k)) for k in CONSISTENCY_FIELDS))
 
-    unique_hashes = set(hashes)
-    consistency_score = 1.0 / len(unique_hashes) if unique_hashes else 0.0
+    unique_keys = set(keys)
+    consistency_score = 1.0 / len(unique_keys) if unique_keys else 0.0
     return {"consistency": consistency_score}
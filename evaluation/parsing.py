@@ -0,0 +1,154 @@
+import json
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Use a faster decoder when available (same semantics for valid JSON input)
+try:
+    import orjson
+
+    _loads = orjson.loads
+    _DECODE_ERRORS = (orjson.JSONDecodeError, ValueError)
+except ImportError:
+    _loads = json.loads
+    _DECODE_ERRORS = (json.JSONDecodeError, ValueError)
+
+# Number of distinct responses kept in the shared parse cache
+PARSE_CACHE_SIZE = 65536
+
+
+# Structural characters of the object scan, and the rest of a JSON string
+_BRACE_OR_QUOTE = re.compile(r'[{}"]')
+_STRING_TAIL = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+
+
+def _loads_dict(text: str) -> Optional[Dict[str, Any]]:
+    try:
+        data = _loads(text)
+    except _DECODE_ERRORS:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _json_span(text: str) -> Optional[str]:
+    """Source text of the first JSON object in text that decodes to a dict.
+
+    Usually the object runs from the first `{` to the last `}` (bare or
+    fenced output) and one C-level decode settles it. Otherwise one scan
+    matches braces outside JSON strings; each outermost balanced span is
+    decoded as soon as it closes. Spans inside braces that never close
+    (a stray "{" before the payload) are decoded after the scan. The
+    candidate spans are disjoint, so the work stays linear in the text.
+    """
+    first = text.find("{")
+    if first == -1:
+        return None
+    last = text.rfind("}")
+    if last > first and _loads_dict(text[first : last + 1]) is not None:
+        return text[first : last + 1]
+
+    stack: List[int] = []
+    closed: List[Tuple[int, int, int]] = []  # (start, end, open braces left)
+    pos = first
+    while True:
+        if not stack:
+            # Outside any object only the next "{" matters
+            pos = text.find("{", pos)
+            if pos == -1:
+                break
+            stack.append(pos)
+            pos += 1
+            continue
+        match = _BRACE_OR_QUOTE.search(text, pos)
+        if match is None:
+            break
+        token, pos = match.group(), match.end()
+        if token == '"':
+            tail = _STRING_TAIL.match(text, pos)
+            if tail is None:
+                break  # Unterminated string runs to the end of the text
+            pos = tail.end()
+        elif token == "{":
+            stack.append(match.start())
+        else:
+            start = stack.pop()
+            if not stack:
+                if _loads_dict(text[start:pos]) is not None:
+                    return text[start:pos]
+            else:
+                closed.append((start, pos, len(stack)))
+
+    # A closed span is outermost if none of the braces open around it ever
+    # closed, i.e. the stack never dropped below its height afterwards
+    outermost = []
+    lowest = len(stack)
+    for start, end, height in reversed(closed):
+        if height <= lowest:
+            outermost.append((start, end))
+        lowest = min(lowest, height)
+    for start, end in reversed(outermost):
+        if _loads_dict(text[start:end]) is not None:
+            return text[start:end]
+    return None
+
+
+def _extract_json(text: str) -> Optional[Dict[str, Any]]:
+    span = _json_span(text)
+    return None if span is None else _loads(span)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _cached_json_span(text: str) -> Optional[str]:
+    return _json_span(text)
+
+
+def extract_json(text: str) -> Optional[Dict[str, Any]]:
+    """Extract JSON from text, handling markdown blocks.
+
+    Where the object sits is cached by response text, so the same output is
+    searched once no matter how many metrics look at it. Each call decodes
+    a fresh dict, which callers may modify.
+    """
+    if not text:
+        return None
+    span = _cached_json_span(text)
+    return None if span is None else _loads(span)
+
+
+def clear_parse_cache():
+    _cached_json_span.cache_clear()
+
+
+# Output schema for the make_persona task
+PERSONA_SCHEMA = {
+    "required": [
+        "reasoning",
+        "name",
+        "gender",
+        "age_group",
+        "allergies",
+        "preferred_food_categories",
+        "preferred_ingredients",
+        "description",
+    ],
+    "types": {"allergies": list},
+}
+
+
+def compile_schema(schema: Dict) -> Callable[[Dict], Tuple[float, bool]]:
+    """Build a validator returning (field_completeness, types_valid) for a dict."""
+    required = tuple(schema.get("required", []))
+    types = tuple(schema.get("types", {}).items())
+    n_required = len(required) or 1
+
+    def validate(data: Dict) -> Tuple[float, bool]:
+        present = sum(1 for f in required if f in data)
+        types_valid = all(
+            isinstance(data[f], t) for f, t in types if f in data
+        )
+        return present / n_required, types_valid
+
+    return validate
+
+
+validate_persona = compile_schema(PERSONA_SCHEMA)
@@ -0,0 +1,255 @@
+"""Offline re-scoring of stored results.
+
+Metrics are grouped by the code that computes them. A group's version is a
+fingerprint of that code and the constants it reads (keyword lists, schema,
+consistency fields), so editing `DETAIL_KEYWORDS` changes the "persona"
+version but leaves "consistency" alone. Modules whose helpers all sit on a
+scoring path (`batch_metrics`, `consistency`, `parsing`) are fingerprinted
+by their whole source. Scores are cached by (group, version, hash of the
+scored output), so re-scoring only computes what a code change actually
+affected.
+"""
+import concurrent.futures
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from . import batch_metrics, consistency, parsing
+from .batch_metrics import score_responses_batch
+from .consistency import ConsistencyEngine, consistency_groups
+from .metrics import (
+    CONSISTENCY_FIELDS,
+    DETAIL_KEYWORDS,
+    LOGIC_KEYWORDS,
+    PERSONA_METRICS,
+    _canonical,
+    calculate_consistency_metrics,
+    score_persona_data,
+)
+
+# group -> metric names it produces
+METRIC_GROUPS: Dict[str, List[str]] = {
+    "persona": list(PERSONA_METRICS),
+    "consistency": ["consistency"],
+    "semantic_consistency": ["semantic_consistency"],
+}
+
+# Below this many items, scoring in-process beats starting worker processes
+PARALLEL_THRESHOLD = 2000
+
+
+def _fingerprint(*parts) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        if callable(part) or inspect.ismodule(part):
+            h.update(inspect.getsource(part).encode("utf-8"))
+        else:
+            h.update(json.dumps(part, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()[:12]
+
+
+@lru_cache(maxsize=1)
+def _metric_versions() -> Tuple[Tuple[str, str], ...]:
+    versions = {
+        "persona": _fingerprint(
+            batch_metrics,
+            parsing,
+            _score_persona_chunk,
+            score_persona_data,
+            PERSONA_METRICS,
+            DETAIL_KEYWORDS,
+            LOGIC_KEYWORDS,
+        ),
+        "consistency": _fingerprint(
+            calculate_consistency_metrics, _canonical, CONSISTENCY_FIELDS, parsing
+        ),
+        "semantic_consistency": _fingerprint(consistency, parsing),
+    }
+    return tuple(versions.items())
+
+
+def metric_versions() -> Dict[str, str]:
+    """Current code version of every metric group."""
+    return dict(_metric_versions())
+
+
+def _hash(*parts) -> str:
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MetricCache:
+    """SQLite cache of metric values keyed by (group, version, output hash)."""
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS metric_cache ("
+            "grp TEXT NOT NULL, version TEXT NOT NULL, key TEXT NOT NULL, "
+            "value TEXT NOT NULL, PRIMARY KEY (grp, version, key))"
+        )
+
+    def close(self):
+        self._conn.close()
+
+    def get_many(self, group: str, version: str, keys: Iterable[str]) -> Dict[str, Dict]:
+        keys = list(set(keys))
+        found = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 900):
+                chunk = keys[start : start + 900]
+                placeholders = ",".join("?" for _ in chunk)
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM metric_cache WHERE grp = ? AND version = ? "
+                    f"AND key IN ({placeholders})",
+                    (group, version, *chunk),
+                ).fetchall()
+                found.update((k, json.loads(v)) for k, v in rows)
+        return found
+
+    def put_many(self, group: str, version: str, values: Dict[str, Dict]):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO metric_cache VALUES (?, ?, ?, ?)",
+                [(group, version, k, json.dumps(v)) for k, v in values.items()],
+            )
+
+
+def _score_persona_chunk(items: List[Tuple[Dict, str]]) -> List[Dict[str, float]]:
+    frame = score_responses_batch(
+        [inp for inp, _ in items], [text for _, text in items], as_frame=True
+    )
+    return frame.to_dict("records")
+
+
+def _score_consistency_chunk(items: List[List[str]]) -> List[Dict[str, float]]:
+    return [calculate_consistency_metrics(runs) for runs in items]
+
+
+def _run_chunks(fn, items: List, workers: int) -> List:
+    if workers <= 1 or len(items) < PARALLEL_THRESHOLD:
+        return fn(items)
+    size = -(-len(items) // (workers * 4))  # ceil; a few chunks per worker
+    chunks = [items[i : i + size] for i in range(0, len(items), size)]
+    out = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        for part in executor.map(fn, chunks):
+            out.extend(part)
+    return out
+
+
+def _apply_cached(
+    cache: Optional[MetricCache],
+    group: str,
+    keyed: Dict[str, object],
+    compute,
+    workers: int,
+) -> Tuple[Dict[str, Dict], int]:
+    """Values for every key in `keyed`, computing only cache misses."""
+    version = metric_versions()[group]
+    values = cache.get_many(group, version, keyed) if cache else {}
+    missing = [k for k in keyed if k not in values]
+    if missing:
+        computed = dict(zip(missing, _run_chunks(compute, [keyed[k] for k in missing], workers)))
+        if cache:
+            cache.put_many(group, version, computed)
+        values.update(computed)
+    return values, len(missing)
+
+
+def rescore_results(
+    results: List[Dict],
+    case_inputs: Dict[str, Dict],
+    groups: Optional[Iterable[str]] = None,
+    cache: Optional[MetricCache] = None,
+    workers: Optional[int] = None,
+) -> Dict[str, Dict[str, int]]:
+    """Recompute metric `groups` (default: all) of `results` in place.
+
+    `case_inputs` maps make_persona case_id to the case's input data.
+    Returns per-group counts of scored, freshly computed and skipped results.
+    """
+    groups = list(groups) if groups is not None else list(METRIC_GROUPS)
+    workers = workers or os.cpu_count() or 1
+    report = {}
+
+    if "persona" in groups:
+        keyed, targets, skipped = {}, [], 0
+        for r in results:
+            inp = case_inputs.get(str(r.get("case_id")))
+            # The persona metrics only apply to the make_persona task
+            if r.get("task", "make_persona") != "make_persona":
+                inp = None
+            if inp is None or not r.get("success"):
+                skipped += 1
+                continue
+            key = _hash(inp, r.get("response") or "")
+            keyed[key] = (inp, r.get("response") or "")
+            targets.append((r, key))
+        values, computed = _apply_cached(cache, "persona", keyed, _score_persona_chunk, workers)
+        for r, key in targets:
+            r.setdefault("metrics", {}).update(values[key])
+        report["persona"] = {"scored": len(targets), "computed": computed, "skipped": skipped}
+
+    if "consistency" in groups:
+        keyed, targets, skipped = {}, [], 0
+        for r in results:
+            runs = r.get("run_responses")
+            if not runs:
+                skipped += 1  # Results stored before run_responses existed
+                continue
+            key = _hash(runs)
+            keyed[key] = list(runs)
+            targets.append((r, key))
+        values, computed = _apply_cached(
+            cache, "consistency", keyed, _score_consistency_chunk, workers
+        )
+        for r, key in targets:
+            r.setdefault("metrics", {}).update(values[key])
+        report["consistency"] = {"scored": len(targets), "computed": computed, "skipped": skipped}
+
+    if "semantic_consistency" in groups:
+        # The TF-IDF vocabulary is fitted per task, so scores depend on the whole task corpus
+        scorable = [r for r in results if r.get("run_responses")]
+        skipped = len(results) - len(scorable)
+        scored = computed = 0
+        version = metric_versions()["semantic_consistency"]
+        engine = ConsistencyEngine()
+        # Same fit scope as the live Evaluator: one vocabulary per task and model
+        for group in consistency_groups(scorable).values():
+            corpus = _hash([r["run_responses"] for r in group])
+            keys = [_hash(corpus, r["run_responses"]) for r in group]
+            values = cache.get_many("semantic_consistency", version, keys) if cache else {}
+            if len(values) < len(set(keys)):
+                scores = engine.score_cases([r["run_responses"] for r in group])
+                fresh = {
+                    k: {"semantic_consistency": float(s)} for k, s in zip(keys, scores)
+                }
+                computed += len(fresh)
+                if cache:
+                    cache.put_many("semantic_consistency", version, fresh)
+                values = fresh
+            for r, key in zip(group, keys):
+                r.setdefault("metrics", {}).update(values[key])
+            scored += len(group)
+        report["semantic_consistency"] = {"scored": scored, "computed": computed, "skipped": skipped}
+
+    return report
+
+
+def changed_groups(stored_versions: Optional[Dict[str, str]]) -> List[str]:
+    """Metric groups whose code changed since a run was scored (all if unknown)."""
+    current = metric_versions()
+    if not stored_versions:
+        return list(current)
+    return [g for g, v in current.items() if stored_versions.get(g) != v]
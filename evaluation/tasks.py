@@ -0,0 +1,78 @@
+"""Evaluation task registry.
+
+A task declares its cases, system prompt, how a case becomes the user
+prompt, the metric function scoring one response and the output schema it
+expects. The Evaluator runs any selection of registered tasks against a
+loaded model in one pass, so adding a task does not add a model load.
+"""
+import json
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from config import SYSTEM_PROMPTS
+from .batch_metrics import score_responses_batch
+from .metrics import calculate_persona_generation_metrics
+from .parsing import PERSONA_SCHEMA
+from .test_cases import PERSONA_GEN_CASES
+
+
+def build_user_prompt(case: Dict) -> str:
+    return f"User Data: {json.dumps(case['input'], ensure_ascii=False)}"
+
+
+@dataclass
+class Task:
+    name: str
+    cases: List[Dict]
+    system_prompt: str
+    # (case input, response text) -> metric name -> value
+    score: Callable[[Dict, str], Dict[str, float]]
+    # Expected output fields, in `parsing.compile_schema` form
+    schema: Dict = field(default_factory=dict)
+    user_prompt: Callable[[Dict], str] = build_user_prompt
+    # Extra generate() kwargs for every request of the task
+    generation: Dict = field(default_factory=lambda: {"temperature": 0.0})
+    # Optional (case inputs, response texts) -> metric name -> column of values,
+    # equal to `score` per row; the Evaluator then scores a task's results at once
+    score_batch: Optional[Callable[[Sequence[Dict], Sequence[str]], Dict]] = None
+
+    def prompts(self) -> List[Tuple[str, str]]:
+        """(system prompt, user prompt) of every case."""
+        return [(self.system_prompt, self.user_prompt(case)) for case in self.cases]
+
+
+TASKS: Dict[str, Task] = {}
+
+
+def register_task(task: Task) -> Task:
+    if task.name in TASKS:
+        raise ValueError(f"Task already registered: {task.name}")
+    TASKS[task.name] = task
+    return task
+
+
+def get_task(name: str) -> Task:
+    if name not in TASKS:
+        raise ValueError(f"Unknown task: {name} (available: {', '.join(TASKS)})")
+    return TASKS[name]
+
+
+def select_tasks(names: Optional[Sequence[str]] = None) -> List[Task]:
+    """Registered tasks by name; None or "all" selects every task."""
+    if names is None or isinstance(names, str):
+        names = [names or "all"]
+    if "all" in names:
+        return list(TASKS.values())
+    return [get_task(name) for name in names]
+
+
+register_task(
+    Task(
+        name="make_persona",
+        cases=PERSONA_GEN_CASES,
+        system_prompt=SYSTEM_PROMPTS["make_persona"],
+        score=calculate_persona_generation_metrics,
+        schema=PERSONA_SCHEMA,
+        score_batch=score_responses_batch,
+    )
+)
@@ -0,0 +1,127 @@
+"""Background evaluation worker.
+
+The dashboard submits a job to the JobStore and starts this module in a
+separate process:
+
+    python -m evaluation.worker --job-id <id> --db results/jobs.sqlite
+
+Per-case results are written to the store as they complete, so any number of
+dashboard sessions can watch the same job while it runs.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import traceback
+from typing import List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import create_model, release_memory
+from evaluation.evaluators import Evaluator
+from evaluation.tasks import select_tasks
+from utils.cost_tracker import CostTracker
+from utils.job_store import JobStore
+from utils.report_generator import ReportGenerator
+from utils.run_catalog import RunCatalog
+
+
+def launch_worker(job_id: str, db_path: str, results_dir: str) -> int:
+    """Start a detached worker process for `job_id` and return its pid."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    os.makedirs(results_dir, exist_ok=True)
+    log = open(os.path.join(results_dir, f"job_{job_id}.log"), "ab")
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "evaluation.worker",
+            "--job-id",
+            job_id,
+            "--db",
+            os.path.abspath(db_path),
+            "--output",
+            os.path.abspath(results_dir),
+        ],
+        cwd=root,
+        stdout=log,
+        stderr=subprocess.STDOUT,
+        start_new_session=True,  # Survives Streamlit reruns and restarts
+    )
+    log.close()  # The child holds its own copy of the descriptor
+    return proc.pid
+
+
+def run_job(job_id: str, db_path: str, results_dir: str):
+    store = JobStore(db_path)
+    job = store.get_job(job_id)
+    if job is None:
+        raise ValueError(f"Unknown job: {job_id}")
+
+    model_names: List[str] = job["models"]
+    store.update(
+        job_id,
+        status="running",
+        pid=os.getpid(),
+        total_cases=len(model_names) * sum(len(t.cases) for t in select_tasks()),
+    )
+
+    tracker = CostTracker()
+    all_results = []
+    errors = []
+    try:
+        for name in model_names:
+            store.update(job_id, current_model=name)
+            current_model = evaluator = None
+            try:
+                current_model = create_model(name)
+                evaluator = Evaluator(
+                    [current_model],
+                    tracker,
+                    on_result=lambda r: store.add_result(job_id, r),
+                )
+                run_results = evaluator.run_all()
+                # Final results carry batch metrics (semantic consistency)
+                for r in run_results:
+                    store.add_result(job_id, r)
+                all_results.extend(run_results)
+            except Exception as e:
+                errors.append(f"{name}: {e}")
+            finally:
+                # The evaluator references the model too; drop both before
+                # release_memory() collects and empties the CUDA cache
+                del current_model
+                evaluator = None
+                release_memory()
+            store.update(job_id, model_stats=tracker.get_model_stats())
+
+        paths = ReportGenerator(results_dir).generate_report(
+            all_results,
+            model_stats=tracker.get_model_stats(),
+            catalog=RunCatalog(os.path.join(results_dir, "runs.sqlite")),
+        )
+        store.update(
+            job_id,
+            status="done",
+            current_model=None,
+            report_path=paths["report"],
+            error="\n".join(errors) or None,
+        )
+    except Exception:
+        store.update(job_id, status="failed", error=traceback.format_exc())
+        raise
+    finally:
+        store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a queued evaluation job")
+    parser.add_argument("--job-id", required=True)
+    parser.add_argument("--db", default="results/jobs.sqlite")
+    parser.add_argument("--output", default="results")
+    args = parser.parse_args()
+    run_job(args.job_id, args.db, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import sys
+import os
+import argparse
+
+# Ensure we can import the package modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import MODEL_SERVER_URL
+from models import create_model, release_memory, resolve_backend
+from evaluation.loadtest import build_prompts, enable_fast_decode, find_knees, run_sweep
+from evaluation.tasks import select_tasks
+from utils.report_generator import ReportGenerator
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Sweep concurrency / batch size / max_new_tokens for one model"
+    )
+    parser.add_argument("--model", required=True, help="Any configured model name")
+    parser.add_argument(
+        "--concurrency", nargs="+", type=int, default=[1, 2, 4, 8, 16, 32]
+    )
+    parser.add_argument(
+        "--batch-sizes",
+        nargs="+",
+        type=int,
+        default=[1, 2, 4, 8],
+        help="Prompts per generate call (local backends only)",
+    )
+    parser.add_argument(
+        "--max-new-tokens",
+        nargs="+",
+        type=int,
+        default=[256, 512],
+        help="Generation limits to sweep (local backends only)",
+    )
+    parser.add_argument(
+        "--requests", type=int, default=50, help="Timed requests per sweep point"
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=1, help="Untimed calls before each sweep point"
+    )
+    parser.add_argument(
+        "--min-gain",
+        type=float,
+        default=0.1,
+        help="Throughput gain per doubling below which a series is saturated",
+    )
+    parser.add_argument(
+        "--server-url",
+        default=None,
+        help="Load-test a local model through a shared serve.py endpoint",
+    )
+    parser.add_argument(
+        "--tasks", nargs="+", default=["all"], help="Tasks whose prompts to send (default: all)"
+    )
+    parser.add_argument(
+        "--continuous-batching",
+        action="store_true",
+        help="Local models admit concurrent requests into a running decode batch",
+    )
+    parser.add_argument(
+        "--batch-slots", type=int, default=8, help="Sequences decoded together per model"
+    )
+    parser.add_argument(
+        "--fast-decode",
+        action="store_true",
+        help="Static KV cache + torch.compile for local models (warmup reported separately)",
+    )
+    parser.add_argument("--output", default="results", help="Output directory")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    backend, _ = resolve_backend(args.model)
+    if backend == "hf_local" and not (args.server_url or MODEL_SERVER_URL):
+        batch_sizes, max_new_tokens = args.batch_sizes, args.max_new_tokens
+    else:
+        # API calls are single-prompt and the server decides generation length
+        batch_sizes, max_new_tokens = [1], [None]
+
+    print(f"[{args.model}] Loading...")
+    local_options = {}
+    if args.continuous_batching:
+        local_options = {"continuous_batching": True, "max_batch_slots": args.batch_slots}
+    model = create_model(args.model, server_url=args.server_url, local_options=local_options)
+    prompts = build_prompts(select_tasks(args.tasks))
+    fast_decode = {}
+    try:
+        if args.fast_decode:
+            fast_decode = enable_fast_decode(model, prompts, max_new_tokens=max(max_new_tokens))
+        results = run_sweep(
+            model,
+            prompts,
+            args.concurrency,
+            batch_sizes=batch_sizes,
+            max_new_tokens=max_new_tokens,
+            n_requests=args.requests,
+            warmup_calls=args.warmup,
+        )
+    finally:
+        del model
+        release_memory()
+
+    knees = find_knees(results, min_gain=args.min_gain)
+    ReportGenerator(args.output).generate_loadtest_report(
+        args.model, results, knees, fast_decode=fast_decode
+    )
+
+
+if __name__ == "__main__":
+    main()
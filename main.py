@@ -1,16 +1,72 @@
 import sys
 import os
 import argparse
-from typing import List
+import concurrent.futures
+import contextlib
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
 
 # Ensure we can import the package modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config import API_MODELS, LOCAL_MODELS, OPENAI_API_KEY, GOOGLE_API_KEY
-from models import UnifiedLLMInterface, OpenAIModel, LocalHuggingFaceModel
+from config import API_MODELS, LOCAL_MODELS
+from models import create_model, release_memory
 from evaluation.evaluators import Evaluator
+from evaluation.loadtest import build_prompts, enable_fast_decode
+from evaluation.tasks import TASKS, select_tasks
 from utils.cost_tracker import CostTracker
 from utils.report_generator import ReportGenerator
+from utils.run_catalog import RunCatalog
+from utils.live_metrics import EvalMetrics, start_metrics_server
+from utils.profiling import enable_profiling, span, trace_run
+
+
+def load_model(name: str, server_url: Optional[str], live_metrics=None, **kwargs):
+    """Create one configured model, or None (with the reason printed) if it can't be."""
+    print(f"\n[{name}] Initializing & Loading...")
+    load_start = time.perf_counter()
+    try:
+        with span("model_load", name):
+            model = create_model(name, server_url=server_url, **kwargs)
+    except (ValueError, RuntimeError) as e:
+        print(e)
+        return None
+    except Exception as e:
+        print(f"Error loading model {name}: {e}")
+        return None
+
+    if live_metrics:
+        live_metrics.load_time.set(time.perf_counter() - load_start, model=model.model_name)
+    return model
+
+
+def evaluate_model(
+    name: str,
+    model,
+    tracker: CostTracker,
+    live_metrics=None,
+    concurrency: int = 5,
+    task_names: Optional[List[str]] = None,
+) -> List[Dict]:
+    try:
+        # Create a temporary evaluator for just this model; every task runs in this load
+        evaluator = Evaluator(
+            [model], tracker, metrics=live_metrics, max_workers=concurrency
+        )
+        results = evaluator.run_all(task_names)
+    except Exception as e:
+        print(f"Error evaluating model {name}: {e}")
+        return []
+
+    stats = model.batching_stats() if hasattr(model, "batching_stats") else {}
+    if stats:
+        print(
+            f"[{name}] Continuous batching: mean batch {stats['mean_batch']:.1f}, "
+            f"slot utilization {stats['slot_utilization']:.0%}, "
+            f"queue p50/p95 {stats['queue_p50_ms']:.0f}/{stats['queue_p95_ms']:.0f} ms"
+        )
+    return results
 
 
 def main():
@@ -24,12 +80,86 @@ def main():
         help="List of models to evaluate (e.g., gpt-4o-mini or 'all')",
     )
     parser.add_argument(
-        "--tasks", nargs="+", default="all", help="Tasks to evaluate (default: all)"
+        "--tasks",
+        nargs="+",
+        default=["all"],
+        help=f"Tasks to evaluate (default: all; registered: {', '.join(TASKS)})",
     )
     parser.add_argument(
         "--output", default="restaurant_llm_evaluation/results", help="Output directory"
     )
 
+    parser.add_argument(
+        "--telemetry-dir",
+        default=None,
+        help="Spool per-request telemetry to Arrow segments in this directory",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=5,
+        help="Parallel cases per model (default: 5)",
+    )
+    parser.add_argument(
+        "--server-url",
+        default=None,
+        help="Send local models to a shared serve.py endpoint instead of loading them",
+    )
+    parser.add_argument(
+        "--co-schedule",
+        action="store_true",
+        help="Load small local models together when they fit in memory and evaluate them concurrently",
+    )
+    parser.add_argument(
+        "--memory-budget-mb",
+        type=float,
+        default=None,
+        help="Memory budget for --co-schedule (default: 80%% of free RAM/VRAM)",
+    )
+    parser.add_argument(
+        "--continuous-batching",
+        action="store_true",
+        help="Local models admit concurrent requests into a running decode batch",
+    )
+    parser.add_argument(
+        "--batch-slots",
+        type=int,
+        default=8,
+        help="Sequences decoded together with --continuous-batching (default: 8)",
+    )
+    parser.add_argument(
+        "--prefix-cache",
+        action="store_true",
+        help="Local models reuse the KV cache of each system prompt instead of prefilling it per case",
+    )
+    parser.add_argument(
+        "--fast-decode",
+        action="store_true",
+        help="Static KV cache + torch.compile for local models; compile warmup runs before timing",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Predict tokens, wall time, memory and cost without generating",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Record per-stage timings (templating, prefill, decode, parsing, ...) in the report",
+    )
+    parser.add_argument(
+        "--profile-trace",
+        choices=["cprofile", "torch"],
+        default=None,
+        help="Also capture a cProfile or torch profiler trace of the run (implies --profile)",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve live Prometheus-style metrics on localhost at this port",
+    )
+
     args = parser.parse_args()
 
     # Setup Output
@@ -43,72 +173,128 @@ def main():
         target_model_names = args.models
 
     print(f"Target models to evaluate: {target_model_names}")
+    try:
+        tasks = select_tasks(args.tasks)
+    except ValueError as e:
+        parser.error(str(e))
+    task_names = [task.name for task in tasks]
+
+    if args.plan:
+        from utils.planner import format_plan, plan_sweep
+
+        catalog_path = os.path.join(args.output, "runs.sqlite")
+        plan = plan_sweep(
+            target_model_names,
+            build_prompts(tasks),
+            catalog=RunCatalog(catalog_path) if os.path.exists(catalog_path) else None,
+            concurrency=args.concurrency,
+        )
+        print(format_plan(plan, args.concurrency))
+        return
 
     # Initialize Tracker
-    tracker = CostTracker()
+    live_metrics = None
+    if args.metrics_port:
+        live_metrics = EvalMetrics()
+        try:
+            start_metrics_server(live_metrics, port=args.metrics_port)
+            print(f"Serving live metrics on http://127.0.0.1:{args.metrics_port}/metrics")
+        except OSError as e:
+            # Port in use (e.g. a concurrent run); the evaluation doesn't need it
+            print(f"Warning: cannot serve live metrics on port {args.metrics_port} ({e}); continuing without it")
+            live_metrics = None
+
+    tracker = CostTracker(spool_dir=args.telemetry_dir, metrics=live_metrics)
     all_results = []
 
-    import gc
-    import torch
+    # Profiling: stage spans for the report, optional whole-run trace
+    profiler = None
+    trace_stack = contextlib.ExitStack()
+    if args.profile or args.profile_trace:
+        profiler = enable_profiling()
+        trace_prefix = os.path.join(
+            args.output, f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        )
+        trace_files = trace_stack.enter_context(
+            trace_run(args.profile_trace, trace_prefix)
+        )
 
-    for name in target_model_names:
-        print(f"\n[{name}] Initializing & Loading...")
+    # Groups of models loaded together; without co-scheduling, one model at a time
+    if args.co_schedule and not args.server_url:
+        from utils.scheduler import default_device, format_schedule, memory_budget_mb, plan_schedule
 
-        current_model = None
+        budget_mb = args.memory_budget_mb or memory_budget_mb(default_device())
+        schedule = plan_schedule(
+            target_model_names,
+            budget_mb=budget_mb,
+            concurrency=args.concurrency,
+            continuous_batching=args.continuous_batching,
+        )
+        print(format_schedule(schedule, budget_mb))
+    else:
+        schedule = [[{"name": name, "num_threads": None}] for name in target_model_names]
 
-        # 1. Load Single Model
-        try:
-            # API Models
-            if name in API_MODELS.keys() or name in API_MODELS.values():
-                full_name = API_MODELS.get(name, name)
-                if "gpt" in full_name:
-                    if not OPENAI_API_KEY:
-                        print(f"Skipping {name}: OPENAI_API_KEY Missing")
-                        continue
-                    current_model = OpenAIModel(full_name)
-
-            # Local Models
-            elif name in LOCAL_MODELS.keys() or name in LOCAL_MODELS.values():
-                full_name = LOCAL_MODELS.get(name, name)
-                current_model = LocalHuggingFaceModel(full_name)
-
-            else:
-                print(f"Unknown model config: {name}")
-                continue
-
-        except Exception as e:
-            print(f"Error loading model {name}: {e}")
-            continue
-
-        if not current_model:
-            continue
-
-        # 2. Evaluate Single Model
-        try:
-            # Create a temporary evaluator for just this model
-            evaluator = Evaluator([current_model], tracker)
-            run_results = evaluator.run_all()
-            all_results.extend(run_results)
-        except Exception as e:
-            print(f"Error evaluating model {name}: {e}")
+    base_local_options = {}
+    if args.continuous_batching:
+        base_local_options = {"continuous_batching": True, "max_batch_slots": args.batch_slots}
+    if args.prefix_cache:
+        base_local_options["prefix_cache"] = True
+
+    for group in schedule:
+        # 1. Load the group's models (imports only their backends' dependencies)
+        loaded = []
+        for entry in group:
+            local_options = dict(base_local_options)
+            if entry["num_threads"]:
+                local_options["num_threads"] = entry["num_threads"]
+            model = load_model(
+                entry["name"], args.server_url, live_metrics, local_options=local_options
+            )
+            if model is not None:
+                if args.fast_decode:
+                    enable_fast_decode(model, build_prompts(tasks))
+                loaded.append((entry["name"], model))
+
+        # 2. Evaluate, concurrently when several models fit in memory together
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(loaded))) as executor:
+            futures = [
+                executor.submit(
+                    evaluate_model,
+                    name,
+                    model,
+                    tracker,
+                    live_metrics,
+                    args.concurrency,
+                    task_names,
+                )
+                for name, model in loaded
+            ]
+            for future in futures:
+                all_results.extend(future.result())
 
         # 3. Unload & Clean Memory
-        print(f"[{name}] Unloading...")
-        del current_model
-        del evaluator
-
-        gc.collect()
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
-        if torch.backends.mps.is_available():
-            try:
-                torch.mps.empty_cache()
-            except AttributeError:
-                pass  # Some older torch versions might not accept this
+        for name, _ in loaded:
+            print(f"[{name}] Unloading...")
+        del model, loaded, futures
+
+        release_memory()
 
     # Report
+    tracker.flush()
     reporter = ReportGenerator(args.output)
-    reporter.generate_report(all_results, tracker.get_summary())
+    catalog = RunCatalog(os.path.join(args.output, "runs.sqlite"))
+    reporter.generate_report(
+        all_results, model_stats=tracker.get_model_stats(), catalog=catalog
+    )
+
+    if profiler is not None:
+        trace_stack.close()
+        trace_files["spans"] = profiler.export_chrome_trace(
+            f"{trace_prefix}.trace.json"
+        )
+        print("Profile traces:")
+        for kind, path in trace_files.items():
+            print(f" - {kind}: {path}")
 
 
 if __name__ == "__main__":
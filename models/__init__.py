@@ -1,3 +1,19 @@
 from .unified_interface import UnifiedLLMInterface
-from .api_models import OpenAIModel
-from .local_models import LocalHuggingFaceModel
+from .registry import create_model, resolve_backend, release_memory
+
+# Backend classes are imported on first access so that API-only runs never
+# pay for torch/transformers (see models/registry.py).
+_LAZY_ATTRS = {
+    "OpenAIModel": ".api_models",
+    "LocalHuggingFaceModel": ".local_models",
+    "MockModel": ".mock_models",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRS:
+        import importlib
+
+        module = importlib.import_module(_LAZY_ATTRS[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -7,6 +7,7 @@ import openai
 
 from .unified_interface import UnifiedLLMInterface, LLMResponse
 from config import MODEL_PRICING
+from utils.profiling import span
 
 class APIModelBase(UnifiedLLMInterface):
     def calculate_cost(self, input_tokens: int, output_tokens: int) -> float:
@@ -21,14 +22,15 @@ class OpenAIModel(APIModelBase):
     def generate(self, system_prompt: str, user_prompt: str, **kwargs) -> LLMResponse:
         start_time = time.perf_counter()
         try:
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                **kwargs
-            )
+            with span("api_request", self.model_name):
+                response = self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    **kwargs
+                )
             data = response
             content = data.choices[0].message.content
             # Usage may be None in some stream cases, but default is standard
@@ -58,4 +60,23 @@ class OpenAIModel(APIModelBase):
             )
 
 
+# transformers `generate()` options the chat-completions API doesn't accept
+LOCAL_ONLY_KWARGS = {"do_sample", "pad_token_id", "top_k", "repetition_penalty", "num_beams"}
+
+
+class OpenAICompatibleModel(OpenAIModel):
+    """OpenAI chat-completions client for a self-hosted endpoint (e.g. `serve.py`)."""
 
+    def __init__(self, model_name: str, base_url: str, api_key: str = None):
+        UnifiedLLMInterface.__init__(self, model_name)
+        self.base_url = base_url
+        # Local servers ignore the key, but the SDK requires one
+        self.client = openai.OpenAI(base_url=base_url, api_key=api_key or "local")
+
+    def generate(self, system_prompt: str, user_prompt: str, **kwargs) -> LLMResponse:
+        # Same kwargs as the in-process local models; the server maps max_tokens back
+        if "max_new_tokens" in kwargs:
+            kwargs.setdefault("max_tokens", kwargs.pop("max_new_tokens"))
+        for key in LOCAL_ONLY_KWARGS.intersection(kwargs):
+            del kwargs[key]
+        return super().generate(system_prompt, user_prompt, **kwargs)
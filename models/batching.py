@@ -0,0 +1,331 @@
+"""Iteration-level (continuous) batching for local generation.
+
+Concurrent `generate` calls submit their prompt to one engine per model. A
+scheduler thread runs decode steps over every active sequence at once,
+admitting queued prompts into free slots between steps and retiring
+sequences the moment they emit EOS or hit their token limit. A batch no
+longer waits for its longest output.
+
+The running batch lives in one DynamicCache that the model extends in place
+at every decode step. Its rows are left-padded to a common length, with an
+attention mask marking each row's real tokens. A finished sequence frees
+its row, and the next admitted prompt is written into that row in place;
+rows are only appended when none is free, and the batch is compacted once
+fewer than half its rows are in use. Columns that only hold padding are
+trimmed. The scheduler thread exits when the engine is idle, so an unloaded
+model is not kept alive by it.
+"""
+import collections
+import copy
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from transformers import DynamicCache
+
+from utils.profiling import get_profiler
+
+
+class _Sequence:
+    def __init__(
+        self,
+        prompt_ids,
+        max_new_tokens: int,
+        temperature: float,
+        top_p: float,
+        prefix: Optional[Tuple] = None,
+    ):
+        self.prompt_ids = prompt_ids  # (1, seq_len), CPU
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.top_p = top_p
+        # (prefix ids, KV cache) of a cached system turn the prompt starts with
+        self.prefix = prefix
+        self.tokens: List[int] = []
+        self.error: Optional[str] = None
+        self.submitted_at = time.perf_counter()
+        self.admitted_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.done = threading.Event()
+
+
+def _padded_layers(cache, width: int) -> List[Tuple[torch.Tensor, torch.Tensor]]:
+    """Per-layer (key, value) of a one-row cache, left-padded to `width` positions."""
+    pad = width - cache.get_seq_length()
+    return [
+        (F.pad(layer.keys, (0, 0, pad, 0)), F.pad(layer.values, (0, 0, pad, 0)))
+        for layer in cache.layers
+    ]
+
+
+class ContinuousBatchingEngine:
+    """Shares a model's decode steps between concurrent callers.
+
+    `submit` is thread-safe and returns a handle whose `done` event is set
+    when the sequence finishes; `tokens`, `error` and the queue timestamps
+    are then filled in.
+    """
+
+    def __init__(
+        self,
+        model,
+        eos_token_ids: Sequence[int],
+        max_slots: int = 8,
+        name: str = "",
+        num_threads: Optional[int] = None,
+    ):
+        self.model = model
+        self.eos_token_ids = set(eos_token_ids)
+        self.max_slots = max_slots
+        self.name = name or getattr(model, "name_or_path", "")
+        # CPU threads of the scheduler thread, which runs every forward pass
+        self.num_threads = num_threads
+
+        self._cv = threading.Condition()
+        self._waiting: collections.deque = collections.deque()
+        self._thread: Optional[threading.Thread] = None
+
+        # Running batch, touched only by the scheduler thread. Row i of the
+        # cache belongs to _slots[i]; None marks a free row
+        self._slots: List[Optional[_Sequence]] = []
+        self._cache: Optional[DynamicCache] = None
+        self._mask: Optional[torch.Tensor] = None  # (rows, length), 1 = real token
+        self._next: Optional[torch.Tensor] = None  # (rows,) token fed at the next step
+
+        # Stats
+        self._steps = 0
+        self._busy_slots = 0
+        self._queue_ms: List[float] = []
+
+    def submit(
+        self,
+        prompt_ids,
+        max_new_tokens: int = 512,
+        temperature: float = 0.0,
+        top_p: float = 1.0,
+        prefix: Optional[Tuple] = None,
+    ) -> _Sequence:
+        seq = _Sequence(prompt_ids, max_new_tokens, temperature, top_p, prefix)
+        with self._cv:
+            self._waiting.append(seq)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"batching-{self.name}", daemon=True
+                )
+                self._thread.start()
+        return seq
+
+    def stats(self) -> Dict[str, float]:
+        """Slot utilization over decode steps and admission queueing delay."""
+        with self._cv:
+            queue = np.asarray(self._queue_ms, dtype=float)
+            steps, busy = self._steps, self._busy_slots
+        return {
+            "requests": len(queue),
+            "decode_steps": steps,
+            "mean_batch": busy / steps if steps else 0.0,
+            "slot_utilization": busy / (steps * self.max_slots) if steps else 0.0,
+            "queue_p50_ms": float(np.percentile(queue, 50)) if len(queue) else 0.0,
+            "queue_p95_ms": float(np.percentile(queue, 95)) if len(queue) else 0.0,
+        }
+
+    def _active(self) -> List[_Sequence]:
+        return [seq for seq in self._slots if seq is not None]
+
+    def _run(self):
+        if self.num_threads:
+            # Thread counts are per calling thread, so set it on this one
+            torch.set_num_threads(self.num_threads)
+        while True:
+            active = self._active()
+            with self._cv:
+                if not self._waiting and not active:
+                    self._thread = None
+                    return
+                admit = []
+                while self._waiting and len(active) + len(admit) < self.max_slots:
+                    admit.append(self._waiting.popleft())
+            try:
+                with torch.no_grad():
+                    prefilled = [p for p in map(self._prefill, admit) if p is not None]
+                    if prefilled:
+                        self._admit(prefilled)
+                    if self._cache is not None:
+                        self._decode_step()
+            except Exception as e:
+                pending = self._active() + [
+                    s for s in admit if not s.done.is_set() and s not in self._slots
+                ]
+                self._slots, self._cache, self._mask, self._next = [], None, None, None
+                for seq in pending:
+                    seq.error = str(e)
+                    seq.done.set()
+
+    def _prefill(self, seq: _Sequence) -> Optional[Tuple[_Sequence, DynamicCache, int]]:
+        """Run the prompt; (sequence, its one-row cache, first token) unless already finished."""
+        seq.admitted_at = time.perf_counter()
+        ids = seq.prompt_ids.to(self.model.device)
+        cache, start = DynamicCache(), 0
+        if seq.prefix is not None:
+            prefix_ids, prefix_cache = seq.prefix
+            cache, start = copy.deepcopy(prefix_cache), prefix_ids.shape[1]
+        out = self.model(ids[:, start:], past_key_values=cache, use_cache=True)
+        token = self._sample(out.logits[:, -1, :], [seq])[0]
+        self._record("batch_prefill", seq.admitted_at)
+
+        seq.tokens.append(token)
+        if self._finished(seq):
+            self._finish(seq)
+            return None
+        return seq, cache, token
+
+    def _admit(self, prefilled: List[Tuple[_Sequence, DynamicCache, int]]):
+        """Write prefilled sequences into free rows, appending rows when none is free.
+
+        Free rows are overwritten in place. The cache is copied only to append
+        rows (once for all of them) or to left-pad it for a longer prompt.
+        """
+        device = self.model.device
+        width = max(cache.get_seq_length() for _, cache, _ in prefilled)
+        if self._cache is not None:
+            if width > self._mask.shape[1]:
+                pad = width - self._mask.shape[1]
+                for layer in self._cache.layers:
+                    layer.keys = F.pad(layer.keys, (0, 0, pad, 0))
+                    layer.values = F.pad(layer.values, (0, 0, pad, 0))
+                self._mask = F.pad(self._mask, (pad, 0))
+            width = self._mask.shape[1]
+
+        def row_mask(length: int) -> torch.Tensor:
+            return (torch.arange(width, device=device) >= width - length).long()
+
+        free = [i for i, seq in enumerate(self._slots) if seq is None]
+        appended = []
+        for seq, cache, token in prefilled:
+            if not free:
+                appended.append((seq, cache, token))
+                continue
+            row = free.pop(0)
+            for layer, (keys, values) in zip(self._cache.layers, _padded_layers(cache, width)):
+                layer.keys[row] = keys[0]
+                layer.values[row] = values[0]
+            self._mask[row] = row_mask(cache.get_seq_length())
+            self._next[row] = token
+            self._slots[row] = seq
+        if not appended:
+            return
+
+        rows = [_padded_layers(cache, width) for _, cache, _ in appended]
+        masks = [row_mask(cache.get_seq_length()) for _, cache, _ in appended]
+        tokens = torch.tensor([token for _, _, token in appended], device=device)
+        if self._cache is None:
+            # The first sequence's cache becomes the batch; its tensors are replaced below
+            self._cache = appended[0][1]
+        else:
+            rows.insert(0, [(layer.keys, layer.values) for layer in self._cache.layers])
+            masks.insert(0, self._mask)
+            tokens = torch.cat([self._next, tokens])
+        for i, layer in enumerate(self._cache.layers):
+            layer.keys = torch.cat([row[i][0] for row in rows])
+            layer.values = torch.cat([row[i][1] for row in rows])
+        self._mask = torch.cat([m.view(-1, width) for m in masks])
+        self._next = tokens
+        self._slots.extend(seq for seq, _, _ in appended)
+
+    def _decode_step(self):
+        start = time.perf_counter()
+        # Each row's next position is its count of real tokens so far
+        position_ids = self._mask.sum(dim=1, keepdim=True)
+        mask = F.pad(self._mask, (0, 1), value=1)
+        out = self.model(
+            input_ids=self._next.view(-1, 1),
+            attention_mask=mask,
+            position_ids=position_ids,
+            past_key_values=self._cache,  # Extended in place
+            use_cache=True,
+        )
+        self._mask = mask
+        rows = [i for i, seq in enumerate(self._slots) if seq is not None]
+        tokens = self._sample(out.logits[rows, -1, :], [self._slots[i] for i in rows])
+        with self._cv:
+            self._steps += 1
+            self._busy_slots += len(rows)
+        self._record("batch_decode_step", start)
+
+        self._next[rows] = torch.tensor(tokens, device=self._next.device)
+        freed = False
+        for i, token in zip(rows, tokens):
+            seq = self._slots[i]
+            seq.tokens.append(token)
+            if self._finished(seq):
+                self._finish(seq)
+                self._slots[i] = None
+                freed = True
+        # A free row attends only to the token it is fed at each step
+        free = [i for i, seq in enumerate(self._slots) if seq is None]
+        if free:
+            self._mask[free] = 0
+        if freed:
+            self._retire()
+
+    def _retire(self):
+        """Compact the batch once most rows are free, then drop columns that are padding in every row."""
+        keep = [i for i, seq in enumerate(self._slots) if seq is not None]
+        if not keep:
+            self._slots, self._cache, self._mask, self._next = [], None, None, None
+            return
+        if 2 * len(keep) <= len(self._slots):
+            index = torch.tensor(keep, device=self._mask.device)
+            self._cache.batch_select_indices(index)
+            self._mask = self._mask.index_select(0, index)
+            self._next = self._next.index_select(0, index)
+            self._slots = [self._slots[i] for i in keep]
+        # Every row's real tokens are a suffix, so padding columns are a prefix
+        pad = int((self._mask.sum(dim=0) == 0).sum())
+        if pad:
+            self._mask = self._mask[:, pad:]
+            for layer in self._cache.layers:
+                layer.keys = layer.keys[:, :, pad:]
+                layer.values = layer.values[:, :, pad:]
+
+    def _finished(self, seq: _Sequence) -> bool:
+        return seq.tokens[-1] in self.eos_token_ids or len(seq.tokens) >= seq.max_new_tokens
+
+    def _finish(self, seq: _Sequence):
+        seq.finished_at = time.perf_counter()
+        with self._cv:
+            self._queue_ms.append((seq.admitted_at - seq.submitted_at) * 1000)
+        profiler = get_profiler()
+        if profiler is not None:
+            profiler.record(
+                "queue_wait",
+                seq.admitted_at - seq.submitted_at,
+                model=self.name,
+                start=seq.submitted_at,
+            )
+        seq.done.set()
+
+    @staticmethod
+    def _sample(logits, seqs: Sequence[_Sequence]) -> List[int]:
+        greedy = logits.argmax(dim=-1).tolist()
+        tokens = []
+        for i, seq in enumerate(seqs):
+            if seq.temperature <= 0:
+                tokens.append(greedy[i])
+                continue
+            probs = torch.softmax(logits[i].float() / seq.temperature, dim=-1)
+            if seq.top_p < 1.0:
+                sorted_probs, order = probs.sort(descending=True)
+                # Keep the smallest set of tokens whose mass reaches top_p
+                sorted_probs[sorted_probs.cumsum(0) - sorted_probs > seq.top_p] = 0
+                probs = torch.zeros_like(probs).scatter(0, order, sorted_probs)
+            tokens.append(int(torch.multinomial(probs, 1)))
+        return tokens
+
+    def _record(self, stage: str, start: float):
+        profiler = get_profiler()
+        if profiler is not None:
+            profiler.record(stage, time.perf_counter() - start, model=self.name, start=start)
@@ -0,0 +1,35 @@
+"""Shape planning for fast decode (static KV cache + compiled forward).
+
+Compiled graphs are specialized on input shapes, so prompts are left-padded
+to a multiple of PROMPT_BUCKET and the static cache is sized once for the
+longest bucket plus the generation budget. Kept free of torch so the
+planning can be checked without loading a model.
+"""
+from typing import Callable, Dict, Iterable, Tuple
+
+# Fast decode pads prompts to a multiple of this, bounding the number of
+# compiled prefill graphs
+PROMPT_BUCKET = 128
+# Tokens generated per warmup call; decode shapes don't depend on the length
+WARMUP_NEW_TOKENS = 4
+
+
+def prompt_bucket(length: int) -> int:
+    """Padded length of a `length`-token prompt."""
+    return -(-length // PROMPT_BUCKET) * PROMPT_BUCKET
+
+
+def bucket_prompts(
+    prompts: Iterable[Tuple[str, str]], prompt_tokens: Callable[[str, str], int]
+) -> Dict[int, Tuple[str, str]]:
+    """One representative (system, user) prompt per bucket, for warmup."""
+    buckets: Dict[int, Tuple[str, str]] = {}
+    for system_prompt, user_prompt in prompts:
+        length = prompt_tokens(system_prompt, user_prompt)
+        buckets.setdefault(prompt_bucket(length), (system_prompt, user_prompt))
+    return buckets
+
+
+def fits_static_cache(cache_len: int, prompt_tokens: int, max_new_tokens: int) -> bool:
+    """Whether a request's padded prompt and generation fit a cache of `cache_len`."""
+    return prompt_bucket(prompt_tokens) + max_new_tokens <= cache_len
@@ -1,12 +1,61 @@
+import copy
+import os
+import threading
 import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
 import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
+from transformers import (
+    AutoTokenizer,
+    AutoModelForCausalLM,
+    DynamicCache,
+    LogitsProcessor,
+    LogitsProcessorList,
+    pipeline,
+)
+from .batching import ContinuousBatchingEngine
+from .fast_decode import WARMUP_NEW_TOKENS, bucket_prompts, fits_static_cache, prompt_bucket
+from .snapshots import find_snapshot, save_snapshot, source_revision
 from .unified_interface import UnifiedLLMInterface, LLMResponse
+from config import COMPILE_CACHE_DIR
+from utils.profiling import get_profiler, span
+
+# System prompts whose KV cache is kept (one per registered task is typical)
+PREFIX_CACHE_SIZE = 8
+# What generate() raises when a model can't start from a precomputed cache
+PREFIX_UNSUPPORTED = (TypeError, ValueError, NotImplementedError)
+
+
+class _FirstTokenTimer(LogitsProcessor):
+    """Notes when the first token's logits are ready, i.e. when prefill ends."""
+
+    def __init__(self, sync: bool = False):
+        self.sync = sync
+        self.first_token_at = None
+
+    def __call__(self, input_ids, scores):
+        if self.first_token_at is None:
+            if self.sync:
+                torch.cuda.synchronize()
+            self.first_token_at = time.perf_counter()
+        return scores
 
 
 class LocalHuggingFaceModel(UnifiedLLMInterface):
-    def __init__(self, model_name_or_path: str, device: str = None):
+    def __init__(
+        self,
+        model_name_or_path: str,
+        device: str = None,
+        num_threads: int = None,
+        prefix_cache: bool = False,
+        continuous_batching: bool = False,
+        max_batch_slots: int = 8,
+    ):
         super().__init__(model_name_or_path)
+        # CPU threads for this model's forward passes when sharing the host
+        # with co-scheduled models (utils/scheduler.py); None keeps torch's default
+        self.num_threads = num_threads
         if device:
             self.device = device
         elif torch.cuda.is_available():
@@ -18,39 +67,90 @@ class LocalHuggingFaceModel(UnifiedLLMInterface):
 
         self.tokenizer = None
         self.model = None
+        # Fast decode (enable_fast_decode): shared static KV cache, one generation at a time
+        self._static_cache = None
+        self._static_lock = threading.Lock()
+        self.fast_decode_stats: Dict = {}
+        # KV cache of each system turn, shared by every prompt that starts with it
+        self.prefix_cache = prefix_cache
+        self._prefixes: OrderedDict = OrderedDict()
+        self._prefix_lock = threading.Lock()
+        # Continuous batching: one engine shares decode steps between callers
+        self.continuous_batching = continuous_batching
+        self.max_batch_slots = max_batch_slots
+        self._engine: Optional[ContinuousBatchingEngine] = None
         self._load_model()
+        if self.model is not None and self.continuous_batching:
+            eos = self.model.generation_config.eos_token_id
+            eos = eos if isinstance(eos, list) else [eos]
+            self._engine = ContinuousBatchingEngine(
+                self.model,
+                [t for t in eos + [self.tokenizer.eos_token_id] if t is not None],
+                max_slots=self.max_batch_slots,
+                name=self.model_name,
+                num_threads=self.num_threads,
+            )
+
+    @property
+    def batches_concurrent_calls(self) -> bool:
+        """Whether concurrent generate() calls share decode steps (no caller-side locking needed)."""
+        return self._engine is not None
+
+    def batching_stats(self) -> Dict:
+        """Slot utilization and queueing delay of the continuous-batching engine, if enabled."""
+        return self._engine.stats() if self._engine is not None else {}
 
     def _load_model(self):
         try:
             print(f"Loading local model {self.model_name} on {self.device}...")
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            start = time.perf_counter()
 
             # Use float16 for CUDA and MPS to save memory/speed
             if self.device == "cuda" or self.device == "mps":
                 dtype = torch.float16
             else:
                 dtype = torch.float32
+            dtype_name = str(dtype).replace("torch.", "")
+
+            # A snapshot is already in `dtype`, so its safetensors are mmapped as is
+            revision = source_revision(self.model_name)
+            snapshot = find_snapshot(self.model_name, dtype_name, revision)
+            source = snapshot or self.model_name
+            self.tokenizer = AutoTokenizer.from_pretrained(source)
 
             # device_map="auto" works best with CUDA. For MPS/CPU we manually move.
-            # Using low_cpu_mem_usage=True if available helps
+            # low_cpu_mem_usage avoids materializing the weights twice
             self.model = AutoModelForCausalLM.from_pretrained(
-                self.model_name,
+                source,
                 torch_dtype=dtype,
-                low_cpu_mem_usage=True if self.device != "cpu" else False,
+                low_cpu_mem_usage=True,
             )
+
+            if snapshot is None:
+                try:
+                    saved = save_snapshot(
+                        self.model, self.tokenizer, self.model_name, dtype_name, revision
+                    )
+                    if saved:
+                        print(f"Saved {dtype_name} snapshot to {saved}")
+                except OSError as e:
+                    print(f"Could not save snapshot of {self.model_name}: {e}")
             self.model.to(self.device)
 
-            print(f"Model {self.model_name} loaded.")
+            self.load_stats = {
+                "source": "snapshot" if snapshot else "hub",
+                "load_s": time.perf_counter() - start,
+            }
+            print(
+                f"Model {self.model_name} loaded from {self.load_stats['source']} "
+                f"in {self.load_stats['load_s']:.1f}s."
+            )
         except Exception as e:
             print(f"Failed to load model {self.model_name}: {e}")
             self.model = None
 
-    def generate(self, system_prompt: str, user_prompt: str, **kwargs) -> LLMResponse:
-        if not self.model or not self.tokenizer:
-            return LLMResponse("", self.model_name, 0, 0, 0, error="Model not loaded")
-
-        start_time = time.perf_counter()
-
+    def _prompt_text(self, system_prompt: str, user_prompt: str) -> Tuple[str, bool]:
+        """Chat-formatted prompt, and whether the tokenizer should add special tokens."""
         # Simple chat formatting - might need chat template application if model supports it
         # For base models, this might just be concatenation. Inspecting model type is hard dynamically.
         # We will assume instruct models that support apply_chat_template or similar.
@@ -63,52 +163,313 @@ class LocalHuggingFaceModel(UnifiedLLMInterface):
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt},
                 ]
-                full_prompt_ids = self.tokenizer.apply_chat_template(
-                    messages, return_tensors="pt", add_generation_prompt=True
+                # The rendered template already carries its special tokens
+                text = self.tokenizer.apply_chat_template(
+                    messages, tokenize=False, add_generation_prompt=True
                 )
+                return text, False
             except Exception:
                 # Fallback manual formatting if template fails
                 # Using standard ChatML-like format as generic fallback
                 text = f"<|im_start|>system\n{system_prompt}<|im_end|>\n<|im_start|>user\n{user_prompt}<|im_end|>\n<|im_start|>assistant\n"
-                full_prompt_ids = self.tokenizer(text, return_tensors="pt").input_ids
-        else:
-            full_prompt_ids = self.tokenizer(full_prompt, return_tensors="pt").input_ids
+                return text, True
+        return full_prompt, True
 
-        full_prompt_ids = full_prompt_ids.to(self.model.device)
-        input_tokens_count = full_prompt_ids.shape[1]
+    def _prompt_ids(self, system_prompt: str, user_prompt: str):
+        """Chat-formatted prompt ids, shape (1, seq_len)."""
+        with span("chat_template", self.model_name):
+            text, add_special_tokens = self._prompt_text(system_prompt, user_prompt)
+        with span("tokenize", self.model_name):
+            return self.tokenizer(
+                text, return_tensors="pt", add_special_tokens=add_special_tokens
+            ).input_ids
+
+    def _generate_timed(self, input_ids, attention_mask, gen_kwargs):
+        """model.generate, split into prefill and decode spans when profiling."""
+        if self.num_threads:
+            # OpenMP/MKL thread counts are per calling thread, so this only
+            # sizes the pool of the worker thread running this generation
+            # (plan_schedule already divides the model's share among them)
+            torch.set_num_threads(self.num_threads)
+        profiler = get_profiler()
+        if profiler is None:
+            return self.model.generate(input_ids, attention_mask=attention_mask, **gen_kwargs)
+        timer = _FirstTokenTimer(sync=self.device == "cuda")
+        start = time.perf_counter()
+        outputs = self.model.generate(
+            input_ids,
+            attention_mask=attention_mask,
+            logits_processor=LogitsProcessorList([timer]),
+            **gen_kwargs,
+        )
+        if self.device == "cuda":
+            torch.cuda.synchronize()
+        end = time.perf_counter()
+        first = timer.first_token_at or end
+        profiler.record("prefill", first - start, model=self.model_name, start=start)
+        profiler.record("decode", end - first, model=self.model_name, start=first)
+        return outputs
+
+    def _gen_kwargs(self, kwargs) -> dict:
+        temperature = kwargs.get("temperature", 0.7)
+        do_sample = temperature > 0
+
+        gen_kwargs = {
+            "max_new_tokens": kwargs.get("max_new_tokens", 512),
+            "do_sample": do_sample,
+            "pad_token_id": self.tokenizer.eos_token_id,
+        }
+        if do_sample:
+            gen_kwargs["temperature"] = temperature
+            gen_kwargs["top_p"] = kwargs.get("top_p", 0.9)  # Safe default if sampling
+        return gen_kwargs
+
+    def _peak_memory_mb(self) -> float:
+        if self.device == "cuda":
+            return torch.cuda.max_memory_allocated() / (1024 * 1024)  # MB
+        return 0
 
-        # Create attention mask
-        attention_mask = torch.ones_like(full_prompt_ids)
+    def _pad_to_bucket(self, input_ids):
+        """Left-pad (1, seq_len) ids to the bucket length; returns (ids, attention_mask)."""
+        length = input_ids.shape[1]
+        width = prompt_bucket(length)
+        pad_id = self.tokenizer.pad_token_id
+        if pad_id is None:
+            pad_id = self.tokenizer.eos_token_id
+        padded = torch.full((1, width), pad_id, dtype=input_ids.dtype)
+        padded[0, width - length :] = input_ids[0]
+        attention_mask = torch.zeros((1, width), dtype=torch.long)
+        attention_mask[0, width - length :] = 1
+        return padded, attention_mask
+
+    def _fits_static_cache(self, prompt_tokens: int, max_new_tokens: int) -> bool:
+        if self._static_cache is None:
+            return False
+        return fits_static_cache(
+            self.fast_decode_stats["cache_len"], prompt_tokens, max_new_tokens
+        )
+
+    def enable_fast_decode(
+        self,
+        prompts: List[Tuple[str, str]],
+        max_new_tokens: int = 512,
+        warmup_rounds: int = 2,
+    ) -> Dict:
+        """Switch to a preallocated static KV cache and a compiled forward pass.
+
+        The cache holds the longest of `prompts` (rounded up to PROMPT_BUCKET)
+        plus `max_new_tokens`; longer requests fall back to the dynamic cache.
+        Warmup compiles one prefill graph per prompt bucket and the decode
+        graph, so compilation is not billed to timed requests. Compiled
+        kernels are kept in COMPILE_CACHE_DIR and reused by later runs.
+
+        Returns the cache length, prompt bucket count and warmup seconds
+        (empty if fast decode could not be enabled).
+        """
+        if not self.model or not self.tokenizer:
+            return {}
+        if self.device == "mps":
+            print(f"[{self.model_name}] Fast decode is not supported on MPS, staying eager")
+            return {}
+        if self._engine is not None:
+            print(f"[{self.model_name}] Fast decode is not combined with continuous batching")
+            return {}
+        from transformers import StaticCache
+        import torch._inductor.config as inductor_config
+
+        os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", COMPILE_CACHE_DIR)
+        inductor_config.fx_graph_cache = True
+
+        # One representative prompt per bucket
+        buckets = bucket_prompts(prompts, lambda s, u: self._prompt_ids(s, u).shape[1])
+        cache_len = max(buckets) + max_new_tokens
+
+        eager_forward = self.model.forward
+        self._static_cache = StaticCache(
+            config=self.model.config,
+            max_batch_size=1,
+            max_cache_len=cache_len,
+            device=self.model.device,
+            dtype=self.model.dtype,
+        )
+        self.fast_decode_stats = {"cache_len": cache_len, "prompt_buckets": len(buckets)}
+        # CUDA graphs remove per-step launch overhead; on CPU inductor's fused kernels do the work
+        self.model.forward = torch.compile(
+            eager_forward,
+            mode="reduce-overhead" if self.device == "cuda" else None,
+            dynamic=False,
+        )
+
+        start = time.perf_counter()
+        with span("fast_decode_warmup", self.model_name):
+            for _ in range(warmup_rounds):
+                for system_prompt, user_prompt in buckets.values():
+                    response = self.generate(
+                        system_prompt,
+                        user_prompt,
+                        temperature=0.0,
+                        max_new_tokens=WARMUP_NEW_TOKENS,
+                    )
+                    if response.error:
+                        print(
+                            f"[{self.model_name}] Fast decode warmup failed, "
+                            f"staying eager: {response.error}"
+                        )
+                        self.model.forward = eager_forward
+                        self._static_cache = None
+                        self.fast_decode_stats = {}
+                        return {}
+        self.fast_decode_stats["warmup_s"] = time.perf_counter() - start
+        return dict(self.fast_decode_stats)
+
+    def _system_prefix(self, system_prompt: str):
+        """(prefix ids on CPU, KV cache) of the rendered system turn, built once per prompt.
+
+        (None, None) if the chat template has no separate system turn or the
+        cache can't be built; such prompts are prefilled in full.
+        """
+        with self._prefix_lock:
+            if system_prompt in self._prefixes:
+                self._prefixes.move_to_end(system_prompt)
+                return self._prefixes[system_prompt]
+            entry = (None, None)
+            try:
+                text = self.tokenizer.apply_chat_template(
+                    [{"role": "system", "content": system_prompt}], tokenize=False
+                )
+                ids = self.tokenizer(
+                    text, return_tensors="pt", add_special_tokens=False
+                ).input_ids
+                with span("prefix_prefill", self.model_name), torch.no_grad():
+                    out = self.model(
+                        ids.to(self.model.device),
+                        past_key_values=DynamicCache(),
+                        use_cache=True,
+                    )
+                entry = (ids, out.past_key_values)
+            except Exception:
+                pass  # No system role in the template (e.g. Gemma) or no cache support
+            self._prefixes[system_prompt] = entry
+            while len(self._prefixes) > PREFIX_CACHE_SIZE:
+                self._prefixes.popitem(last=False)
+            return entry
 
+    def _matching_prefix(self, system_prompt: str, input_ids) -> Optional[tuple]:
+        """(prefix ids, KV cache) of the system turn if `input_ids` start with it."""
+        if not self.prefix_cache:
+            return None
+        prefix_ids, prefix_cache = self._system_prefix(system_prompt)
+        if prefix_cache is None:
+            return None
+        n = prefix_ids.shape[1]
+        if input_ids.shape[1] <= n or not torch.equal(input_ids[0, :n].cpu(), prefix_ids[0]):
+            return None
+        return prefix_ids, prefix_cache
+
+    def _generate_with_prefix(self, system_prompt: str, input_ids, attention_mask, gen_kwargs):
+        """Generate, starting from the cached system-prompt KV when the prompt begins with it.
+
+        Every task and case sharing a system prompt then skips its prefill.
+        """
+        prefix = self._matching_prefix(system_prompt, input_ids)
+        if prefix is None:
+            return self._generate_timed(input_ids, attention_mask, gen_kwargs)
+
+        with span("prefix_copy", self.model_name):
+            # generate() extends the cache in place, so each call gets its own copy
+            past_key_values = copy.deepcopy(prefix[1])
         try:
-            temperature = kwargs.get("temperature", 0.7)
-            do_sample = temperature > 0
+            return self._generate_timed(
+                input_ids, attention_mask, {**gen_kwargs, "past_key_values": past_key_values}
+            )
+        except PREFIX_UNSUPPORTED as e:
+            # Anything else (OOM, a transient failure) is this call's error only
+            print(f"[{self.model_name}] Prefix cache unsupported, disabling it: {e!r}")
+            self.prefix_cache = False
+            return self._generate_timed(input_ids, attention_mask, gen_kwargs)
 
-            gen_kwargs = {
-                "max_new_tokens": kwargs.get("max_new_tokens", 512),
-                "do_sample": do_sample,
-                "pad_token_id": self.tokenizer.eos_token_id,
-            }
-            if do_sample:
-                gen_kwargs["temperature"] = temperature
-                gen_kwargs["top_p"] = kwargs.get(
-                    "top_p", 0.9
-                )  # Safe default if sampling
-
-            outputs = self.model.generate(
-                full_prompt_ids, attention_mask=attention_mask, **gen_kwargs
+    def _generate_continuous(self, prompts: List[Tuple[str, str]], kwargs) -> List[LLMResponse]:
+        """Submit prompts to the continuous-batching engine and wait for all of them.
+
+        Each response's latency runs from submission to its own last token.
+        """
+        start_time = time.perf_counter()
+        gen_kwargs = self._gen_kwargs(kwargs)
+        submitted = []
+        for system_prompt, user_prompt in prompts:
+            ids = self._prompt_ids(system_prompt, user_prompt)
+            seq = self._engine.submit(
+                ids,
+                max_new_tokens=gen_kwargs["max_new_tokens"],
+                temperature=gen_kwargs.get("temperature", 0.0),
+                top_p=gen_kwargs.get("top_p", 1.0),
+                prefix=self._matching_prefix(system_prompt, ids),
+            )
+            submitted.append((ids.shape[1], seq))
+
+        responses = []
+        for input_tokens, seq in submitted:
+            seq.done.wait()
+            end = seq.finished_at or time.perf_counter()
+            content = ""
+            if seq.error is None:
+                with span("detokenize", self.model_name):
+                    content = self.tokenizer.decode(seq.tokens, skip_special_tokens=True)
+            responses.append(
+                LLMResponse(
+                    content=content,
+                    model_name=self.model_name,
+                    input_tokens=input_tokens,
+                    output_tokens=len(seq.tokens) if seq.error is None else 0,
+                    latency_ms=(end - start_time) * 1000,
+                    error=seq.error,
+                    cost_usd=0.0,
+                    gpu_memory_mb=self._peak_memory_mb(),
+                )
             )
-            output_ids = outputs[0][input_tokens_count:]
+        return responses
+
+    def generate(self, system_prompt: str, user_prompt: str, **kwargs) -> LLMResponse:
+        if not self.model or not self.tokenizer:
+            return LLMResponse("", self.model_name, 0, 0, 0, error="Model not loaded")
+        if self._engine is not None:
+            return self._generate_continuous([(system_prompt, user_prompt)], kwargs)[0]
+
+        start_time = time.perf_counter()
+
+        full_prompt_ids = self._prompt_ids(system_prompt, user_prompt)
+        input_tokens_count = full_prompt_ids.shape[1]
+        gen_kwargs = self._gen_kwargs(kwargs)
+        fast = self._fits_static_cache(input_tokens_count, gen_kwargs["max_new_tokens"])
+        if fast:
+            full_prompt_ids, attention_mask = self._pad_to_bucket(full_prompt_ids)
+        else:
+            attention_mask = torch.ones_like(full_prompt_ids)
+        with span("h2d_copy", self.model_name):
+            full_prompt_ids = full_prompt_ids.to(self.model.device)
+            attention_mask = attention_mask.to(self.model.device)
+
+        try:
+            if fast:
+                # One preallocated cache, so fast generations run one at a time
+                with self._static_lock:
+                    self._static_cache.reset()
+                    outputs = self._generate_timed(
+                        full_prompt_ids,
+                        attention_mask,
+                        {**gen_kwargs, "past_key_values": self._static_cache},
+                    )
+            else:
+                outputs = self._generate_with_prefix(
+                    system_prompt, full_prompt_ids, attention_mask, gen_kwargs
+                )
+            output_ids = outputs[0][full_prompt_ids.shape[1] :]
             output_tokens_count = len(output_ids)
-            content = self.tokenizer.decode(output_ids, skip_special_tokens=True)
+            with span("detokenize", self.model_name):
+                content = self.tokenizer.decode(output_ids, skip_special_tokens=True)
 
             latency_ms = (time.perf_counter() - start_time) * 1000
 
-            # Memory tracking
-            gpu_mem = 0
-            if self.device == "cuda":
-                gpu_mem = torch.cuda.max_memory_allocated() / (1024 * 1024)  # MB
-
             return LLMResponse(
                 content=content,
                 model_name=self.model_name,
@@ -116,7 +477,7 @@ class LocalHuggingFaceModel(UnifiedLLMInterface):
                 output_tokens=output_tokens_count,
                 latency_ms=latency_ms,
                 cost_usd=0.0,
-                gpu_memory_mb=gpu_mem,
+                gpu_memory_mb=self._peak_memory_mb(),
             )
         except Exception as e:
             return LLMResponse(
@@ -127,3 +488,73 @@ class LocalHuggingFaceModel(UnifiedLLMInterface):
                 latency_ms=(time.perf_counter() - start_time) * 1000,
                 error=str(e),
             )
+
+    def generate_batch(self, prompts: List[Tuple[str, str]], **kwargs) -> List[LLMResponse]:
+        """Generate for several (system, user) prompts in one left-padded batch.
+
+        Every response reports the batch's latency, since they finish together.
+        """
+        if not self.model or not self.tokenizer:
+            return [
+                LLMResponse("", self.model_name, 0, 0, 0, error="Model not loaded")
+                for _ in prompts
+            ]
+        if self._engine is not None:
+            return self._generate_continuous(prompts, kwargs)
+        if len(prompts) == 1 or self._static_cache is not None:
+            # The static cache holds a single sequence
+            return super().generate_batch(prompts, **kwargs)
+
+        start_time = time.perf_counter()
+        pad_id = self.tokenizer.pad_token_id
+        if pad_id is None:
+            pad_id = self.tokenizer.eos_token_id
+
+        rows = [self._prompt_ids(s, u)[0] for s, u in prompts]
+        width = max(len(r) for r in rows)
+        input_ids = torch.full((len(rows), width), pad_id, dtype=rows[0].dtype)
+        attention_mask = torch.zeros((len(rows), width), dtype=torch.long)
+        for i, row in enumerate(rows):
+            input_ids[i, width - len(row) :] = row
+            attention_mask[i, width - len(row) :] = 1
+
+        with span("h2d_copy", self.model_name):
+            input_ids = input_ids.to(self.model.device)
+            attention_mask = attention_mask.to(self.model.device)
+
+        try:
+            outputs = self._generate_timed(input_ids, attention_mask, self._gen_kwargs(kwargs))
+            latency_ms = (time.perf_counter() - start_time) * 1000
+            gpu_mem = self._peak_memory_mb()
+            responses = []
+            for i, row in enumerate(rows):
+                output_ids = outputs[i][width:]
+                # Finished rows are padded up to the longest generation
+                output_tokens_count = int((output_ids != pad_id).sum())
+                with span("detokenize", self.model_name):
+                    content = self.tokenizer.decode(output_ids, skip_special_tokens=True)
+                responses.append(
+                    LLMResponse(
+                        content=content,
+                        model_name=self.model_name,
+                        input_tokens=len(row),
+                        output_tokens=output_tokens_count,
+                        latency_ms=latency_ms,
+                        cost_usd=0.0,
+                        gpu_memory_mb=gpu_mem,
+                    )
+                )
+            return responses
+        except Exception as e:
+            latency_ms = (time.perf_counter() - start_time) * 1000
+            return [
+                LLMResponse(
+                    content="",
+                    model_name=self.model_name,
+                    input_tokens=len(row),
+                    output_tokens=0,
+                    latency_ms=latency_ms,
+                    error=str(e),
+                )
+                for row in rows
+            ]
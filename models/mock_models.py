@@ -0,0 +1,177 @@
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+from .unified_interface import UnifiedLLMInterface, LLMResponse
+
+LATENCY_DISTRIBUTIONS = ("constant", "normal", "lognormal", "exponential")
+
+# Ways a malformed output can be broken
+MALFORMED_KINDS = ("truncated", "trailing_comma", "prose_only", "single_quotes")
+
+
+def _default_persona(user_data: Dict) -> Dict:
+    name = user_data.get("name", "Unknown")
+    categories = user_data.get("preferred_food_categories") or ["한식"]
+    ingredients = user_data.get("preferred_ingredients") or ["채소"]
+    return {
+        "reasoning": (
+            f"{user_data.get('age_group', '')} {user_data.get('gender', '')} 사용자는 "
+            f"{', '.join(categories)}을 선호하므로 왜냐하면 익숙한 맛을 중시하기 때문이다. "
+            f"따라서 {', '.join(ingredients)} 위주의 메뉴를 고를 것이다."
+        ),
+        "name": name,
+        "gender": user_data.get("gender", ""),
+        "age_group": user_data.get("age_group", ""),
+        "allergies": list(user_data.get("allergies") or []),
+        "preferred_food_categories": list(categories),
+        "preferred_ingredients": list(ingredients),
+        "dining_style": "효율 중시형",
+        "price_sensitivity": "Medium",
+        "preferred_atmosphere": ["조용한", "깔끔한"],
+        "key_decision_factors": ["맛", "가격"],
+        "description": f"{name}은(는) 퇴근 후 혼밥으로 {categories[0]}을 즐기는 직장인이다.",
+    }
+
+
+class MockModel(UnifiedLLMInterface):
+    """Deterministic stand-in for a real backend, for measuring the harness itself.
+
+    Every output depends only on (seed, model name, prompt, how many times that
+    prompt was seen), so repeated runs of a benchmark produce identical
+    results regardless of thread scheduling.
+
+    Args:
+        latency_ms: Mean simulated latency.
+        latency_std_ms: Spread for the normal/lognormal distributions.
+        latency_dist: One of LATENCY_DISTRIBUTIONS.
+        sleep: Actually sleep for the simulated latency (off: report it only).
+        error_rate: Fraction of calls that return an error response.
+        malformed_rate: Fraction of successful calls whose JSON is broken.
+        output_template: `str.format` template filled with the user data
+            fields; the default renders a complete persona JSON.
+        tokens_per_char: Output token count per output character.
+        cost_per_1m_output: Simulated price, so cost accounting has non-zero input.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "mock",
+        latency_ms: float = 0.0,
+        latency_std_ms: float = 0.0,
+        latency_dist: str = "constant",
+        sleep: bool = False,
+        error_rate: float = 0.0,
+        malformed_rate: float = 0.0,
+        output_template: Optional[str] = None,
+        tokens_per_char: float = 0.5,
+        cost_per_1m_output: float = 0.0,
+        seed: int = 0,
+    ):
+        super().__init__(model_name)
+        if latency_dist not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {latency_dist}")
+        self.latency_ms = latency_ms
+        self.latency_std_ms = latency_std_ms
+        self.latency_dist = latency_dist
+        self.sleep = sleep
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.output_template = output_template
+        self.tokens_per_char = tokens_per_char
+        self.cost_per_1m_output = cost_per_1m_output
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._calls: Dict[str, int] = {}
+
+    def _rng(self, system_prompt: str, user_prompt: str) -> random.Random:
+        key = hashlib.sha256(f"{system_prompt}\x00{user_prompt}".encode("utf-8")).hexdigest()
+        with self._lock:
+            n = self._calls.get(key, 0)
+            self._calls[key] = n + 1
+        digest = hashlib.sha256(f"{self.seed}:{self.model_name}:{key}:{n}".encode()).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def _latency(self, rng: random.Random) -> float:
+        mean, std = self.latency_ms, self.latency_std_ms
+        if self.latency_dist == "normal":
+            return max(0.0, rng.gauss(mean, std))
+        if self.latency_dist == "lognormal" and mean > 0:
+            sigma2 = (std / mean) ** 2 if std else 0.0
+            sigma = math.sqrt(math.log1p(sigma2))
+            return rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+        if self.latency_dist == "exponential" and mean > 0:
+            return rng.expovariate(1 / mean)
+        return mean
+
+    @staticmethod
+    def _user_data(user_prompt: str) -> Dict:
+        _, _, payload = user_prompt.partition("User Data:")
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _render(self, user_data: Dict) -> str:
+        if self.output_template is not None:
+            return self.output_template.format_map(_Defaults(user_data))
+        return json.dumps(_default_persona(user_data), ensure_ascii=False, indent=2)
+
+    @staticmethod
+    def _break(content: str, rng: random.Random) -> str:
+        kind = rng.choice(MALFORMED_KINDS)
+        if kind == "truncated":
+            return content[: max(1, int(len(content) * rng.uniform(0.3, 0.9)))]
+        if kind == "trailing_comma":
+            return content.rstrip().rstrip("}") + ",\n}"
+        if kind == "prose_only":
+            return "죄송하지만 요청하신 페르소나를 JSON으로 생성할 수 없습니다."
+        return content.replace('"', "'")
+
+    def generate(self, system_prompt: str, user_prompt: str, **kwargs) -> LLMResponse:
+        rng = self._rng(system_prompt, user_prompt)
+        latency_ms = self._latency(rng)
+        if self.sleep and latency_ms > 0:
+            time.sleep(latency_ms / 1000)
+
+        input_tokens = int((len(system_prompt) + len(user_prompt)) * self.tokens_per_char)
+        if rng.random() < self.error_rate:
+            return LLMResponse(
+                content="",
+                model_name=self.model_name,
+                input_tokens=0,
+                output_tokens=0,
+                latency_ms=latency_ms,
+                error="MockModel: simulated error",
+            )
+
+        content = self._render(self._user_data(user_prompt))
+        if rng.random() < self.malformed_rate:
+            content = self._break(content, rng)
+
+        max_new_tokens = kwargs.get("max_new_tokens")
+        output_tokens = int(len(content) * self.tokens_per_char)
+        if max_new_tokens is not None and output_tokens > max_new_tokens:
+            content = content[: int(max_new_tokens / self.tokens_per_char)]
+            output_tokens = max_new_tokens
+
+        return LLMResponse(
+            content=content,
+            model_name=self.model_name,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            latency_ms=latency_ms,
+            cost_usd=output_tokens * self.cost_per_1m_output / 1_000_000,
+        )
+
+
+class _Defaults(dict):
+    """format_map mapping that leaves unknown fields empty."""
+
+    def __missing__(self, key):
+        return ""
@@ -0,0 +1,106 @@
+import gc
+import importlib
+import sys
+from typing import Dict, Optional, Tuple
+
+from config import (
+    API_MODELS,
+    LOCAL_MODELS,
+    MOCK_MODELS,
+    MODEL_PRICING,
+    MODEL_SERVER_URL,
+    OPENAI_API_KEY,
+)
+
+# backend key -> (module, class); modules are imported only when a model of
+# that backend is created
+BACKENDS: Dict[str, Tuple[str, str]] = {
+    "openai": ("models.api_models", "OpenAIModel"),
+    "hf_local": ("models.local_models", "LocalHuggingFaceModel"),
+    "mock": ("models.mock_models", "MockModel"),
+    "openai_compat": ("models.api_models", "OpenAICompatibleModel"),
+}
+
+
+def resolve_backend(name: str) -> Tuple[str, str]:
+    """Map a configured model name (key or full id) to (backend, full_name)."""
+    if name in API_MODELS or name in API_MODELS.values():
+        full_name = API_MODELS.get(name, name)
+        if "gpt" in full_name:
+            return "openai", full_name
+        raise ValueError(f"No API backend for model: {name}")
+    if name in LOCAL_MODELS or name in LOCAL_MODELS.values():
+        return "hf_local", LOCAL_MODELS.get(name, name)
+    if name in MOCK_MODELS:
+        return "mock", name
+    raise ValueError(f"Unknown model config: {name}")
+
+
+def lookup_pricing(name: str) -> Optional[Dict[str, float]]:
+    """USD per 1M tokens for a model key or full id, None if not configured."""
+    if name in MODEL_PRICING:
+        return MODEL_PRICING[name]
+    try:
+        _, full_name = resolve_backend(name)
+    except ValueError:
+        return None
+    if full_name in MODEL_PRICING:
+        return MODEL_PRICING[full_name]
+    for key, pricing in MODEL_PRICING.items():
+        try:
+            if resolve_backend(key)[1] == full_name:
+                return pricing
+        except ValueError:
+            continue
+    return None
+
+
+def get_backend_class(backend: str):
+    module_name, class_name = BACKENDS[backend]
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def create_model(
+    name: str,
+    server_url: Optional[str] = None,
+    local_options: Optional[Dict] = None,
+    **kwargs,
+):
+    """Instantiate a configured model, importing only its backend's dependencies.
+
+    With `server_url` (or MODEL_SERVER_URL), local models are not loaded in
+    this process; calls go to the shared model server (`serve.py`) instead.
+    `local_options` are constructor options for models that are loaded in
+    this process (LocalHuggingFaceModel) and are ignored for other backends.
+    """
+    backend, full_name = resolve_backend(name)
+    if server_url is None:
+        server_url = MODEL_SERVER_URL
+    if backend == "hf_local" and server_url:
+        backend = "openai_compat"
+        kwargs = {"base_url": server_url, **kwargs}
+    if backend == "hf_local" and local_options:
+        kwargs = {**local_options, **kwargs}
+    if backend == "openai" and not (kwargs.get("api_key") or OPENAI_API_KEY):
+        raise RuntimeError(f"Skipping {name}: OPENAI_API_KEY Missing")
+    if backend == "mock":
+        kwargs = {**MOCK_MODELS[name], **kwargs}
+    return get_backend_class(backend)(full_name, **kwargs)
+
+
+def release_memory():
+    """Free Python and accelerator memory after unloading a model.
+
+    torch is only touched if a local backend already imported it.
+    """
+    gc.collect()
+    torch = sys.modules.get("torch")
+    if torch is None:
+        return
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+    if torch.backends.mps.is_available():
+        try:
+            torch.mps.empty_cache()
+        except AttributeError:
+            pass  # Some older torch versions might not accept this
@@ -0,0 +1,170 @@
+"""Local OpenAI-compatible chat-completions server.
+
+Loads each model once and shares it between every evaluator on the host:
+
+    POST /v1/chat/completions   (non-streaming, with `usage`)
+    GET  /v1/models
+    GET  /health
+
+Clients use `OpenAICompatibleModel` (or any OpenAI SDK) with
+`base_url=http://host:port/v1`.
+"""
+import contextlib
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from .unified_interface import UnifiedLLMInterface
+
+
+def split_messages(messages: List[Dict]) -> Tuple[str, str]:
+    """Collapse chat messages into the (system, user) pair our backends take."""
+    system = "\n".join(
+        str(m.get("content") or "") for m in messages if m.get("role") == "system"
+    )
+    user = "\n".join(
+        str(m.get("content") or "") for m in messages if m.get("role") != "system"
+    )
+    return system, user
+
+
+class ModelServer:
+    """Serves already-loaded models by configured key and by full model id.
+
+    Calls to the same model are serialized with a per-model lock so
+    concurrent clients queue instead of competing for device memory, unless
+    the model batches concurrent calls itself (continuous batching).
+    """
+
+    def __init__(self, models: Dict[str, UnifiedLLMInterface]):
+        self.models: Dict[str, UnifiedLLMInterface] = {}
+        self._locks: Dict[int, threading.Lock] = {}
+        for name, model in models.items():
+            self.models[name] = model
+            self.models[model.model_name] = model
+            self._locks.setdefault(id(model), threading.Lock())
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def model_list(self) -> Dict:
+        seen = {}
+        for model in self.models.values():
+            seen[model.model_name] = {
+                "id": model.model_name,
+                "object": "model",
+                "owned_by": "local",
+            }
+        return {"object": "list", "data": list(seen.values())}
+
+    def complete(self, request: Dict) -> Tuple[int, Dict]:
+        """Handle one chat-completions request; returns (status, body)."""
+        if request.get("stream"):
+            return 400, _error("Streaming is not supported", "invalid_request_error")
+        model = self.models.get(request.get("model"))
+        if model is None:
+            return 404, _error(f"Unknown model: {request.get('model')}", "model_not_found")
+        messages = request.get("messages")
+        if not isinstance(messages, list) or not messages:
+            return 400, _error("'messages' must be a non-empty list", "invalid_request_error")
+
+        kwargs = {}
+        if request.get("temperature") is not None:
+            kwargs["temperature"] = float(request["temperature"])
+        if request.get("top_p") is not None:
+            kwargs["top_p"] = float(request["top_p"])
+        max_tokens = request.get("max_completion_tokens") or request.get("max_tokens")
+        if max_tokens is not None:
+            kwargs["max_new_tokens"] = int(max_tokens)
+
+        system, user = split_messages(messages)
+        if getattr(model, "batches_concurrent_calls", False):
+            lock = contextlib.nullcontext()
+        else:
+            lock = self._locks[id(model)]
+        with lock:
+            response = model.generate(system, user, **kwargs)
+        if response.error:
+            return 500, _error(response.error, "server_error")
+
+        max_new = kwargs.get("max_new_tokens")
+        finish = "length" if max_new and response.output_tokens >= max_new else "stop"
+        return 200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model.model_name,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": response.content},
+                    "finish_reason": finish,
+                }
+            ],
+            "usage": {
+                "prompt_tokens": response.input_tokens,
+                "completion_tokens": response.output_tokens,
+                "total_tokens": response.input_tokens + response.output_tokens,
+            },
+            # Non-standard extras; OpenAI clients ignore them
+            "x_latency_ms": response.latency_ms,
+            "x_gpu_memory_mb": response.gpu_memory_mb,
+        }
+
+    def start(self, host: str = "127.0.0.1", port: int = 8000, block: bool = True):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _send(self, status: int, body: Dict):
+                payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                path = self.path.split("?")[0].rstrip("/")
+                if path == "/health":
+                    self._send(200, {"status": "ok"})
+                elif path == "/v1/models":
+                    self._send(200, server.model_list())
+                else:
+                    self._send(404, _error(f"Unknown path: {self.path}", "not_found"))
+
+            def do_POST(self):
+                if self.path.split("?")[0].rstrip("/") != "/v1/chat/completions":
+                    self._send(404, _error(f"Unknown path: {self.path}", "not_found"))
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    request = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._send(400, _error("Invalid JSON body", "invalid_request_error"))
+                    return
+                try:
+                    status, body = server.complete(request)
+                except Exception as e:
+                    status, body = 500, _error(str(e), "server_error")
+                self._send(status, body)
+
+            def log_message(self, format, *args):
+                pass  # Keep request logs out of the console
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        if block:
+            self._server.serve_forever()
+        else:
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def _error(message: str, kind: str) -> Dict:
+    return {"error": {"message": message, "type": kind}}
@@ -0,0 +1,123 @@
+"""Weight snapshots for fast cold starts of local models.
+
+The first load of a model from the Hub saves it once more, already in the
+dtype it is served in, as sharded safetensors together with its tokenizer:
+
+    MODEL_SNAPSHOT_DIR/<org--name>/<dtype>/<revision>/
+
+Later loads read the snapshot with `low_cpu_mem_usage=True`, so the
+safetensors shards are memory-mapped and assigned without a float cast or a
+second materialized copy. A snapshot is tied to the source revision (Hub
+commit sha, or file mtimes for a local directory); when the source moves
+on, the next load builds a new one. Older revisions are left in place, since
+another process may be loading from them; delete them by hand.
+
+Snapshots are off unless MODEL_SNAPSHOT_DIR is set.
+"""
+import json
+import os
+import shutil
+import time
+from typing import Optional
+
+from config import MODEL_SNAPSHOT_DIR
+
+SNAPSHOT_META = "snapshot.json"
+
+
+def source_revision(model_name: str) -> Optional[str]:
+    """Revision `from_pretrained` would load.
+
+    None if it can't be determined, or if snapshots are disabled.
+    """
+    if not MODEL_SNAPSHOT_DIR:
+        return None
+    if os.path.isdir(model_name):
+        stamps = [
+            os.path.getmtime(os.path.join(model_name, f)) for f in os.listdir(model_name)
+        ]
+        return f"local-{int(max(stamps, default=0))}"
+    try:
+        from huggingface_hub import HfApi, constants, try_to_load_from_cache
+    except ImportError:
+        return None
+    try:
+        # The commit "main" resolved to when the model was downloaded, read
+        # from the local Hub cache: .../models--org--name/snapshots/<sha>/config.json
+        path = try_to_load_from_cache(model_name, "config.json")
+        if isinstance(path, str):
+            return os.path.basename(os.path.dirname(path))
+    except Exception:
+        pass  # Not a valid repo id
+    if constants.HF_HUB_OFFLINE:
+        return None
+    try:
+        # Not downloaded yet, so from_pretrained is about to fetch it anyway
+        return HfApi().model_info(model_name, timeout=10).sha
+    except Exception:
+        return None  # Hub unreachable
+
+
+def _model_dir(model_name: str, dtype_name: str) -> str:
+    safe_name = model_name.strip("/").replace("/", "--")
+    return os.path.join(MODEL_SNAPSHOT_DIR, safe_name, dtype_name)
+
+
+def find_snapshot(model_name: str, dtype_name: str, revision: Optional[str]) -> Optional[str]:
+    """Path of a snapshot of `revision` (see `source_revision`), if one exists.
+
+    When the revision is unknown (offline without a Hub cache), the newest
+    snapshot is used as is.
+    """
+    if not MODEL_SNAPSHOT_DIR:
+        return None
+    model_dir = _model_dir(model_name, dtype_name)
+    if not os.path.isdir(model_dir):
+        return None
+    if revision is not None:
+        path = os.path.join(model_dir, revision)
+        return path if os.path.exists(os.path.join(path, SNAPSHOT_META)) else None
+    complete = [
+        os.path.join(model_dir, d)
+        for d in os.listdir(model_dir)
+        if os.path.exists(os.path.join(model_dir, d, SNAPSHOT_META))
+    ]
+    return max(complete, key=os.path.getmtime, default=None)
+
+
+def save_snapshot(
+    model, tokenizer, model_name: str, dtype_name: str, revision: Optional[str]
+) -> Optional[str]:
+    """Write a snapshot of a loaded (CPU-resident) model; returns its path.
+
+    Written to a temporary directory and renamed into place, so a crash never
+    leaves a half-written snapshot behind. If another process finishes the
+    same snapshot first, its copy is kept.
+    """
+    if not MODEL_SNAPSHOT_DIR or revision is None:
+        return None
+    model_dir = _model_dir(model_name, dtype_name)
+    path = os.path.join(model_dir, revision)
+    if os.path.exists(os.path.join(path, SNAPSHOT_META)):
+        return path
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    model.save_pretrained(tmp_path, safe_serialization=True, max_shard_size="2GB")
+    tokenizer.save_pretrained(tmp_path)
+    meta = {
+        "source": model_name,
+        "revision": revision,
+        "dtype": dtype_name,
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    with open(os.path.join(tmp_path, SNAPSHOT_META), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        # `path` is a non-empty directory: a concurrent loader got there first
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        if not os.path.exists(os.path.join(path, SNAPSHOT_META)):
+            raise
+    return path
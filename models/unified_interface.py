@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 import time
 
 @dataclass
@@ -24,6 +24,14 @@ class UnifiedLLMInterface(ABC):
     def generate(self, system_prompt: str, user_prompt: str, **kwargs) -> LLMResponse:
         """Generate a response from the model."""
         pass
+
+    def generate_batch(self, prompts: List[Tuple[str, str]], **kwargs) -> List[LLMResponse]:
+        """Generate for several (system_prompt, user_prompt) pairs.
+
+        Backends that can batch on device override this; the default runs the
+        prompts one after another.
+        """
+        return [self.generate(s, u, **kwargs) for s, u in prompts]
     
     def calculate_cost(self, input_tokens: int, output_tokens: int) -> float:
         """Calculate cost based on model pricing."""
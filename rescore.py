@@ -0,0 +1,158 @@
+import sys
+import os
+import argparse
+import json
+import re
+from typing import Dict, List, Optional
+
+# Ensure we can import the package modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from evaluation.rescoring import (
+    METRIC_GROUPS,
+    MetricCache,
+    changed_groups,
+    rescore_results,
+)
+from evaluation.tasks import get_task
+from utils.cost_tracker import MODEL_STAT_COLUMNS
+from utils.report_generator import ReportGenerator
+from utils.run_catalog import REQUEST_SUCCESS_RATE, RunCatalog
+
+_RUN_ID_PATTERN = re.compile(r"(\d{8}_\d{6})")
+
+
+def load_raw_results(path: str) -> List[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
+
+
+def stored_model_stats(catalog: RunCatalog, run_id: str) -> pd.DataFrame:
+    """Latency/cost aggregates recorded for a run (they don't change on rescore)."""
+    stats = catalog.model_stats(run_id)
+    if stats.empty:
+        return pd.DataFrame()
+    # The catalog stores the request success rate next to the result success rate
+    # (as "success_rate_requests" in runs recorded before it was named)
+    stats = stats.drop(columns="success_rate", errors="ignore").rename(
+        columns={REQUEST_SUCCESS_RATE: "success_rate", "success_rate_requests": "success_rate"}
+    )
+    if "requests" not in stats.columns:
+        return pd.DataFrame()
+    # NaN stats (e.g. tokens/sec with zero latency) are not stored
+    return stats.reindex(columns=MODEL_STAT_COLUMNS)
+
+
+def resolve_runs(catalog: RunCatalog, args) -> List[Dict]:
+    """Runs to rescore as dicts with run_id, raw_path and stored metric versions."""
+    runs = []
+    if args.all or args.last:
+        table = catalog.runs(limit=args.last or None)
+        run_ids = list(table["run_id"]) if not table.empty else []
+    else:
+        run_ids = list(args.runs or [])
+    for run_id in run_ids:
+        run = catalog.get_run(run_id)
+        if run is None:
+            print(f"Skipping {run_id}: not in the run catalog")
+            continue
+        runs.append(
+            {
+                "run_id": run_id,
+                "raw_path": run["raw_path"],
+                "versions": run["extra"].get("metric_versions"),
+            }
+        )
+    for path in args.raw or []:
+        match = _RUN_ID_PATTERN.search(os.path.basename(path))
+        run_id = match.group(1) if match else None
+        run = catalog.get_run(run_id) if run_id else None
+        runs.append(
+            {
+                "run_id": run_id,
+                "raw_path": path,
+                "versions": run["extra"].get("metric_versions") if run else None,
+            }
+        )
+    return runs
+
+
+def rescore_run(
+    run: Dict,
+    catalog: RunCatalog,
+    reporter: ReportGenerator,
+    cache: MetricCache,
+    case_inputs: Dict[str, Dict],
+    force: bool = False,
+    workers: Optional[int] = None,
+) -> Optional[Dict]:
+    raw_path = run["raw_path"]
+    if not raw_path or not os.path.exists(raw_path):
+        print(f"[{run['run_id']}] raw results not found: {raw_path}")
+        return None
+
+    groups = list(METRIC_GROUPS) if force else changed_groups(run["versions"])
+    if not groups:
+        print(f"[{run['run_id']}] metrics up to date, skipping")
+        return None
+
+    results = load_raw_results(raw_path)
+    counts = rescore_results(results, case_inputs, groups=groups, cache=cache, workers=workers)
+    for group, c in counts.items():
+        print(
+            f"[{run['run_id']}] {group}: {c['scored']} scored "
+            f"({c['computed']} computed, the rest from cache or identical outputs; "
+            f"{c['skipped']} skipped)"
+        )
+
+    model_stats = (
+        stored_model_stats(catalog, run["run_id"]) if run["run_id"] else pd.DataFrame()
+    )
+    return reporter.generate_report(
+        results, model_stats=model_stats, catalog=catalog, run_id=run["run_id"]
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Recompute metrics for stored runs without re-running models"
+    )
+    parser.add_argument("--runs", nargs="+", help="Run ids from the run catalog")
+    parser.add_argument("--last", type=int, default=None, help="The N most recent runs")
+    parser.add_argument("--all", action="store_true", help="Every run in the catalog")
+    parser.add_argument(
+        "--raw", nargs="+", help="raw_results_*.json(l) files (catalogued or not)"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Recompute every metric group, not only those whose code changed",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Scoring processes (default: all cores)"
+    )
+    parser.add_argument(
+        "--output", default="restaurant_llm_evaluation/results", help="Results directory"
+    )
+    args = parser.parse_args()
+
+    if not (args.runs or args.last or args.all or args.raw):
+        parser.error("choose runs with --runs, --last, --all or --raw")
+
+    catalog = RunCatalog(os.path.join(args.output, "runs.sqlite"))
+    cache = MetricCache(os.path.join(args.output, "metric_cache.sqlite"))
+    reporter = ReportGenerator(args.output)
+    case_inputs = {str(c["id"]): c["input"] for c in get_task("make_persona").cases}
+
+    # Oldest first, so regression checks compare each run against rescored history
+    runs = sorted(resolve_runs(catalog, args), key=lambda r: r["run_id"] or "")
+    for run in runs:
+        rescore_run(run, catalog, reporter, cache, case_inputs, args.force, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import sys
+import os
+import argparse
+
+# Ensure we can import the package modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import LOCAL_MODELS
+from models import create_model, resolve_backend
+from models.server import ModelServer
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve local models over an OpenAI-compatible HTTP API"
+    )
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        required=True,
+        help="Local models to load once and share (e.g. qwen2.5-7b or 'all')",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--continuous-batching",
+        action="store_true",
+        help="Batch concurrent requests per model at the decode-step level",
+    )
+    parser.add_argument(
+        "--batch-slots", type=int, default=8, help="Sequences decoded together per model"
+    )
+    parser.add_argument(
+        "--prefix-cache",
+        action="store_true",
+        help="Reuse the KV cache of each system prompt across requests",
+    )
+    args = parser.parse_args()
+
+    names = list(LOCAL_MODELS.keys()) if "all" in args.models else args.models
+    models = {}
+    for name in names:
+        backend, _ = resolve_backend(name)
+        if backend not in ("hf_local", "mock"):
+            print(f"Skipping {name}: only local models can be served")
+            continue
+        print(f"[{name}] Loading...")
+        # server_url="" keeps the model in this process even if MODEL_SERVER_URL is set
+        local_options = {}
+        if args.continuous_batching:
+            local_options = {"continuous_batching": True, "max_batch_slots": args.batch_slots}
+        if args.prefix_cache:
+            local_options["prefix_cache"] = True
+        models[name] = create_model(name, server_url="", local_options=local_options)
+
+    if not models:
+        print("No models to serve.")
+        return
+
+    server = ModelServer(models)
+    base_url = f"http://{args.host}:{args.port}/v1"
+    print(f"Serving {sorted(m.model_name for m in models.values())} on {base_url}")
+    print(f"Point evaluators at it with: MODEL_SERVER_URL={base_url}")
+    try:
+        server.start(args.host, args.port)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
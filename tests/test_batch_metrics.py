@@ -0,0 +1,97 @@
+import copy
+import json
+import random
+
+from config import SYSTEM_PROMPTS
+from evaluation.batch_metrics import score_persona_batch, score_responses_batch
+from evaluation.metrics import (
+    PERSONA_METRICS,
+    calculate_persona_generation_metrics,
+    score_persona_data,
+)
+from evaluation.tasks import build_user_prompt
+from evaluation.test_cases import PERSONA_GEN_CASES
+from models.mock_models import MockModel
+
+# Parsed outputs with odd field types that the scalar path still scores
+EDGE_OUTPUTS = [
+    None,
+    {},
+    {"name": None},
+    {"allergies": "땅콩"},
+    {"allergies": {"땅콩": 1}, "preferred_food_categories": ["땅콩버터"]},
+    {"description": ["퇴근", "주말"], "reasoning": ["때문에"]},
+    {"name": ["a"], "allergies": []},
+    {"allergies": [""], "preferred_ingredients": []},
+    {"allergies": ["새우"], "preferred_ingredients": ["새우튀김"]},
+]
+
+
+def random_output(rng: random.Random, case_input):
+    data = {
+        "reasoning": "때문에 " * rng.randint(0, 30),
+        "name": case_input.get("name") if rng.random() < 0.7 else "someone else",
+        "gender": "여성",
+        "age_group": "20대",
+        "allergies": list(case_input.get("allergies", []))[: rng.randint(0, 3)]
+        + rng.sample(["땅콩", "우유", "새우"], rng.randint(0, 2)),
+        "preferred_food_categories": rng.sample(["한식", "새우요리", "땅콩버터"], rng.randint(0, 2)),
+        "preferred_ingredients": rng.sample(["우유빵", "김치", ""], rng.randint(0, 2)),
+        "description": "퇴근 후 주말 스트레스 " * rng.randint(0, 4),
+    }
+    return {k: v for k, v in data.items() if rng.random() > 0.05}
+
+
+def test_parsed_outputs_match_scalar_metrics():
+    rng = random.Random(0)
+    inputs = [PERSONA_GEN_CASES[i % len(PERSONA_GEN_CASES)]["input"] for i in range(2000)]
+    outputs = [random_output(rng, case_input) for case_input in inputs]
+    inputs += [PERSONA_GEN_CASES[0]["input"]] * len(EDGE_OUTPUTS)
+    outputs += EDGE_OUTPUTS
+
+    columns = score_persona_batch(inputs, outputs)
+
+    for i, (case_input, data) in enumerate(zip(inputs, outputs)):
+        expected = score_persona_data(case_input, data)
+        for name in PERSONA_METRICS:
+            assert columns[name][i] == expected[name], (name, data)
+
+
+def test_responses_match_scalar_metrics():
+    model = MockModel("mock", malformed_rate=0.2)
+    system_prompt = SYSTEM_PROMPTS["make_persona"]
+    inputs, responses = [], []
+    for case in PERSONA_GEN_CASES * 20:
+        inputs.append(case["input"])
+        responses.append(model.generate(system_prompt, build_user_prompt(case)).content)
+    responses.append(json.dumps({"name": "x"}, ensure_ascii=False))
+    inputs.append(PERSONA_GEN_CASES[0]["input"])
+
+    frame = score_responses_batch(inputs, responses, as_frame=True)
+
+    assert list(frame.columns) == PERSONA_METRICS
+    expected = [calculate_persona_generation_metrics(i, r) for i, r in zip(inputs, responses)]
+    assert frame.to_dict("records") == expected
+
+
+def test_empty_batch():
+    frame = score_persona_batch([], [], as_frame=True)
+    assert frame.empty and list(frame.columns) == PERSONA_METRICS
+
+
+def test_streamed_results_carry_batch_metrics():
+    from evaluation.evaluators import Evaluator
+    from utils.cost_tracker import CostTracker
+
+    streamed = []  # Copies, as a listener persisting each result would see it
+    evaluator = Evaluator(
+        [MockModel("mock")], CostTracker(), on_result=lambda r: streamed.append(copy.deepcopy(r))
+    )
+    results = evaluator.run_all(["make_persona"])
+
+    assert len(streamed) == len(results) == len(PERSONA_GEN_CASES)
+    for r in streamed:
+        assert set(PERSONA_METRICS) <= set(r["metrics"])
+        case = next(c for c in PERSONA_GEN_CASES if c["id"] == r["case_id"])
+        expected = calculate_persona_generation_metrics(case["input"], r["response"])
+        assert {k: r["metrics"][k] for k in PERSONA_METRICS} == expected
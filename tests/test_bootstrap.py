@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+from utils.bootstrap import bootstrap_metrics
+
+
+def test_missing_cases_do_not_count_as_losses():
+    # Equal scores; "sparse" only has two of the thirty cases
+    rows = [("make_persona", c, "full", 0.5) for c in range(30)]
+    rows += [("make_persona", c, "sparse", 0.5) for c in range(2)]
+    df = pd.DataFrame(rows, columns=["task", "case_id", "model", "score"])
+
+    _, win_prob = bootstrap_metrics(df, ["score"], n_resamples=500)
+
+    assert np.allclose(win_prob.loc["score"].to_numpy(), 0.5)
+
+
+def test_case_ids_are_paired_within_their_task():
+    df = pd.DataFrame(
+        {
+            "task": ["a", "a", "b", "b"] * 2,
+            "case_id": [1, 2, 1, 2] * 2,
+            "model": ["x"] * 4 + ["y"] * 4,
+            "score": [1.0, 0.0, 0.0, 1.0, 0.0, 1.0, 1.0, 0.0],
+        }
+    )
+
+    ci, _ = bootstrap_metrics(df, ["score"], n_resamples=200)
+    ci_by_id, _ = bootstrap_metrics(df, ["score"], case_cols=["case_id"], n_resamples=200)
+
+    # Four cases per model, not two averaged ones
+    assert ci.loc[("x", "score"), "ci_low"] == 0.0
+    assert ci_by_id.loc[("x", "score"), "ci_low"] == 0.5
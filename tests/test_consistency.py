@@ -0,0 +1,31 @@
+import json
+
+from evaluation.consistency import ConsistencyEngine, consistency_groups
+
+
+def persona(description: str) -> str:
+    return json.dumps({"description": description, "reasoning": ""}, ensure_ascii=False)
+
+
+def test_new_corpus_gets_new_vocabulary():
+    engine = ConsistencyEngine()
+    first = engine.fit(["퇴근 후 혼밥", "주말 데이트"])
+    assert engine.fit(["퇴근 후 혼밥", "주말 데이트"]) is first
+    second = engine.fit(["회식 자리", "조용한 분위기"])
+    assert second is not first
+    assert "회식" in second.vocabulary_
+
+
+def test_score_ignores_other_models_outputs():
+    results = [
+        {"task": "make_persona", "model": "a", "run_responses": [persona("퇴근 후 혼밥"), persona("퇴근 후 혼밥 선호")]},
+        {"task": "make_persona", "model": "b", "run_responses": [persona("주말 데이트"), persona("시끄러운 회식")]},
+    ]
+    groups = consistency_groups(results)
+    assert list(groups) == [("make_persona", "a"), ("make_persona", "b")]
+
+    engine = ConsistencyEngine()
+    alone = engine.score_cases([results[0]["run_responses"]])
+    grouped = engine.score_cases([r["run_responses"] for r in groups[("make_persona", "a")]])
+    assert alone[0] == grouped[0]
+    assert 0.0 < alone[0] < 1.0
@@ -0,0 +1,28 @@
+from utils.cost_tracker import CostTracker, read_spool, spool_runs
+
+
+def log(tracker, latencies, model="mock"):
+    for latency in latencies:
+        tracker.log_request(model, "make_persona", 10, 20, latency, 0.0, True)
+
+
+def test_scanned_tables_do_not_follow_the_buffer(tmp_path):
+    tracker = CostTracker(spool_dir=str(tmp_path), segment_rows=4)
+    log(tracker, [0.0, 1.0])
+    scanned = tracker.scan(["latency_ms"])
+    log(tracker, [100.0 + i for i in range(6)])  # Spills and reuses the buffer
+    assert scanned.column("latency_ms").to_pylist() == [0.0, 1.0]
+
+
+def test_runs_sharing_a_spool_dir_stay_separate(tmp_path):
+    first = CostTracker(spool_dir=str(tmp_path), segment_rows=2, run_id="20260101_000000_1")
+    log(first, [1.0, 2.0, 3.0])
+    first.flush()
+    second = CostTracker(spool_dir=str(tmp_path), segment_rows=2, run_id="20260101_000001_2")
+    log(second, [4.0], model="other")
+    second.flush()
+
+    assert spool_runs(str(tmp_path)) == [first.run_id, second.run_id]
+    assert read_spool(str(tmp_path), run_id=first.run_id).num_rows == 3
+    latest = read_spool(str(tmp_path))
+    assert latest.column("latency_ms").to_pylist() == [4.0]
@@ -0,0 +1,23 @@
+from models.fast_decode import PROMPT_BUCKET, bucket_prompts, fits_static_cache, prompt_bucket
+
+
+def test_prompt_bucket_rounds_up():
+    assert prompt_bucket(1) == PROMPT_BUCKET
+    assert prompt_bucket(PROMPT_BUCKET) == PROMPT_BUCKET
+    assert prompt_bucket(PROMPT_BUCKET + 1) == 2 * PROMPT_BUCKET
+
+
+def test_buckets_and_cache_fit():
+    # Stand-in for tokenization: one token per character of the user prompt
+    prompts = [("sys", "a" * 10), ("sys", "b" * 100), ("sys", "c" * 200), ("sys", "d" * 300)]
+    buckets = bucket_prompts(prompts, lambda system, user: len(user))
+
+    assert buckets == {
+        PROMPT_BUCKET: prompts[0],
+        2 * PROMPT_BUCKET: prompts[2],
+        3 * PROMPT_BUCKET: prompts[3],
+    }
+    cache_len = max(buckets) + 64
+    assert fits_static_cache(cache_len, 300, 64)
+    assert not fits_static_cache(cache_len, 300, 65)
+    assert not fits_static_cache(cache_len, 3 * PROMPT_BUCKET + 1, 1)
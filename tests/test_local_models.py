@@ -0,0 +1,47 @@
+from unittest import mock
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from models import local_models
+from models.local_models import LocalHuggingFaceModel
+
+
+@pytest.fixture
+def loaded():
+    """Patch loading so construction runs without downloading anything."""
+    tokenizer = mock.MagicMock(eos_token_id=2)
+    model = mock.MagicMock()
+    model.generation_config.eos_token_id = 2
+    with mock.patch.object(
+        local_models.AutoTokenizer, "from_pretrained", return_value=tokenizer
+    ), mock.patch.object(
+        local_models.AutoModelForCausalLM, "from_pretrained", return_value=model
+    ), mock.patch.object(local_models, "source_revision", return_value=None), mock.patch.object(
+        local_models, "find_snapshot", return_value=None
+    ), mock.patch.object(local_models, "save_snapshot", return_value=None):
+        yield tokenizer, model
+
+
+def test_construction_initializes_state(loaded):
+    tokenizer, model = loaded
+    llm = LocalHuggingFaceModel("org/tiny-model", device="cpu")
+
+    assert llm.tokenizer is tokenizer and llm.model is model
+    assert llm.load_stats["source"] == "hub"
+    assert not llm.prefix_cache and len(llm._prefixes) == 0
+    assert llm._static_cache is None and llm.fast_decode_stats == {}
+    assert not llm.batches_concurrent_calls and llm.batching_stats() == {}
+
+
+def test_construction_with_continuous_batching(loaded):
+    _, model = loaded
+    llm = LocalHuggingFaceModel(
+        "org/tiny-model", device="cpu", continuous_batching=True, max_batch_slots=4
+    )
+
+    assert llm.batches_concurrent_calls
+    assert llm._engine.model is model and llm._engine.max_slots == 4
+    assert llm._engine.eos_token_ids == {2}
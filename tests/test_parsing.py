@@ -0,0 +1,34 @@
+import json
+
+from evaluation.parsing import _extract_json, clear_parse_cache, extract_json
+
+PERSONA = {"name": "김철수", "allergies": ["땅콩"], "description": "퇴근 후 {혼밥} \"조용한\" 곳"}
+TEXT = json.dumps(PERSONA, ensure_ascii=False)
+
+
+def test_finds_the_object_around_prose_and_fences():
+    assert _extract_json(TEXT) == PERSONA
+    assert _extract_json(f"Sure:\n```json\n{TEXT}\n```\nDone.") == PERSONA
+    assert _extract_json(f"Persona for {{name}}:\n{TEXT}\nSee {{notes}}") == PERSONA
+    assert _extract_json(f"{{ unclosed brace {TEXT} trailing") == PERSONA
+    assert _extract_json(f'{{"broken": [{TEXT}') == PERSONA
+
+
+def test_returns_the_first_object_that_decodes():
+    assert _extract_json('{"a": 1} then {"b": 2}') == {"a": 1}
+    assert _extract_json('{not json} {"b": 2}') == {"b": 2}
+    assert _extract_json("[1, 2] no object") is None
+    assert _extract_json("") is None
+
+
+def test_deeply_nested_garbage_is_rejected():
+    assert _extract_json("{" * 10000) is None
+    assert _extract_json('{"a":' * 10000) is None
+
+
+def test_cached_results_are_independent_copies():
+    clear_parse_cache()
+    first = extract_json(TEXT)
+    first["allergies"].append("우유")
+    first["name"] = "someone"
+    assert extract_json(TEXT) == PERSONA
@@ -0,0 +1,46 @@
+import json
+import os
+
+import pytest
+
+from models import snapshots
+
+
+class _Saveable:
+    """Stands in for a model or tokenizer: writes one file per save."""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+
+    def save_pretrained(self, path, **kwargs):
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, self.filename), "w") as f:
+            f.write("{}")
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshots, "MODEL_SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    return tmp_path / "snapshots"
+
+
+def test_disabled_by_default(monkeypatch):
+    monkeypatch.setattr(snapshots, "MODEL_SNAPSHOT_DIR", "")
+    assert snapshots.source_revision("org/model") is None
+    assert snapshots.find_snapshot("org/model", "float32", "abc") is None
+    assert snapshots.save_snapshot(None, None, "org/model", "float32", "abc") is None
+
+
+def test_new_revision_keeps_older_snapshots(snapshot_dir):
+    model, tokenizer = _Saveable("model.safetensors"), _Saveable("tokenizer.json")
+    old = snapshots.save_snapshot(model, tokenizer, "org/model", "float32", "rev1")
+    new = snapshots.save_snapshot(model, tokenizer, "org/model", "float32", "rev2")
+
+    assert snapshots.find_snapshot("org/model", "float32", "rev1") == old
+    assert snapshots.find_snapshot("org/model", "float32", "rev2") == new
+    assert snapshots.find_snapshot("org/model", "float32", "rev3") is None
+    with open(os.path.join(new, snapshots.SNAPSHOT_META)) as f:
+        assert json.load(f)["revision"] == "rev2"
+    # Saving an existing revision again is a no-op
+    assert snapshots.save_snapshot(None, None, "org/model", "float32", "rev2") == new
+    assert sorted(os.listdir(snapshot_dir / "org--model" / "float32")) == ["rev1", "rev2"]
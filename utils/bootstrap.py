@@ -0,0 +1,100 @@
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Resamples whose case weights are materialized at a time
+RESAMPLE_CHUNK = 100
+
+
+def bootstrap_metrics(
+    df: pd.DataFrame,
+    metrics: List[str],
+    model_col: str = "model",
+    case_cols: Sequence[str] = ("task", "case_id"),
+    n_resamples: int = 10_000,
+    seed: Optional[int] = 0,
+    confidence: float = 0.95,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Paired case bootstrap for every (model, metric) at once.
+
+    Cases are resampled with replacement and the same resample is applied to
+    all models, so model comparisons are paired. A case is identified by
+    `case_cols` (those present in `df`), so case ids that repeat across
+    tasks stay distinct cases. Each resample is a vector of
+    case draw counts, which turns every bootstrap mean into one matrix
+    product. Rows are first collapsed to one value per (case, model), so the
+    cost depends on the number of cases, not the number of result rows.
+    Weights are drawn RESAMPLE_CHUNK resamples at a time, so memory does not
+    grow with n_resamples x n_cases.
+
+    Returns:
+        ci: rows (model, metric) with mean, ci_low, ci_high.
+        win_prob: rows (metric, model), one column per opponent, holding
+            P(model's mean > opponent's mean) with ties counted as half,
+            over the resamples where both means exist (NaN if there are none).
+    """
+    metrics = [m for m in metrics if m in df.columns]
+    if df.empty or not metrics:
+        return pd.DataFrame(), pd.DataFrame()
+
+    case_cols = [c for c in case_cols if c in df.columns]
+    if not case_cols:
+        raise ValueError("df has none of the case columns")
+    # values[case, model, metric]; repeated rows for a case are averaged
+    case_key = df.groupby(case_cols, sort=False).ngroup().rename("_case")
+    cube = df.groupby([case_key, df[model_col]])[metrics].mean()
+    cases = cube.index.get_level_values(0).unique()
+    models = cube.index.get_level_values(1).unique()
+    full_index = pd.MultiIndex.from_product([cases, models])
+    values = cube.reindex(full_index).to_numpy().reshape(
+        len(cases), len(models), len(metrics)
+    )
+
+    present = ~np.isnan(values)
+    flat_values = np.where(present, values, 0.0).reshape(len(cases), -1)
+    flat_present = present.reshape(len(cases), -1).astype(float)
+
+    # weights[r, c] = how many times case c was drawn in resample r
+    n_cases = len(cases)
+    rng = np.random.default_rng(seed)
+    boot = np.empty((n_resamples, flat_values.shape[1]))
+    for start in range(0, n_resamples, RESAMPLE_CHUNK):
+        n = min(RESAMPLE_CHUNK, n_resamples - start)
+        draws = rng.integers(0, n_cases, size=(n, n_cases))
+        draws += np.arange(n)[:, None] * n_cases
+        weights = np.bincount(draws.ravel(), minlength=n * n_cases)
+        weights = weights.reshape(n, n_cases).astype(float)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            boot[start : start + n] = (weights @ flat_values) / (weights @ flat_present)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        point = flat_values.sum(axis=0) / flat_present.sum(axis=0)
+    boot = boot.reshape(n_resamples, len(models), len(metrics))
+    point = point.reshape(len(models), len(metrics))
+
+    alpha = (1 - confidence) / 2
+    quantile = np.nanquantile if np.isnan(boot).any() else np.quantile
+    low, high = quantile(boot, [alpha, 1 - alpha], axis=0)
+
+    ci = pd.DataFrame(
+        {
+            "mean": point.ravel(),
+            "ci_low": low.ravel(),
+            "ci_high": high.ravel(),
+        },
+        index=pd.MultiIndex.from_product([models, metrics], names=["model", "metric"]),
+    )
+
+    # wins[a, b, k] = P(boot[:, a, k] > boot[:, b, k]) + 0.5 * P(tie), over the
+    # resamples where neither mean is NaN (a model can miss every drawn case)
+    a = boot[:, :, None, :]
+    b = boot[:, None, :, :]
+    both = ~np.isnan(a) & ~np.isnan(b)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        wins = (np.sum(a > b, axis=0) + 0.5 * np.sum(a == b, axis=0)) / np.sum(both, axis=0)
+    win_prob = pd.DataFrame(
+        wins.transpose(2, 0, 1).reshape(len(metrics) * len(models), len(models)),
+        index=pd.MultiIndex.from_product([metrics, models], names=["metric", "model"]),
+        columns=pd.Index(models, name="vs"),
+    )
+    return ci, win_prob
@@ -1,31 +1,507 @@
-from typing import Dict, List
+import bisect
+import glob
+import itertools
+import math
+import os
+import re
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
 import pandas as pd
 
-class CostTracker:
+from utils.run_catalog import new_run_id
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Columns kept for every logged request, in output order
+LOG_COLUMNS = [
+    "model",
+    "task",
+    "input_tokens",
+    "output_tokens",
+    "latency_ms",
+    "cost_usd",
+    "gpu_memory_mb",
+    "success",
+    "error",
+]
+
+_NUMERIC_DTYPES = {
+    "input_tokens": np.int64,
+    "output_tokens": np.int64,
+    "latency_ms": np.float64,
+    "cost_usd": np.float64,
+    "gpu_memory_mb": np.float64,
+    "success": np.bool_,
+}
+
+QUANTILES = [0.5, 0.95, 0.99]
+
+# Spooled segments are named telemetry_<run id>_<sequence>.arrow
+_SEGMENT_PATTERN = re.compile(r"telemetry_(.+)_(\d{6})\.arrow$")
+
+# Columns of `get_model_stats()`, in order
+MODEL_STAT_COLUMNS = [
+    "requests",
+    "success_rate",
+    "total_input_tokens",
+    "total_output_tokens",
+    "avg_latency_ms",
+    "total_cost_usd",
+    "avg_cost_per_req",
+    "peak_gpu_memory_mb",
+] + [f"p{int(q * 100)}_latency_ms" for q in QUANTILES] + [
+    f"p{int(q * 100)}_tokens_per_sec" for q in QUANTILES
+]
+
+
+class QuantileSketch:
+    """Streaming quantile estimate with bounded relative error (DDSketch-style).
+
+    Values are counted in logarithmic buckets, so memory depends on the value
+    range rather than on how many values were added. Estimates are within
+    `relative_accuracy` of the true quantile.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        # (sorted bucket keys, cumulative counts), valid until the next add
+        self._cumulative = None
+
+    def add(self, value: float):
+        self.count += 1
+        if value <= 0:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+        self._cumulative = None
+
+    def merge(self, other: "QuantileSketch"):
+        self.count += other.count
+        self.zero_count += other.zero_count
+        for key, n in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + n
+        self._cumulative = None
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return float("nan")
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+        if self._cumulative is None:
+            keys = sorted(self.buckets)
+            self._cumulative = (
+                keys,
+                list(itertools.accumulate(self.buckets[k] for k in keys)),
+            )
+        keys, cumulative = self._cumulative
+        # First bucket whose running count (after the zeros) exceeds the rank
+        i = min(bisect.bisect_right(cumulative, rank - self.zero_count), len(keys) - 1)
+        return 2 * self.gamma ** keys[i] / (self.gamma + 1)
+
+
+class _ModelStats:
+    """Running aggregates for one model."""
+
+    __slots__ = (
+        "count",
+        "success_count",
+        "input_tokens",
+        "output_tokens",
+        "latency_ms",
+        "cost_usd",
+        "gpu_memory_mb",
+        "latency_sketch",
+        "tps_sketch",
+    )
+
     def __init__(self):
-        self.logs = []
-        
-    def log_request(self, model: str, task: str, input_tokens: int, output_tokens: int, 
-                   latency_ms: float, cost: float, success: bool, gpu_mem: float = 0.0, error: str = None):
-        entry = {
-            "model": model,
-            "task": task,
-            "input_tokens": input_tokens,
-            "output_tokens": output_tokens,
-            "latency_ms": latency_ms,
-            "cost_usd": cost,
-            "gpu_memory_mb": gpu_mem,
-            "success": success,
-            "error": error
+        self.count = 0
+        self.success_count = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.latency_ms = 0.0
+        self.cost_usd = 0.0
+        self.gpu_memory_mb = 0.0
+        self.latency_sketch = QuantileSketch()
+        self.tps_sketch = QuantileSketch()
+
+    def add(self, input_tokens, output_tokens, latency_ms, cost, success, gpu_mem):
+        self.count += 1
+        self.success_count += int(bool(success))
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        self.latency_ms += latency_ms
+        self.cost_usd += cost
+        self.gpu_memory_mb = max(self.gpu_memory_mb, gpu_mem)
+        self.latency_sketch.add(latency_ms)
+        if latency_ms > 0:
+            self.tps_sketch.add(output_tokens / (latency_ms / 1000))
+
+    def as_row(self) -> Dict:
+        n = self.count or 1
+        row = {
+            "requests": self.count,
+            "success_rate": self.success_count / n,
+            "total_input_tokens": self.input_tokens,
+            "total_output_tokens": self.output_tokens,
+            "avg_latency_ms": self.latency_ms / n,
+            "total_cost_usd": self.cost_usd,
+            "avg_cost_per_req": self.cost_usd / n,
+            "peak_gpu_memory_mb": self.gpu_memory_mb,
+        }
+        for q in QUANTILES:
+            row[f"p{int(q * 100)}_latency_ms"] = self.latency_sketch.quantile(q)
+        for q in QUANTILES:
+            row[f"p{int(q * 100)}_tokens_per_sec"] = self.tps_sketch.quantile(q)
+        return row
+
+
+class CostTracker:
+    """Thread-safe, columnar log of every model call.
+
+    Requests are stored in preallocated typed NumPy columns (grown by
+    doubling) and folded into per-model running aggregates as they arrive, so
+    totals and latency percentiles never need a DataFrame.
+
+    With `spool_dir` set, the buffer is written out as an Arrow IPC segment
+    every `segment_rows` requests and then reused, so resident memory stays
+    flat for arbitrarily long runs. Segments are read back memory-mapped.
+    Their names carry `run_id` (default: a new timestamped id), so runs that
+    share a spool directory never overwrite or mix with each other.
+    """
+
+    def __init__(
+        self,
+        initial_capacity: int = 1024,
+        spool_dir: Optional[str] = None,
+        segment_rows: int = 65536,
+        metrics=None,
+        run_id: Optional[str] = None,
+    ):
+        self._lock = threading.Lock()
+        self.run_id = run_id or new_run_id()
+        # Optional live exporter (utils.live_metrics.EvalMetrics)
+        self.metrics = metrics
+        self._size = 0
+        self._capacity = max(1, initial_capacity)
+        self.spool_dir = spool_dir
+        self.segment_rows = segment_rows
+        self._segments: List[str] = []
+        self._spooled_rows = 0
+        if spool_dir:
+            if pa is None:
+                raise ImportError("pyarrow is required for telemetry spooling")
+            os.makedirs(spool_dir, exist_ok=True)
+            # The buffer never holds more than one segment
+            self._capacity = max(self._capacity, segment_rows)
+
+        self._columns = {
+            name: np.zeros(self._capacity, dtype=dtype)
+            for name, dtype in _NUMERIC_DTYPES.items()
         }
-        self.logs.append(entry)
-        
+        # Strings are dictionary-encoded; errors are rare so kept sparse
+        self._model_codes = np.zeros(self._capacity, dtype=np.int32)
+        self._task_codes = np.zeros(self._capacity, dtype=np.int32)
+        self._models: List[str] = []
+        self._tasks: List[str] = []
+        self._model_index: Dict[str, int] = {}
+        self._task_index: Dict[str, int] = {}
+        self._errors: Dict[int, str] = {}
+
+        self._stats: Dict[str, _ModelStats] = {}
+        self._total_cost = 0.0
+        self._summary_cache: Optional[pd.DataFrame] = None
+
+    def _grow(self):
+        self._capacity *= 2
+        for name, col in self._columns.items():
+            self._columns[name] = np.resize(col, self._capacity)
+        self._model_codes = np.resize(self._model_codes, self._capacity)
+        self._task_codes = np.resize(self._task_codes, self._capacity)
+
+    @staticmethod
+    def _encode(value: str, values: List[str], index: Dict[str, int]) -> int:
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(values)
+            values.append(value)
+        return code
+
+    def log_request(self, model: str, task: str, input_tokens: int, output_tokens: int,
+                   latency_ms: float, cost: float, success: bool, gpu_mem: float = 0.0, error: str = None):
+        with self._lock:
+            if self._size == self._capacity:
+                self._grow()
+            i = self._size
+            self._model_codes[i] = self._encode(model, self._models, self._model_index)
+            self._task_codes[i] = self._encode(task, self._tasks, self._task_index)
+            cols = self._columns
+            cols["input_tokens"][i] = input_tokens
+            cols["output_tokens"][i] = output_tokens
+            cols["latency_ms"][i] = latency_ms
+            cols["cost_usd"][i] = cost
+            cols["gpu_memory_mb"][i] = gpu_mem
+            cols["success"][i] = success
+            if error is not None:
+                self._errors[i] = error
+            self._size += 1
+
+            stats = self._stats.get(model)
+            if stats is None:
+                stats = self._stats[model] = _ModelStats()
+            stats.add(input_tokens, output_tokens, latency_ms, cost, success, gpu_mem)
+            self._total_cost += cost
+            self._summary_cache = None
+
+            if self.spool_dir and self._size >= self.segment_rows:
+                self._spill()
+
+        if self.metrics is not None:
+            self.metrics.observe_request(
+                model, input_tokens, output_tokens, latency_ms, cost, success
+            )
+
+    def __len__(self) -> int:
+        return self._spooled_rows + self._size
+
+    # --- Spooling ---
+
+    def _buffer_table(self) -> "pa.Table":
+        n = self._size
+        models = pa.array(self._models, type=pa.string())
+        tasks = pa.array(self._tasks, type=pa.string())
+        errors = [None] * n
+        for i, err in self._errors.items():
+            errors[i] = err
+        # pa.array wraps numpy memory without copying, and the buffer keeps
+        # being written (and is reused after a spill), so copy the live rows
+        arrays = [
+            pa.DictionaryArray.from_arrays(pa.array(self._model_codes[:n].copy()), models),
+            pa.DictionaryArray.from_arrays(pa.array(self._task_codes[:n].copy()), tasks),
+        ]
+        arrays += [pa.array(self._columns[name][:n].copy()) for name in _NUMERIC_DTYPES]
+        arrays.append(pa.array(errors, type=pa.string()))
+        return pa.Table.from_arrays(arrays, names=LOG_COLUMNS)
+
+    def _spill(self):
+        """Write the buffered rows to a new segment and reset the buffer."""
+        if self._size == 0:
+            return
+        path = os.path.join(
+            self.spool_dir, f"telemetry_{self.run_id}_{len(self._segments):06d}.arrow"
+        )
+        table = self._buffer_table()
+        with pa.OSFile(path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        self._segments.append(path)
+        self._spooled_rows += self._size
+        self._size = 0
+        self._errors = {}
+
+    def flush(self):
+        """Spill any buffered rows (no-op without a spool directory)."""
+        with self._lock:
+            if self.spool_dir:
+                self._spill()
+
+    @property
+    def segments(self) -> List[str]:
+        with self._lock:
+            return list(self._segments)
+
+    def scan(self, columns: Optional[List[str]] = None) -> "pa.Table":
+        """Spooled segments plus the live buffer as one memory-mapped Table."""
+        if pa is None:
+            raise ImportError("pyarrow is required to scan telemetry")
+        with self._lock:
+            segments = list(self._segments)
+            tables = [self._buffer_table()] if self._size else []
+        tables = [read_segment(p, columns) for p in segments] + [
+            t.select(columns) if columns else t for t in tables
+        ]
+        if not tables:
+            return pa.table({c: [] for c in (columns or LOG_COLUMNS)})
+        return pa.concat_tables(tables, promote_options="permissive")
+
     def get_summary(self) -> pd.DataFrame:
-        if not self.logs:
-            return pd.DataFrame()
-        return pd.DataFrame(self.logs)
-        
+        """All logged requests as a DataFrame.
+
+        This materializes every row; with spooling, prefer `scan()` or
+        `get_model_stats()`.
+        """
+        if self.spool_dir:
+            if len(self) == 0:
+                return pd.DataFrame()
+            df = self.scan().to_pandas()
+            for col in ("model", "task"):
+                df[col] = df[col].astype(object)
+            return df
+
+        with self._lock:
+            if self._size == 0:
+                return pd.DataFrame()
+            if self._summary_cache is None:
+                n = self._size
+                data = {
+                    "model": pd.Categorical.from_codes(
+                        self._model_codes[:n].copy(), categories=list(self._models)
+                    ).astype(object),
+                    "task": pd.Categorical.from_codes(
+                        self._task_codes[:n].copy(), categories=list(self._tasks)
+                    ).astype(object),
+                }
+                for name, col in self._columns.items():
+                    data[name] = col[:n].copy()
+                errors = np.full(n, None, dtype=object)
+                for i, err in self._errors.items():
+                    errors[i] = err
+                data["error"] = errors
+                self._summary_cache = pd.DataFrame(data, columns=LOG_COLUMNS)
+            return self._summary_cache
+
     def get_total_cost(self) -> float:
-        df = self.get_summary()
-        if df.empty: return 0.0
-        return df["cost_usd"].sum()
+        with self._lock:
+            return self._total_cost
+
+    def get_model_stats(self) -> pd.DataFrame:
+        """Per-model aggregates and latency / tokens-per-second percentiles."""
+        with self._lock:
+            rows = {model: stats.as_row() for model, stats in self._stats.items()}
+        if not rows:
+            return pd.DataFrame()
+        df = pd.DataFrame.from_dict(rows, orient="index")
+        df.index.name = "model"
+        return df
+
+
+def read_segment(path: str, columns: Optional[List[str]] = None) -> "pa.Table":
+    """Memory-map one telemetry segment (zero-copy for numeric columns)."""
+    reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+    table = reader.read_all()
+    return table.select(columns) if columns else table
+
+
+def _spool_segments(spool_dir: str) -> Dict[str, List[str]]:
+    """Segment paths in `spool_dir` by run id, each run's in write order."""
+    runs: Dict[str, List[str]] = {}
+    for path in sorted(glob.glob(os.path.join(spool_dir, "telemetry_*.arrow"))):
+        match = _SEGMENT_PATTERN.match(os.path.basename(path))
+        if match:
+            runs.setdefault(match.group(1), []).append(path)
+    return runs
+
+
+def spool_runs(spool_dir: str) -> List[str]:
+    """Run ids with segments in `spool_dir`, oldest first."""
+    return sorted(_spool_segments(spool_dir))
+
+
+def read_spool(
+    spool_dir: str, columns: Optional[List[str]] = None, run_id: Optional[str] = None
+) -> "pa.Table":
+    """Memory-map the segments one run wrote to `spool_dir` (default: the latest run)."""
+    runs = _spool_segments(spool_dir)
+    if run_id is None and runs:
+        run_id = max(runs)
+    paths = runs.get(run_id, [])
+    if not paths:
+        return pa.table({c: [] for c in (columns or LOG_COLUMNS)})
+    return pa.concat_tables(
+        [read_segment(p, columns) for p in paths], promote_options="permissive"
+    )
+
+
+def summarize_cost_frame(cost_df: pd.DataFrame) -> pd.DataFrame:
+    """Per-model stats of a stored log, with the columns of `get_model_stats`.
+
+    Totals and means match `CostTracker.get_model_stats`. Percentiles are
+    exact (interpolated) here, whereas the tracker's come from its
+    QuantileSketch and are within its relative accuracy (1%) of these.
+    """
+    if cost_df.empty:
+        return pd.DataFrame()
+    df = cost_df.copy()
+    latency_s = df["latency_ms"] / 1000
+    df["tokens_per_sec"] = (df["output_tokens"] / latency_s).where(latency_s > 0)
+    grouped = df.groupby("model", sort=False)
+    stats = grouped.agg(
+        requests=("latency_ms", "size"),
+        success_rate=("success", "mean"),
+        total_input_tokens=("input_tokens", "sum"),
+        total_output_tokens=("output_tokens", "sum"),
+        avg_latency_ms=("latency_ms", "mean"),
+        total_cost_usd=("cost_usd", "sum"),
+        avg_cost_per_req=("cost_usd", "mean"),
+        peak_gpu_memory_mb=("gpu_memory_mb", "max"),
+    )
+    for q in QUANTILES:
+        stats[f"p{int(q * 100)}_latency_ms"] = grouped["latency_ms"].quantile(q)
+    for q in QUANTILES:
+        stats[f"p{int(q * 100)}_tokens_per_sec"] = grouped["tokens_per_sec"].quantile(q)
+    return stats
+
+
+def spool_model_stats(spool_dir: str, run_id: Optional[str] = None) -> pd.DataFrame:
+    """Per-model aggregates of one spooled run, computed in Arrow over memory-mapped segments."""
+    import pyarrow.compute as pc
+
+    table = read_spool(spool_dir, run_id=run_id)
+    if table.num_rows == 0:
+        return pd.DataFrame()
+    table = table.set_column(
+        0, "model", pc.cast(table.column("model"), pa.string())
+    )
+    latency_s = pc.divide(table.column("latency_ms"), 1000.0)
+    tps = pc.if_else(
+        pc.greater(latency_s, 0),
+        pc.divide(pc.cast(table.column("output_tokens"), pa.float64()), latency_s),
+        None,
+    )
+    table = table.append_column("tokens_per_sec", tps)
+    tdigest = pc.TDigestOptions(q=QUANTILES)
+    grouped = table.group_by("model").aggregate(
+        [
+            ("latency_ms", "count"),
+            ("success", "mean"),
+            ("input_tokens", "sum"),
+            ("output_tokens", "sum"),
+            ("latency_ms", "mean"),
+            ("cost_usd", "sum"),
+            ("cost_usd", "mean"),
+            ("gpu_memory_mb", "max"),
+            ("latency_ms", "tdigest", tdigest),
+            ("tokens_per_sec", "tdigest", tdigest),
+        ]
+    )
+    stats = pd.DataFrame(
+        {
+            "requests": grouped.column("latency_ms_count").to_numpy(),
+            "success_rate": grouped.column("success_mean").to_numpy(),
+            "total_input_tokens": grouped.column("input_tokens_sum").to_numpy(),
+            "total_output_tokens": grouped.column("output_tokens_sum").to_numpy(),
+            "avg_latency_ms": grouped.column("latency_ms_mean").to_numpy(),
+            "total_cost_usd": grouped.column("cost_usd_sum").to_numpy(),
+            "avg_cost_per_req": grouped.column("cost_usd_mean").to_numpy(),
+            "peak_gpu_memory_mb": grouped.column("gpu_memory_mb_max").to_numpy(),
+        },
+        index=pd.Index(grouped.column("model").to_pylist(), name="model"),
+    )
+    for name in ("latency_ms", "tokens_per_sec"):
+        digests = grouped.column(f"{name}_tdigest").to_pylist()
+        for j, q in enumerate(QUANTILES):
+            stats[f"p{int(q * 100)}_{name}"] = [
+                d[j] if d else float("nan") for d in digests
+            ]
+    return stats
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+ACTIVE_STATUSES = ("queued", "running")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    job_key TEXT NOT NULL,
+    models TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    total_cases INTEGER DEFAULT 0,
+    current_model TEXT,
+    pid INTEGER,
+    error TEXT,
+    report_path TEXT,
+    model_stats TEXT
+);
+CREATE TABLE IF NOT EXISTS job_results (
+    job_id TEXT NOT NULL REFERENCES jobs(job_id) ON DELETE CASCADE,
+    model TEXT NOT NULL,
+    case_id TEXT NOT NULL,
+    task TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (job_id, task, model, case_id)
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_key ON jobs (job_key, status);
+CREATE INDEX IF NOT EXISTS idx_job_results_seq ON job_results (job_id, seq);
+"""
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return True  # Not started yet
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """SQLite store shared by the dashboard and background evaluation workers.
+
+    Workers append per-case results as they complete; any number of dashboard
+    sessions can poll the same job. WAL mode lets readers poll while a worker
+    is writing.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    @staticmethod
+    def job_key(models: List[str]) -> str:
+        return hashlib.sha256(json.dumps(sorted(models)).encode()).hexdigest()[:16]
+
+    def submit(self, models: List[str]) -> Tuple[str, bool]:
+        """Create a queued job, or return the active job for the same models.
+
+        Returns (job_id, created).
+        """
+        key = self.job_key(models)
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT job_id, pid FROM jobs WHERE job_key = ? AND status IN (?, ?) "
+                "ORDER BY created_at DESC LIMIT 1",
+                (key, *ACTIVE_STATUSES),
+            ).fetchone()
+            if row and _pid_alive(row[1]):
+                return row[0], False
+            if row:
+                # Worker died without reporting; don't let it block new runs
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? "
+                    "WHERE job_id = ?",
+                    ("worker process exited unexpectedly", _now(), row[0]),
+                )
+            job_id = datetime.now().strftime("%Y%m%d_%H%M%S_") + uuid.uuid4().hex[:6]
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, job_key, models, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, key, json.dumps(models), _now(), _now()),
+            )
+            return job_id, True
+
+    def update(self, job_id: str, **fields):
+        if "model_stats" in fields and isinstance(fields["model_stats"], pd.DataFrame):
+            fields["model_stats"] = fields["model_stats"].reset_index().to_json(
+                orient="records", force_ascii=False
+            )
+        fields["updated_at"] = _now()
+        columns = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE jobs SET {columns} WHERE job_id = ?",
+                (*fields.values(), job_id),
+            )
+
+    def add_result(self, job_id: str, result: Dict):
+        """Insert a case result; a later result for the same case replaces it."""
+        with self._lock, self._conn:
+            seq = self._conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) + 1 FROM job_results WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_results VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    job_id,
+                    result["model"],
+                    str(result.get("case_id")),
+                    result.get("task", ""),
+                    seq,
+                    json.dumps(result, ensure_ascii=False, default=str),
+                ),
+            )
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            cur = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,))
+            row = cur.fetchone()
+            if row is None:
+                return None
+            job = dict(zip([d[0] for d in cur.description], row))
+            job["done_cases"] = self._conn.execute(
+                "SELECT COUNT(*) FROM job_results WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+        job["models"] = json.loads(job["models"])
+        return job
+
+    def get_model_stats(self, job_id: str) -> pd.DataFrame:
+        job = self.get_job(job_id)
+        if not job or not job.get("model_stats"):
+            return pd.DataFrame()
+        return pd.DataFrame(json.loads(job["model_stats"])).set_index("model")
+
+    def list_jobs(self, active_only: bool = False, limit: int = 20) -> List[Dict]:
+        query = "SELECT job_id, models, status, created_at FROM jobs"
+        params = []
+        if active_only:
+            query += " WHERE status IN (?, ?)"
+            params += list(ACTIVE_STATUSES)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [
+            {"job_id": r[0], "models": json.loads(r[1]), "status": r[2], "created_at": r[3]}
+            for r in rows
+        ]
+
+    def get_results(self, job_id: str, after_seq: int = 0) -> List[Dict]:
+        """Results in completion order, optionally only those after `after_seq`."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT result FROM job_results WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, after_seq),
+            ).fetchall()
+        return [json.loads(r[0]) for r in rows]
@@ -0,0 +1,188 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Sequence, Tuple
+
+# Latency buckets in seconds (local generation can take minutes on CPU)
+LATENCY_BUCKETS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                labels = _format_labels(self.label_names, key)
+                lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = sorted(buckets) + [float("inf")]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            # [bucket counts..., sum, count]
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    le = 'le="' + _format_value(bound) + '"'
+                    labels = _format_labels(self.label_names, key, le)
+                    lines.append(f"{self.name}_bucket{labels} {_format_value(count)}")
+                labels = _format_labels(self.label_names, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(series[-2])}")
+                lines.append(f"{self.name}_count{labels} {_format_value(series[-1])}")
+        return lines
+
+
+class EvalMetrics:
+    """Live counters for a running evaluation, in Prometheus text format.
+
+    CostTracker reports every finished call; Evaluator reports queue depth and
+    in-flight calls; main.py reports model load times.
+    """
+
+    def __init__(self):
+        self.requests = Counter(
+            "llm_eval_requests_total", "Model calls by status", ["model", "status"]
+        )
+        self.input_tokens = Counter(
+            "llm_eval_input_tokens_total", "Prompt tokens consumed", ["model"]
+        )
+        self.output_tokens = Counter(
+            "llm_eval_output_tokens_total", "Completion tokens generated", ["model"]
+        )
+        self.latency = Histogram(
+            "llm_eval_request_latency_seconds", "End-to-end call latency", ["model"]
+        )
+        self.cost = Counter(
+            "llm_eval_cost_usd_total", "Cumulative API spend in USD", ["model"]
+        )
+        self.in_flight = Gauge(
+            "llm_eval_in_flight_requests", "Calls currently being generated", ["model"]
+        )
+        self.queue_depth = Gauge(
+            "llm_eval_queue_depth", "Cases submitted but not yet started", ["task"]
+        )
+        self.load_time = Gauge(
+            "llm_eval_model_load_seconds", "Time spent loading the model", ["model"]
+        )
+        self._metrics = [
+            self.requests,
+            self.input_tokens,
+            self.output_tokens,
+            self.latency,
+            self.cost,
+            self.in_flight,
+            self.queue_depth,
+            self.load_time,
+        ]
+
+    def observe_request(self, model, input_tokens, output_tokens, latency_ms, cost, success):
+        self.requests.inc(model=model, status="success" if success else "error")
+        self.input_tokens.inc(input_tokens, model=model)
+        self.output_tokens.inc(output_tokens, model=model)
+        self.latency.observe(latency_ms / 1000, model=model)
+        self.cost.inc(cost, model=model)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(
+    metrics: EvalMetrics, port: int = 9108, host: str = "127.0.0.1"
+) -> ThreadingHTTPServer:
+    """Serve `metrics` on http://host:port/metrics from a daemon thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Keep scrapes out of the tqdm output
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,219 @@
+"""Dry-run planner: predict tokens, wall time, memory and cost of a sweep.
+
+Nothing is generated. Prompts are tokenized with each model's own tokenizer
+when it is available (tiktoken for OpenAI models, the Hugging Face tokenizer
+for local ones) and with a character-based estimator otherwise. Output
+lengths and latency come from the model's previous runs in the run catalog;
+models without history fall back to per-backend defaults, and the `basis`
+column says which was used.
+"""
+import math
+import re
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from config import EVAL_CONFIG
+from models.registry import lookup_pricing, resolve_backend
+from utils.run_catalog import RunCatalog
+
+# Catalog stats used to predict a model's behaviour
+HISTORY_STATS = [
+    "requests",
+    "total_output_tokens",
+    "avg_latency_ms",
+    "p95_latency_ms",
+    "p50_tokens_per_sec",
+    "peak_gpu_memory_mb",
+]
+
+# Fallbacks for models that have never been run
+DEFAULT_OUTPUT_TOKENS = 512  # Local backend's max_new_tokens
+DEFAULT_TOKENS_PER_SEC = {"openai": 80.0, "hf_local": 20.0, "mock": 1000.0}
+
+# Backends that generate in this process and never bill per token
+IN_PROCESS_BACKENDS = {"hf_local", "mock"}
+
+# Chat framing added around each message (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_PARAMS_PATTERN = re.compile(r"(\d+(?:\.\d+)?)[bB](?![a-zA-Z])")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: ~4 ASCII characters per token, one per other character.
+
+    Hangul syllables usually map to one or more tokens, so this errs on the
+    high side for Korean prompts.
+    """
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return math.ceil(ascii_chars / 4) + (len(text) - ascii_chars)
+
+
+def get_token_counter(
+    backend: str, full_name: str
+) -> Tuple[Callable[[str, str], int], str]:
+    """Return (counter(system, user) -> prompt tokens, method name)."""
+    if backend == "openai":
+        try:
+            import tiktoken
+
+            try:
+                encoding = tiktoken.encoding_for_model(full_name)
+            except KeyError:
+                encoding = tiktoken.get_encoding("o200k_base")
+
+            def count(system: str, user: str) -> int:
+                return (
+                    len(encoding.encode(system))
+                    + len(encoding.encode(user))
+                    + 2 * MESSAGE_OVERHEAD_TOKENS
+                )
+
+            return count, "tiktoken"
+        except ImportError:
+            pass
+    elif backend == "hf_local":
+        try:
+            from transformers import AutoTokenizer
+
+            tokenizer = AutoTokenizer.from_pretrained(full_name)
+
+            def count(system: str, user: str) -> int:
+                messages = [
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": user},
+                ]
+                try:
+                    ids = tokenizer.apply_chat_template(
+                        messages, add_generation_prompt=True
+                    )
+                    return len(ids)
+                except Exception:
+                    return len(tokenizer(f"{system}\n{user}").input_ids)
+
+            return count, "tokenizer"
+        except Exception:
+            pass  # transformers missing or tokenizer not downloadable
+
+    def count(system: str, user: str) -> int:
+        return estimate_tokens(system) + estimate_tokens(user) + 2 * MESSAGE_OVERHEAD_TOKENS
+
+    return count, "estimate"
+
+
+def estimate_weights_mb(full_name: str, bytes_per_param: int = 2) -> Optional[float]:
+    """Weights (fp16 by default) plus ~20% activation/KV headroom, from the size in the name."""
+    match = _PARAMS_PATTERN.search(full_name)
+    if not match:
+        return None
+    params = float(match.group(1)) * 1e9
+    return params * bytes_per_param * 1.2 / (1024 * 1024)
+
+
+def model_history(catalog: Optional[RunCatalog], full_name: str, last_n: int = 10) -> Dict:
+    """Mean of each HISTORY_STATS value over the model's last `last_n` runs."""
+    if catalog is None:
+        return {}
+    past = catalog.history(full_name, HISTORY_STATS, last_n=last_n)
+    if past.empty:
+        return {}
+    summary = {s: past[s].mean() for s in HISTORY_STATS if s in past.columns}
+    summary["runs"] = len(past)
+    return summary
+
+
+def plan_sweep(
+    model_names: Sequence[str],
+    prompts: List[Tuple[str, str]],
+    catalog: Optional[RunCatalog] = None,
+    concurrency: int = 5,
+    n_runs: Optional[int] = None,
+) -> pd.DataFrame:
+    """One row per model with predicted tokens, wall time, memory and cost.
+
+    `prompts` are the (system, user) prompts of every case in the sweep.
+    """
+    n_runs = n_runs or EVAL_CONFIG.get("n_runs", 1)
+
+    rows = []
+    for name in model_names:
+        try:
+            backend, full_name = resolve_backend(name)
+        except ValueError as e:
+            rows.append({"model": name, "notes": str(e)})
+            continue
+
+        count, method = get_token_counter(backend, full_name)
+        input_per_case = [count(system, user) for system, user in prompts]
+        requests = len(prompts) * n_runs
+        input_tokens = sum(input_per_case) * n_runs
+
+        notes = []
+        history = model_history(catalog, full_name)
+        if history.get("requests"):
+            output_per_req = history["total_output_tokens"] / history["requests"]
+            latency_s = history["avg_latency_ms"] / 1000
+            basis = f"history ({history['runs']} runs)"
+        else:
+            output_per_req = DEFAULT_OUTPUT_TOKENS
+            latency_s = output_per_req / DEFAULT_TOKENS_PER_SEC[backend]
+            basis = "default"
+        output_tokens = output_per_req * requests
+
+        # Runs of a case are sequential and cases share `concurrency` workers.
+        # Local generate() calls contend for one device, so they are serial.
+        workers = 1 if backend == "hf_local" else concurrency
+        wall_s = math.ceil(len(prompts) / workers) * n_runs * latency_s
+
+        if backend == "hf_local":
+            peak_mb = history.get("peak_gpu_memory_mb") or estimate_weights_mb(full_name)
+            if peak_mb is None:
+                notes.append("unknown model size")
+        else:
+            peak_mb = 0.0
+
+        pricing = lookup_pricing(name)
+        if backend in IN_PROCESS_BACKENDS:
+            cost = 0.0  # Runs on our own hardware: no API spend
+        elif pricing is None:
+            cost = float("nan")
+            notes.append("missing pricing")
+        else:
+            cost = (
+                input_tokens * pricing["input"] + output_tokens * pricing["output"]
+            ) / 1_000_000
+
+        rows.append(
+            {
+                "model": name,
+                "backend": backend,
+                "requests": requests,
+                "input_tokens": input_tokens,
+                "output_tokens": round(output_tokens),
+                "token_count": method,
+                "wall_time_s": wall_s,
+                "peak_memory_mb": peak_mb,
+                "cost_usd": cost,
+                "cost_per_req": cost / requests if requests else float("nan"),
+                "basis": basis,
+                "notes": ", ".join(notes),
+            }
+        )
+    return pd.DataFrame(rows).set_index("model")
+
+
+def format_plan(plan: pd.DataFrame, concurrency: int) -> str:
+    md = f"## Sweep plan (concurrency={concurrency}, n_runs={EVAL_CONFIG.get('n_runs', 1)})\n\n"
+    md += plan.to_markdown(floatfmt=".4f") + "\n\n"
+    total_wall = plan["wall_time_s"].sum(skipna=True)
+    md += f"- Total requests: {int(plan['requests'].sum(skipna=True))}\n"
+    md += f"- Total tokens: {int(plan['input_tokens'].sum(skipna=True))} in / "
+    md += f"{int(plan['output_tokens'].sum(skipna=True))} out\n"
+    md += f"- Predicted wall time (models run one after another): {total_wall / 60:.1f} min\n"
+    md += f"- Peak memory (largest single model): {plan['peak_memory_mb'].max(skipna=True):.0f} MB\n"
+    md += f"- Predicted cost: ${plan['cost_usd'].sum(skipna=True):.4f}\n"
+    missing = [m for m, n in plan["notes"].items() if "missing pricing" in str(n)]
+    if missing:
+        md += f"- Missing pricing (cost excluded): {', '.join(missing)}\n"
+    return md
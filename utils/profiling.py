@@ -0,0 +1,200 @@
+"""Stage-level profiling spans.
+
+Backends, the evaluator and the report generator wrap their stages in
+`span(stage, model=...)`. Spans cost nothing until a Profiler is enabled
+(`enable_profiling()`, or `main.py --profile`); then every span's duration is
+recorded and aggregated per (model, stage), and the raw spans can be exported
+as a Chrome trace (chrome://tracing, https://ui.perfetto.dev).
+"""
+import contextlib
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Raw spans kept for trace export; aggregates keep counting past this
+MAX_TRACE_EVENTS = 200_000
+
+
+class Profiler:
+    def __init__(self, max_events: int = MAX_TRACE_EVENTS):
+        self.max_events = max_events
+        self._lock = threading.Lock()
+        self._durations: Dict[tuple, List[float]] = defaultdict(list)
+        self._events: List[tuple] = []
+        self._origin = time.perf_counter()
+
+    @contextlib.contextmanager
+    def span(self, stage: str, model: Optional[str] = None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, model=model, start=start)
+
+    def record(
+        self,
+        stage: str,
+        seconds: float,
+        model: Optional[str] = None,
+        start: Optional[float] = None,
+    ):
+        """Add a measured duration (for stages timed outside a `span`)."""
+        key = (model or "-", stage)
+        if start is None:
+            start = time.perf_counter() - seconds
+        with self._lock:
+            self._durations[key].append(seconds)
+            if len(self._events) < self.max_events:
+                self._events.append((key[0], stage, start, seconds, threading.get_ident()))
+
+    def summary(self) -> pd.DataFrame:
+        """Per (model, stage): call count and total/mean/p50/p95 time."""
+        with self._lock:
+            items = [(k, np.asarray(v)) for k, v in self._durations.items()]
+        if not items:
+            return pd.DataFrame()
+        rows = [
+            {
+                "model": model,
+                "stage": stage,
+                "count": len(d),
+                "total_s": d.sum(),
+                "mean_ms": d.mean() * 1000,
+                "p50_ms": np.percentile(d, 50) * 1000,
+                "p95_ms": np.percentile(d, 95) * 1000,
+            }
+            for (model, stage), d in items
+        ]
+        return pd.DataFrame(rows).set_index(["model", "stage"]).sort_index()
+
+    def export_chrome_trace(self, path: str) -> str:
+        """Write recorded spans in Chrome trace event format (one row per thread)."""
+        with self._lock:
+            events = list(self._events)
+        trace = [
+            {
+                "name": stage,
+                "cat": model,
+                "ph": "X",
+                "ts": (start - self._origin) * 1e6,
+                "dur": seconds * 1e6,
+                "pid": os.getpid(),
+                "tid": tid,
+                "args": {"model": model},
+            }
+            for model, stage, start, seconds, tid in events
+        ]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+        return path
+
+
+_ACTIVE: Optional[Profiler] = None
+_NULL = contextlib.nullcontext()
+
+
+def enable_profiling(profiler: Optional[Profiler] = None) -> Profiler:
+    global _ACTIVE
+    _ACTIVE = profiler or Profiler()
+    return _ACTIVE
+
+
+def disable_profiling():
+    global _ACTIVE
+    _ACTIVE = None
+
+
+def get_profiler() -> Optional[Profiler]:
+    return _ACTIVE
+
+
+def is_enabled() -> bool:
+    return _ACTIVE is not None
+
+
+def span(stage: str, model: Optional[str] = None):
+    """Time a stage if profiling is enabled; otherwise a shared no-op context."""
+    if _ACTIVE is None:
+        return _NULL
+    return _ACTIVE.span(stage, model)
+
+
+@contextlib.contextmanager
+def trace_run(kind: Optional[str], path_prefix: str):
+    """Capture a whole-run trace: "cprofile" (.prof + folded stacks) or "torch" (Chrome trace).
+
+    Yields a dict that is filled with the written paths on exit.
+    """
+    written: Dict[str, str] = {}
+    if kind is None:
+        yield written
+        return
+    if kind == "cprofile":
+        # cProfile only sees the thread that enabled it, so every thread
+        # started during the run (evaluator workers) gets its own profile
+        profiles = [cProfile.Profile()]
+        lock = threading.Lock()
+
+        def profile_new_thread(frame, event, arg):
+            prof = cProfile.Profile()
+            with lock:
+                profiles.append(prof)
+            prof.enable()
+
+        threading.setprofile(profile_new_thread)
+        profiles[0].enable()
+        try:
+            yield written
+        finally:
+            profiles[0].disable()
+            threading.setprofile(None)
+            with lock:
+                stats = pstats.Stats(*profiles)
+            written["cprofile"] = f"{path_prefix}.prof"
+            stats.dump_stats(written["cprofile"])
+            written["folded"] = write_folded_stacks(stats, f"{path_prefix}.folded")
+        return
+    if kind == "torch":
+        import torch
+
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        with torch.profiler.profile(activities=activities, record_shapes=False) as prof:
+            yield written
+        written["torch_trace"] = f"{path_prefix}.torch.json"
+        prof.export_chrome_trace(written["torch_trace"])
+        return
+    raise ValueError(f"Unknown trace kind: {kind}")
+
+
+def write_folded_stacks(stats: "pstats.Stats", path: str) -> str:
+    """Caller→callee edges of a cProfile run in folded-stack format.
+
+    cProfile keeps only one level of callers, so each line is a two-frame
+    stack weighted by the callee's time under that caller (microseconds).
+    Feed it to flamegraph.pl or speedscope for a flame graph.
+    """
+    stats = stats.stats
+
+    def label(func) -> str:
+        filename, line, name = func
+        return f"{name} ({os.path.basename(filename)}:{line})".replace(";", ",")
+
+    with open(path, "w", encoding="utf-8") as f:
+        for func, (_, _, _, _, callers) in stats.items():
+            if not callers:
+                continue
+            for caller, (_, _, tottime, _) in callers.items():
+                weight = int(tottime * 1e6)
+                if weight > 0:
+                    f.write(f"{label(caller)};{label(func)} {weight}\n")
+    return path
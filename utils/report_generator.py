@@ -1,34 +1,132 @@
 import json
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import os
-from datetime import datetime
-from typing import List, Dict
-from config import MODEL_PRICING
+from typing import List, Dict, Iterable, Optional
+from config import EVAL_CONFIG
+from evaluation.rescoring import metric_versions
+from utils.cost_tracker import summarize_cost_frame
+from utils.run_catalog import REQUEST_SUCCESS_RATE, RunCatalog, new_run_id
+from utils.bootstrap import bootstrap_metrics
+from utils.profiling import get_profiler, span
+from models.registry import lookup_pricing
+
+# Metrics given confidence intervals and pairwise win probabilities
+CI_METRICS = [
+    "json_validity",
+    "field_completeness",
+    "cot_depth_score",
+    "persona_specificity",
+    "safety_consistency",
+    "consistency",
+    "semantic_consistency",
+]
+
+# Per-result fields stored next to the flattened metric columns
+RESULT_SCHEMA = [
+    ("task", pa.string()),
+    ("case_id", pa.string()),
+    ("model", pa.string()),
+    ("success", pa.bool_()),
+    ("error", pa.string()),
+    ("run_count", pa.int64()),
+    ("response", pa.string()),
+    ("run_responses", pa.list_(pa.string())),
+]
 
 
 class ReportGenerator:
-    def __init__(self, results_dir: str):
+    def __init__(self, results_dir: str, chunk_rows: int = 50_000):
         self.results_dir = results_dir
+        self.chunk_rows = chunk_rows
+
+    def write_jsonl(self, run_results: Iterable[Dict], path: str) -> str:
+        """Stream results to JSON Lines, one result per line."""
+        with open(path, "w", encoding="utf-8") as f:
+            for r in run_results:
+                f.write(json.dumps(r, ensure_ascii=False))
+                f.write("\n")
+        return path
+
+    def write_parquet(self, run_results: List[Dict], path: str) -> str:
+        """Write results as Parquet with one float column per metric."""
+        metric_names = sorted(
+            {k for r in run_results for k in r.get("metrics", {})}
+        )
+        schema = pa.schema(
+            RESULT_SCHEMA + [(name, pa.float64()) for name in metric_names]
+        )
+        with pq.ParquetWriter(path, schema) as writer:
+            for start in range(0, max(len(run_results), 1), self.chunk_rows):
+                chunk = run_results[start : start + self.chunk_rows]
+                columns = {
+                    name: [r.get(name) for r in chunk] for name, _ in RESULT_SCHEMA
+                }
+                columns["case_id"] = [
+                    None if c is None else str(c) for c in columns["case_id"]
+                ]
+                for name in metric_names:
+                    columns[name] = [r.get("metrics", {}).get(name) for r in chunk]
+                writer.write_table(pa.table(columns, schema=schema))
+        return path
+
+    def aggregate_results(self, parquet_path: str) -> pd.DataFrame:
+        """Per-model means of every metric, in one grouped pass over Parquet.
 
-    def generate_report(self, run_results: List[Dict], cost_df: pd.DataFrame):
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        Only the model, success and metric columns are read; response texts
+        stay on disk.
+        """
+        schema = pq.read_schema(parquet_path)
+        base = {name for name, _ in RESULT_SCHEMA}
+        metric_cols = [n for n in schema.names if n not in base]
+        table = pq.read_table(parquet_path, columns=["model", "success"] + metric_cols)
+        if table.num_rows == 0:
+            return pd.DataFrame()
 
-        # 1. Save Raw JSON
-        raw_path = os.path.join(self.results_dir, f"raw_results_{timestamp}.json")
-        with open(raw_path, "w", encoding="utf-8") as f:
-            json.dump(run_results, f, ensure_ascii=False, indent=2)
+        grouped = table.group_by("model").aggregate(
+            [("model", "count"), ("success", "mean")]
+            + [(c, "mean") for c in metric_cols]
+        )
+        per_model = grouped.to_pandas().set_index("model")
+        per_model = per_model.rename(
+            columns=lambda c: c[: -len("_mean")] if c.endswith("_mean") else c
+        ).rename(columns={"model_count": "n_results", "success": "success_rate"})
+        return per_model.sort_index()
 
-        # 2. Process Data for Analysis
-        flattened_data = []
-        for r in run_results:
-            row = r.get("metrics", {}).copy()
-            row["model"] = r["model"]
-            row["task"] = r["task"]
-            row["success"] = r["success"]
-            # Flatten some nested metrics if needed, but current metrics are flat
-            flattened_data.append(row)
+    def generate_report(
+        self,
+        run_results: List[Dict],
+        cost_df: pd.DataFrame = None,
+        model_stats: pd.DataFrame = None,
+        catalog: RunCatalog = None,
+        run_id: Optional[str] = None,
+    ):
+        """Write raw results and the markdown report.
 
-        results_df = pd.DataFrame(flattened_data)
+        `model_stats` is `CostTracker.get_model_stats()` (or
+        `spool_model_stats()`); when omitted it is computed from `cost_df`.
+        With a `catalog`, the run is indexed there and compared against
+        previous runs for regressions. Passing an existing `run_id`
+        rewrites that run's files and catalog entry (used by `rescore.py`).
+        """
+        timestamp = run_id or new_run_id()
+
+        # 1. Save Raw Results (JSONL for streaming readers, Parquet for analysis)
+        with span("report_write_jsonl"):
+            raw_path = self.write_jsonl(
+                run_results,
+                os.path.join(self.results_dir, f"raw_results_{timestamp}.jsonl"),
+            )
+        with span("report_write_parquet"):
+            parquet_path = self.write_parquet(
+                run_results,
+                os.path.join(self.results_dir, f"results_{timestamp}.parquet"),
+            )
+
+        # 2. Aggregate every per-model statistic in a single pass
+        with span("report_aggregate"):
+            per_model = self.aggregate_results(parquet_path)
 
         # 3. Generate Markdown Report (User Requested Format)
         md = f"# LLM 모델 평가 리포트 📊\n\n**생성 일시**: {timestamp}\n\n"
@@ -51,10 +149,10 @@ class ReportGenerator:
             "schema_compliance",
             "value_accuracy",
         ]
-        struct_cols = [c for c in struct_cols if c in results_df.columns]
+        struct_cols = [c for c in struct_cols if c in per_model.columns]
 
         if struct_cols:
-            struct_perf = results_df.groupby("model")[struct_cols].mean()
+            struct_perf = per_model[struct_cols].copy()
             if "json_validity" in struct_perf.columns:
                 struct_perf["parsing_error_rate"] = 1.0 - struct_perf["json_validity"]
             md += struct_perf.to_markdown(floatfmt=".4f") + "\n\n"
@@ -67,46 +165,60 @@ class ReportGenerator:
         md += "- **Safety Consistency (안전성/일관성)**: 입력된 알러지 정보를 누락하거나 모순된 식습관(알러지 재료 선호 등)을 생성하지 않았는지 (1.0 = 안전). (매우 중요)\n\n"
 
         quality_cols = ["cot_depth_score", "persona_specificity", "safety_consistency"]
-        quality_cols = [c for c in quality_cols if c in results_df.columns]
+        quality_cols = [c for c in quality_cols if c in per_model.columns]
 
         if quality_cols:
-            quality_perf = results_df.groupby("model")[quality_cols].mean()
+            quality_perf = per_model[quality_cols]
             md += quality_perf.to_markdown(floatfmt=".4f") + "\n\n"
 
         # 2.3 일관성
         md += "#### 3. 생성 일관성 (Consistency)\n"
-        md += "- **Consistency**: 같은 입력에 대해 여러 번 실행했을 때 주요 속성(이름, 알러지 등)이 유지되는지 (1.0 = 완벽히 동일)\n"
-        if "consistency" in results_df.columns:
-            consistency_perf = results_df.groupby("model")[["consistency"]].mean()
+        md += "- **Consistency**: 같은 입력에 대해 여러 번 실행했을 때 주요 속성(이름, 알러지 등)이 유지되는지 (1.0 = 완벽히 동일, 리스트는 순서 무관)\n"
+        md += "- **Semantic Consistency**: 실행 간 설명(description)과 추론(reasoning)의 문자 n-gram TF-IDF 코사인 유사도 평균 (1.0 = 동일)\n"
+        consistency_cols = [
+            c for c in ["consistency", "semantic_consistency"] if c in per_model.columns
+        ]
+        if consistency_cols:
+            consistency_perf = per_model[consistency_cols]
             md += consistency_perf.to_markdown(floatfmt=".4f") + "\n\n"
 
+        # 2.4 통계적 신뢰도
+        with span("report_bootstrap"):
+            md += self._bootstrap_section(parquet_path)
+
         # --- 3. 실용적 제약사항 ---
         md += "### 3. 실용적 제약사항\n"
 
-        if not cost_df.empty:
+        if model_stats is None:
+            model_stats = summarize_cost_frame(
+                cost_df if cost_df is not None else pd.DataFrame()
+            )
+
+        if not model_stats.empty:
             # 3.1 응답 속도
             md += "#### 1. 응답 속도(Latency)\n"
-            latency_stats = (
-                cost_df.groupby("model")["latency_ms"]
-                .agg(["mean"])
-                .rename(columns={"mean": "avg_latency_ms"})
-            )
+            latency_cols = [
+                "avg_latency_ms",
+                "p50_latency_ms",
+                "p95_latency_ms",
+                "p99_latency_ms",
+                "p50_tokens_per_sec",
+            ]
+            latency_stats = model_stats[latency_cols]
             md += latency_stats.to_markdown(floatfmt=".2f") + "\n\n"
 
             # 3.2 Cost
             md += "#### 2. Cost\n"
 
             # Prepare Cost Table
+            monthly_requests = EVAL_CONFIG.get("monthly_requests", 10000)
             cost_data = []
-            models = cost_df["model"].unique()
-
-            for m in models:
-                m_df = cost_df[cost_df["model"] == m]
-                avg_cost_req = m_df["cost_usd"].mean()
-                monthly = avg_cost_req * 10000
+            for m, stats in model_stats.iterrows():
+                avg_cost_req = stats["avg_cost_per_req"]
+                monthly = avg_cost_req * monthly_requests
 
-                total_input = m_df["input_tokens"].sum()
-                total_output = m_df["output_tokens"].sum()
+                total_input = stats["total_input_tokens"]
+                total_output = stats["total_output_tokens"]
 
                 if total_output > 0:
                     ratio_val = total_input / total_output
@@ -115,7 +227,7 @@ class ReportGenerator:
                     io_ratio = "N/A"
 
                 # Pricing Info
-                pricing = MODEL_PRICING.get(m, "N/A")
+                pricing = lookup_pricing(m) or "N/A"
                 if isinstance(pricing, dict):
                     pricing_str = (
                         f"In:${pricing.get('input')}/Out:${pricing.get('output')}"
@@ -127,7 +239,7 @@ class ReportGenerator:
                     {
                         "model": m,
                         "avg_cost_per_req": avg_cost_req,
-                        "monthly_projection(10k)": monthly,
+                        f"monthly_projection({monthly_requests})": monthly,
                         "token_price_1M": pricing_str,
                         "io_token_ratio_input_output": io_ratio,
                     }
@@ -140,7 +252,165 @@ class ReportGenerator:
             md += "비용 데이터 없음.\n\n"
 
         report_path = os.path.join(self.results_dir, f"report_{timestamp}.md")
+        paths = {"raw": raw_path, "parquet": parquet_path, "report": report_path}
+
+        if catalog is not None:
+            with span("report_catalog"):
+                run_stats = per_model.join(
+                    model_stats.rename(columns={"success_rate": REQUEST_SUCCESS_RATE}),
+                    how="outer",
+                )
+                regressions = catalog.detect_regressions(timestamp, run_stats)
+                md += self._regression_section(regressions)
+                catalog.record_run(
+                    timestamp,
+                    run_stats,
+                    paths,
+                    extra={"metric_versions": metric_versions()},
+                )
+
+        profiler = get_profiler()
+        if profiler is not None:
+            md += self._profile_section(profiler)
+
         with open(report_path, "w", encoding="utf-8") as f:
             f.write(md)
 
-        print(f"Reports generated: \n - {raw_path}\n - {report_path}")
+        print(
+            f"Reports generated: \n - {raw_path}\n - {parquet_path}\n - {report_path}"
+        )
+        return paths
+
+    def _bootstrap_section(self, parquet_path: str) -> str:
+        schema = pq.read_schema(parquet_path)
+        metric_cols = [c for c in CI_METRICS if c in schema.names]
+        if not metric_cols:
+            return ""
+        # Cases are paired on (task, case_id); older runs have no task column
+        key_cols = [c for c in ("task", "case_id") if c in schema.names]
+        case_df = pq.read_table(
+            parquet_path, columns=["model"] + key_cols + metric_cols
+        ).to_pandas()
+        ci, win_prob = bootstrap_metrics(
+            case_df,
+            metric_cols,
+            n_resamples=EVAL_CONFIG.get("bootstrap_resamples", 10000),
+            seed=EVAL_CONFIG.get("bootstrap_seed", 0),
+        )
+        if ci.empty:
+            return ""
+
+        md = "#### 4. 통계적 신뢰도 (Bootstrap 95% CI)\n"
+        md += "- 테스트 케이스를 복원추출하여 구한 평균의 95% 신뢰구간 `mean [low, high]`\n"
+        md += "- **Win Probability**: 행 모델의 평균이 열 모델보다 높을 확률 (0.5 = 구분 불가)\n\n"
+        ci_text = ci.apply(
+            lambda r: f"{r['mean']:.3f} [{r['ci_low']:.3f}, {r['ci_high']:.3f}]", axis=1
+        ).unstack("metric")
+        md += ci_text[[c for c in metric_cols if c in ci_text.columns]].to_markdown()
+        md += "\n\n"
+
+        if win_prob.shape[1] > 1:
+            for metric in metric_cols:
+                md += f"**Win Probability - {metric}**\n\n"
+                md += win_prob.loc[metric].to_markdown(floatfmt=".3f") + "\n\n"
+        return md
+
+    def _profile_section(self, profiler) -> str:
+        summary = profiler.summary()
+        if summary.empty:
+            return ""
+        md = "### 5. 단계별 프로파일 (Stage Profile)\n"
+        md += "- `--profile` 실행 시 단계별 소요 시간. `generate`는 그 안의 템플릿/토큰화/prefill/decode 등을 포함\n"
+        md += "- 모델이 `-`인 행은 모델 공통 단계 (리포트 생성, 배치 일관성 계산)\n\n"
+        return md + summary.reset_index().to_markdown(index=False, floatfmt=".2f") + "\n\n"
+
+    def _regression_section(self, regressions: List[Dict]) -> str:
+        md = "### 4. 회귀 감지 (Regression Check)\n"
+        md += "- 이전 실행들의 평균 대비 품질 지표가 0.05 이상 하락하거나, 지연시간/비용이 20% 이상 증가한 항목\n\n"
+        if not regressions:
+            return md + "회귀 없음 (또는 비교할 이전 실행이 부족함).\n\n"
+        reg_df = pd.DataFrame(regressions).set_index(["model", "stat"])
+        return md + "⚠️ " + f"{len(regressions)}개 항목에서 회귀 감지\n\n" + (
+            reg_df.to_markdown(floatfmt=".4f") + "\n\n"
+        )
+
+    def generate_loadtest_report(
+        self,
+        model_name: str,
+        results: pd.DataFrame,
+        knees: pd.DataFrame,
+        fast_decode: Optional[Dict] = None,
+    ) -> Dict[str, str]:
+        """Write a load-test sweep as Parquet, a throughput chart and a markdown report.
+
+        `fast_decode` is the model's fast decode warmup stats, if it was enabled.
+        """
+        timestamp = new_run_id()
+        data_path = os.path.join(self.results_dir, f"loadtest_{timestamp}.parquet")
+        results.to_parquet(data_path, index=False)
+        chart_path = self._loadtest_chart(
+            model_name, results, os.path.join(self.results_dir, f"loadtest_{timestamp}.png")
+        )
+
+        md = "# 부하 테스트 리포트 (Load Test) 🚦\n\n"
+        md += f"**모델**: {model_name}\n\n**생성 일시**: {timestamp}\n\n"
+        if fast_decode:
+            md += (
+                f"**Fast decode**: 정적 KV 캐시 {fast_decode['cache_len']} 토큰, "
+                f"프롬프트 버킷 {fast_decode['prompt_buckets']}개, "
+                f"컴파일 워밍업 {fast_decode['warmup_s']:.1f}s "
+                "(1회성 비용, 아래 처리량은 워밍업 이후 정상 상태 값)\n\n"
+            )
+        md += "### 1. 포화 지점 (Saturation Knee)\n"
+        md += "- 동시성을 두 배로 늘려도 처리량(req/s)이 10% 이상 늘지 않기 직전의 지점. 이 이상은 지연시간만 증가\n\n"
+        if not knees.empty:
+            md += knees.to_markdown(index=False, floatfmt=".2f") + "\n\n"
+            best = knees.loc[knees["requests_per_sec"].idxmax()]
+            md += (
+                f"**권장 설정**: batch_size={int(best['batch_size'])}, "
+                f"concurrency={int(best['knee_concurrency'])} → "
+                f"{best['requests_per_sec']:.2f} req/s, "
+                f"p99 {best['p99_latency_ms']:.0f} ms\n\n"
+            )
+
+        md += "### 2. 전체 측정값\n"
+        md += "- max_new_tokens = -1 은 백엔드 기본값\n\n"
+        md += results.to_markdown(index=False, floatfmt=".2f") + "\n\n"
+        if chart_path:
+            md += f"![throughput vs concurrency]({os.path.basename(chart_path)})\n"
+        else:
+            md += "(matplotlib이 설치되지 않아 차트를 생략함)\n"
+
+        report_path = os.path.join(self.results_dir, f"loadtest_{timestamp}.md")
+        with open(report_path, "w", encoding="utf-8") as f:
+            f.write(md)
+        print(f"Load test report generated: \n - {data_path}\n - {report_path}")
+        return {"data": data_path, "chart": chart_path, "report": report_path}
+
+    @staticmethod
+    def _loadtest_chart(model_name: str, results: pd.DataFrame, path: str):
+        try:
+            import matplotlib
+
+            matplotlib.use("Agg")
+            import matplotlib.pyplot as plt
+        except ImportError:
+            return None
+
+        fig, (ax_rps, ax_p99) = plt.subplots(1, 2, figsize=(12, 4.5))
+        for (batch, tokens), series in results.groupby(["batch_size", "max_new_tokens"]):
+            series = series.sort_values("concurrency")
+            label = f"batch={batch}" + (f", max_new_tokens={tokens}" if tokens >= 0 else "")
+            ax_rps.plot(series["concurrency"], series["requests_per_sec"], marker="o", label=label)
+            ax_p99.plot(series["concurrency"], series["p99_latency_ms"], marker="o", label=label)
+        for ax, ylabel in ((ax_rps, "requests / sec"), (ax_p99, "p99 latency (ms)")):
+            ax.set_xscale("log", base=2)
+            ax.set_xlabel("concurrency")
+            ax.set_ylabel(ylabel)
+            ax.grid(True, alpha=0.3)
+        ax_rps.legend(fontsize=8)
+        fig.suptitle(model_name)
+        fig.tight_layout()
+        fig.savefig(path, dpi=120)
+        plt.close(fig)
+        return path
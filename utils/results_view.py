@@ -0,0 +1,106 @@
+"""Data layer for the dashboard's results views.
+
+Everything here is a pure function of the run's results, so the dashboard can
+cache it by run id: outputs are parsed once, aggregates are computed once, and
+the persona view only ever renders one page.
+"""
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from evaluation.parsing import extract_json
+
+# Columns of the per-result frame that are not metrics
+BASE_COLUMNS = ["model", "task", "case_id", "success", "error", "response", "persona_name"]
+
+
+def _persona_name(response: str) -> str:
+    data = extract_json(response or "")
+    if data is None:
+        return "Parse Error"
+    return str(data.get("name", "Unknown"))
+
+
+def build_results_frame(results: List[Dict]) -> pd.DataFrame:
+    """One row per case result with metrics flattened and the persona name parsed."""
+    rows = []
+    for r in results:
+        row = dict(r.get("metrics") or {})
+        row["model"] = r.get("model")
+        row["task"] = r.get("task")
+        row["case_id"] = r.get("case_id")
+        row["success"] = r.get("success")
+        row["error"] = r.get("error")
+        row["response"] = r.get("response", "")
+        rows.append(row)
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return df
+    df["persona_name"] = df["response"].map(_persona_name)
+    return df
+
+
+def load_run_frame(parquet_path: Optional[str] = None, raw_path: Optional[str] = None) -> pd.DataFrame:
+    """Load a stored run (Parquet preferred, JSONL/JSON as fallback)."""
+    if parquet_path and os.path.exists(parquet_path):
+        columns = [c for c in pq.read_schema(parquet_path).names if c != "run_responses"]
+        df = pq.read_table(parquet_path, columns=columns).to_pandas()
+        if not df.empty:
+            df["persona_name"] = df["response"].map(_persona_name)
+        return df
+    if raw_path and os.path.exists(raw_path):
+        with open(raw_path, "r", encoding="utf-8") as f:
+            if raw_path.endswith(".jsonl"):
+                results = [json.loads(line) for line in f if line.strip()]
+            else:
+                results = json.load(f)
+        return build_results_frame(results)
+    return pd.DataFrame()
+
+
+def metric_columns(df: pd.DataFrame) -> List[str]:
+    return [
+        c
+        for c in df.columns
+        if c not in BASE_COLUMNS and pd.api.types.is_numeric_dtype(df[c])
+        and c != "run_count"
+    ]
+
+
+def per_model_aggregates(df: pd.DataFrame) -> pd.DataFrame:
+    cols = metric_columns(df)
+    if df.empty or not cols:
+        return pd.DataFrame()
+    return df.groupby("model")[cols].mean()
+
+
+def search_personas(df: pd.DataFrame, model: Optional[str] = None, query: str = "") -> pd.DataFrame:
+    """Rows for `model` whose persona name, case id or output contains `query`."""
+    view = df if model is None else df[df["model"] == model]
+    if query:
+        q = query.lower()
+        mask = (
+            view["persona_name"].str.lower().str.contains(q, regex=False, na=False)
+            | view["case_id"].astype(str).str.lower().str.contains(q, regex=False, na=False)
+            | view["response"].str.lower().str.contains(q, regex=False, na=False)
+        )
+        view = view[mask]
+    return view
+
+
+def paginate(df: pd.DataFrame, page: int, page_size: int) -> pd.DataFrame:
+    start = max(page - 1, 0) * page_size
+    return df.iloc[start : start + page_size]
+
+
+def downsample(df: pd.DataFrame, max_points: int = 2000, seed: int = 0) -> pd.DataFrame:
+    """Uniform random sample for charts; small frames are returned unchanged."""
+    if len(df) <= max_points:
+        return df
+    rng = np.random.default_rng(seed)
+    idx = np.sort(rng.choice(len(df), size=max_points, replace=False))
+    return df.iloc[idx]
@@ -0,0 +1,261 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from config import EVAL_CONFIG, MODEL_PRICING, SYSTEM_PROMPTS
+
+# Request-level success rate of a run, stored next to the result-level `success_rate`
+REQUEST_SUCCESS_RATE = "request_success_rate"
+
+
+def new_run_id() -> str:
+    """Timestamped run id; the random suffix keeps runs started in the same second apart."""
+    return datetime.now().strftime("%Y%m%d_%H%M%S_") + uuid.uuid4().hex[:6]
+
+
+# Stats where a higher value is a regression; everything else is higher-is-better
+LOWER_IS_BETTER = {
+    "avg_latency_ms",
+    "p50_latency_ms",
+    "p95_latency_ms",
+    "p99_latency_ms",
+    "avg_cost_per_req",
+    "total_cost_usd",
+    "peak_gpu_memory_mb",
+}
+
+# Stats compared across runs by `detect_regressions`
+TRACKED_STATS = [
+    "json_validity",
+    "field_completeness",
+    "schema_compliance",
+    "cot_depth_score",
+    "persona_specificity",
+    "safety_consistency",
+    "consistency",
+    "semantic_consistency",
+    "p50_latency_ms",
+    "p95_latency_ms",
+    "avg_cost_per_req",
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    models TEXT NOT NULL,
+    config_hash TEXT,
+    prompt_hash TEXT,
+    raw_path TEXT,
+    parquet_path TEXT,
+    report_path TEXT,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS model_stats (
+    run_id TEXT NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    model TEXT NOT NULL,
+    stat TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (run_id, model, stat)
+);
+CREATE INDEX IF NOT EXISTS idx_model_stats_lookup ON model_stats (model, stat, run_id);
+CREATE INDEX IF NOT EXISTS idx_runs_created ON runs (created_at);
+"""
+
+
+def _hash(obj) -> str:
+    payload = json.dumps(obj, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def config_hash() -> str:
+    return _hash({"eval": EVAL_CONFIG, "pricing": MODEL_PRICING})
+
+
+def prompt_hash() -> str:
+    return _hash(SYSTEM_PROMPTS)
+
+
+class RunCatalog:
+    """SQLite index of every evaluation run and its per-model aggregates.
+
+    Each run row points at the raw files in `results/`; per-model statistics
+    are stored in long form so "stat X of model Y over the last N runs" is a
+    single indexed query.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def record_run(
+        self,
+        run_id: str,
+        per_model: pd.DataFrame,
+        paths: Optional[Dict[str, str]] = None,
+        extra: Optional[Dict] = None,
+    ):
+        """Insert (or replace) a run; `per_model` is indexed by model."""
+        paths = paths or {}
+        rows = [
+            (run_id, str(model), str(stat), float(value))
+            for model, stats in per_model.iterrows()
+            for stat, value in stats.items()
+            if pd.notna(value) and isinstance(value, (int, float))
+        ]
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM model_stats WHERE run_id = ?", (run_id,))
+            # Re-recording a run (rescore) keeps its place in the history
+            row = self._conn.execute(
+                "SELECT created_at FROM runs WHERE run_id = ?", (run_id,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    run_id,
+                    row[0] if row else datetime.now().isoformat(timespec="seconds"),
+                    json.dumps([str(m) for m in per_model.index]),
+                    config_hash(),
+                    prompt_hash(),
+                    paths.get("raw"),
+                    paths.get("parquet"),
+                    paths.get("report"),
+                    json.dumps(extra or {}, default=str),
+                ),
+            )
+            self._conn.executemany(
+                "INSERT INTO model_stats VALUES (?, ?, ?, ?)", rows
+            )
+
+    def runs(self, limit: Optional[int] = None) -> pd.DataFrame:
+        """Runs, newest first."""
+        query = "SELECT * FROM runs ORDER BY created_at DESC, run_id DESC"
+        params = ()
+        if limit:
+            query += " LIMIT ?"
+            params = (limit,)
+        with self._lock:
+            df = pd.read_sql_query(query, self._conn, params=params)
+        if not df.empty:
+            df["models"] = df["models"].map(json.loads)
+        return df
+
+    def get_run(self, run_id: str) -> Optional[Dict]:
+        """A run's row, with `models` and `extra` decoded."""
+        with self._lock:
+            cur = self._conn.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,))
+            row = cur.fetchone()
+            if row is None:
+                return None
+            run = dict(zip([d[0] for d in cur.description], row))
+        run["models"] = json.loads(run["models"])
+        run["extra"] = json.loads(run["extra"] or "{}")
+        return run
+
+    def latest_run(self) -> Optional[Dict]:
+        runs = self.runs(limit=1)
+        return None if runs.empty else runs.iloc[0].to_dict()
+
+    def model_stats(self, run_id: str) -> pd.DataFrame:
+        """All stats recorded for a run, one row per model."""
+        with self._lock:
+            df = pd.read_sql_query(
+                "SELECT model, stat, value FROM model_stats WHERE run_id = ?",
+                self._conn,
+                params=(run_id,),
+            )
+        if df.empty:
+            return pd.DataFrame()
+        return df.pivot(index="model", columns="stat", values="value")
+
+    def history(
+        self,
+        model: str,
+        stats: List[str],
+        last_n: int = 50,
+        before_run: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """Values of `stats` for `model` over its last `last_n` runs (oldest first)."""
+        placeholders = ",".join("?" for _ in stats)
+        query = f"""
+            SELECT r.run_id, r.created_at, s.stat, s.value
+            FROM (
+                SELECT run_id, created_at FROM runs
+                WHERE run_id IN (SELECT run_id FROM model_stats WHERE model = ?)
+                {"AND run_id < ?" if before_run else ""}
+                ORDER BY created_at DESC, run_id DESC LIMIT ?
+            ) r
+            JOIN model_stats s ON s.run_id = r.run_id
+            WHERE s.model = ? AND s.stat IN ({placeholders})
+        """
+        params = [model] + ([before_run] if before_run else []) + [last_n, model]
+        params += list(stats)
+        with self._lock:
+            df = pd.read_sql_query(query, self._conn, params=params)
+        if df.empty:
+            return pd.DataFrame(columns=["run_id", "created_at"] + list(stats))
+        wide = df.pivot_table(
+            index=["run_id", "created_at"], columns="stat", values="value"
+        ).reset_index()
+        wide.columns.name = None
+        return wide.sort_values(["created_at", "run_id"]).reset_index(drop=True)
+
+    def detect_regressions(
+        self,
+        run_id: str,
+        per_model: pd.DataFrame,
+        window: int = 10,
+        min_history: int = 3,
+        abs_tolerance: float = 0.05,
+        rel_tolerance: float = 0.2,
+    ) -> List[Dict]:
+        """Compare a run's stats with the mean of each model's previous runs.
+
+        Quality scores (0..1) regress when they drop by more than
+        `abs_tolerance`; latency/cost regress when they grow by more than
+        `rel_tolerance` (relative).
+        """
+        regressions = []
+        stats = [s for s in TRACKED_STATS if s in per_model.columns]
+        if not stats:
+            return regressions
+        for model, current in per_model.iterrows():
+            past = self.history(str(model), stats, last_n=window, before_run=run_id)
+            if len(past) < min_history:
+                continue
+            for stat in stats:
+                value = current.get(stat)
+                if stat not in past.columns or pd.isna(value):
+                    continue
+                baseline = past[stat].mean()
+                if pd.isna(baseline):
+                    continue
+                if stat in LOWER_IS_BETTER:
+                    regressed = value > baseline * (1 + rel_tolerance)
+                else:
+                    regressed = value < baseline - abs_tolerance
+                if regressed:
+                    regressions.append(
+                        {
+                            "model": str(model),
+                            "stat": stat,
+                            "value": float(value),
+                            "baseline": float(baseline),
+                            "runs_compared": len(past),
+                        }
+                    )
+        return regressions
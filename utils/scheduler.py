@@ -0,0 +1,234 @@
+"""Memory-budgeted co-scheduling of local models.
+
+Each local model's resident footprint is estimated from its config.json
+(parameter count, load dtype, KV cache for the evaluator's concurrent
+sequences) without loading any weights. Models are packed first-fit
+decreasing into groups that fit the memory budget; the models of a group are
+loaded together and evaluated concurrently, with the CPU threads split
+between them in proportion to their size. Models that don't fit, whose size
+is unknown, or that aren't loaded in this process run alone, as before.
+"""
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from models.registry import resolve_backend
+from utils.planner import estimate_weights_mb
+
+# Share of the free memory the packer may fill; the rest absorbs estimate error
+BUDGET_FRACTION = 0.8
+
+# Per-model runtime overhead beyond weights and KV cache (allocator, activations)
+RUNTIME_OVERHEAD_MB = 300.0
+
+# Context held in the KV cache per in-flight sequence (prompt + max_new_tokens)
+KV_TOKENS_PER_SEQUENCE = 2048
+
+_MB = 1024 * 1024
+
+
+def default_device() -> str:
+    """Device a local model would load on (mirrors LocalHuggingFaceModel)."""
+    try:
+        import torch
+    except ImportError:
+        return "cpu"
+    if torch.cuda.is_available():
+        return "cuda"
+    if torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
+
+def bytes_per_param(device: str) -> int:
+    # LocalHuggingFaceModel loads float16 on accelerators, float32 on CPU
+    return 2 if device in ("cuda", "mps") else 4
+
+
+def _first(config: Dict, *keys, default=None):
+    for key in keys:
+        if config.get(key):
+            return config[key]
+    return default
+
+
+def count_parameters(config: Dict) -> Tuple[int, int]:
+    """(parameter count, KV cache bytes per token per byte of dtype) from a config dict.
+
+    Assumes a decoder-only transformer with grouped-query attention and a
+    gated MLP (Qwen2, EXAONE, Gemma 2, Llama-style models).
+    """
+    config = config.get("text_config", config)
+    hidden = config["hidden_size"]
+    layers = _first(config, "num_hidden_layers", "num_layers", "n_layer")
+    heads = _first(config, "num_attention_heads", "n_head")
+    kv_heads = _first(config, "num_key_value_heads", default=heads)
+    head_dim = _first(config, "head_dim", default=hidden // heads)
+    intermediate = _first(config, "intermediate_size", default=4 * hidden)
+    vocab = config["vocab_size"]
+
+    attention = 2 * hidden * heads * head_dim + 2 * hidden * kv_heads * head_dim
+    mlp = 3 * hidden * intermediate
+    embeddings = vocab * hidden * (1 if config.get("tie_word_embeddings") else 2)
+    params = layers * (attention + mlp) + embeddings
+    kv_per_token = 2 * layers * kv_heads * head_dim
+    return params, kv_per_token
+
+
+def estimate_footprint_mb(
+    full_name: str, device: str, concurrency: int = 1
+) -> Tuple[Optional[float], str]:
+    """Resident memory of a loaded local model and the basis of the estimate.
+
+    Reads only config.json (cached by huggingface_hub). Falls back to the
+    parameter count in the model name, then to None.
+    """
+    dtype_bytes = bytes_per_param(device)
+    try:
+        from transformers import PretrainedConfig
+
+        config, _ = PretrainedConfig.get_config_dict(full_name)
+        params, kv_per_token = count_parameters(config)
+        kv_bytes = kv_per_token * dtype_bytes * KV_TOKENS_PER_SEQUENCE * max(1, concurrency)
+        return (params * dtype_bytes + kv_bytes) / _MB + RUNTIME_OVERHEAD_MB, "config"
+    except Exception:
+        pass  # transformers missing, config not downloadable or unexpected layout
+    by_name = estimate_weights_mb(full_name, bytes_per_param=dtype_bytes)
+    if by_name is not None:
+        return by_name + RUNTIME_OVERHEAD_MB, "name"
+    return None, "unknown"
+
+
+def memory_budget_mb(device: str) -> float:
+    """Memory the packer may fill: a fraction of what is free right now."""
+    if device == "cuda":
+        import torch
+
+        free, _ = torch.cuda.mem_get_info()
+        return free / _MB * BUDGET_FRACTION
+    # CPU and MPS (unified memory) share system RAM
+    try:
+        with open("/proc/meminfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024 * BUDGET_FRACTION
+    except OSError:
+        pass
+    try:
+        total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+        return total / _MB * BUDGET_FRACTION
+    except (ValueError, OSError, AttributeError):
+        return 0.0
+
+
+def pack_models(footprints: Dict[str, Optional[float]], budget_mb: float) -> List[List[str]]:
+    """First-fit-decreasing packing of models into groups within `budget_mb`.
+
+    Models with an unknown footprint or one larger than the budget get a
+    group of their own.
+    """
+    groups: List[List[str]] = []
+    used: List[float] = []
+    for name in sorted(footprints, key=lambda n: -(footprints[n] or float("inf"))):
+        size = footprints[name]
+        if size is None or size > budget_mb:
+            groups.append([name])
+            used.append(float("inf"))
+            continue
+        for i, total in enumerate(used):
+            if total + size <= budget_mb:
+                groups[i].append(name)
+                used[i] += size
+                break
+        else:
+            groups.append([name])
+            used.append(size)
+    return groups
+
+
+def split_threads(footprints: Dict[str, float], total_threads: int) -> Dict[str, int]:
+    """Split `total_threads` between models in proportion to their footprint (at least 1 each)."""
+    total_size = sum(footprints.values()) or 1.0
+    shares = {
+        name: max(1, int(total_threads * size / total_size))
+        for name, size in footprints.items()
+    }
+    # Hand leftover threads to the largest models
+    spare = total_threads - sum(shares.values())
+    for name in sorted(footprints, key=lambda n: -footprints[n]):
+        if spare <= 0:
+            break
+        shares[name] += 1
+        spare -= 1
+    return shares
+
+
+def plan_schedule(
+    model_names: Sequence[str],
+    budget_mb: Optional[float] = None,
+    concurrency: int = 1,
+    total_threads: Optional[int] = None,
+    continuous_batching: bool = False,
+) -> List[List[Dict]]:
+    """Groups of models to load and evaluate together, in run order.
+
+    Each entry is a dict with `name`, `backend`, `footprint_mb`, `basis` and
+    `num_threads`: CPU threads per generate call, i.e. the model's share of
+    `total_threads` divided by the `concurrency` calls in flight (None when
+    the model runs alone). With `continuous_batching` every call runs on the
+    model's one engine thread, so that thread gets the whole share.
+    Non-local models keep their own sequential slot.
+    """
+    device = default_device()
+    if budget_mb is None:
+        budget_mb = memory_budget_mb(device)
+    if total_threads is None:
+        total_threads = os.cpu_count() or 1
+
+    entries: Dict[str, Dict] = {}
+    for name in model_names:
+        try:
+            backend, full_name = resolve_backend(name)
+        except ValueError:
+            backend, full_name = None, name
+        footprint, basis = None, "not local"
+        if backend == "hf_local":
+            footprint, basis = estimate_footprint_mb(full_name, device, concurrency)
+        entries[name] = {
+            "name": name,
+            "backend": backend,
+            "footprint_mb": footprint,
+            "basis": basis,
+            "num_threads": None,
+        }
+
+    local = {n: e["footprint_mb"] for n, e in entries.items() if e["backend"] == "hf_local"}
+    packed = {tuple(group)[0]: group for group in pack_models(local, budget_mb)}
+
+    schedule = []
+    for name in model_names:
+        if name in packed:
+            group = packed[name]
+            if len(group) > 1:
+                threads = split_threads({n: local[n] for n in group}, total_threads)
+                # Each of the evaluator's workers sizes its own thread pool per
+                # generate call, so a model's share is split between them
+                callers = 1 if continuous_batching else max(1, concurrency)
+                for n in group:
+                    entries[n]["num_threads"] = max(1, threads[n] // callers)
+            schedule.append([entries[n] for n in group])
+        elif name not in local:
+            schedule.append([entries[name]])
+    return schedule
+
+
+def format_schedule(schedule: List[List[Dict]], budget_mb: float) -> str:
+    lines = [f"Co-schedule (memory budget {budget_mb:,.0f} MB):"]
+    for i, group in enumerate(schedule, 1):
+        mode = "concurrent" if len(group) > 1 else "alone"
+        parts = []
+        for e in group:
+            size = f"{e['footprint_mb']:,.0f} MB" if e["footprint_mb"] else e["basis"]
+            threads = f", {e['num_threads']} threads" if e["num_threads"] else ""
+            parts.append(f"{e['name']} ({size}{threads})")
+        lines.append(f"  {i}. [{mode}] " + ", ".join(parts))
+    return "\n".join(lines)